@@ -0,0 +1,7 @@
+import sys
+
+collect_ignore = []
+
+# AsyncDB requires aiohttp 3.12, available for Python 3.9 or newer
+if sys.version_info < (3, 9):
+    collect_ignore += ['scidbpy/aio.py', 'tests/test_aio.py']
@@ -170,14 +170,44 @@ namespace  = None
 verify     = False
 
 
-By default, the ``connect`` function queries SciDB for the list of
-available operators. This list is used for easy access to the SciDB
-operators, see the *SciDB Operators* section below. As a consequence
-the connection to SciDB is verified and a small delay might
-occur. This behavior can be disabled using the ``no_ops=True``
-parameter. Accessing the SciDB operators as described in *SciDB
-Operators* will not be possible until the ``load_ops()`` function is
-called on the ``DB`` instance:
+Each ``DB`` instance keeps a pool of persistent (keep-alive) HTTP
+connections to Shim, so consecutive queries do not pay for a new TCP
+or SSL handshake. The size of the pool, the request timeout, and the
+number of retries for failed connection attempts can be set at
+connection time:
+
+>>> db = connect(pool_size=4, timeout=60, retries=5)
+
+The ``DB`` instance also keeps a pool of Shim sessions of the same
+size. Each query runs on its own session, so the same ``DB`` instance
+can be shared between threads, with up to ``pool_size`` queries
+running concurrently. Sessions are created as needed and are released
+when the ``DB`` instance is garbage collected.
+
+Over slow networks, compressed downloads can be requested using the
+``compression`` argument, ``'gzip'`` or ``'zstd'`` (requires the
+``zstandard`` library). The data is downloaded as is if Shim, or a
+proxy in front of it, does not compress it. If Shim accepts compressed
+request bodies, uploads can be compressed as well, using
+``compress_uploads=True``. The transferred sizes and the time spent
+compressing and decompressing are recorded in ``transfer_stats``:
+
+>>> db_gzip = connect(compression='gzip')
+>>> db_gzip.transfer_stats
+... # doctest: +SKIP
+TransferStats(download_bytes=0, download_wire=0, upload_bytes=0, \
+upload_wire=0, codec_time=0.000)
+
+
+The ``connect`` function verifies the connection to SciDB by opening
+a Shim session. The list of available operators and macros is
+fetched from SciDB, using a single query, the first time it is
+needed, e.g., when an operator is accessed on the ``DB`` instance or
+``dir()`` is called. This list is used for easy access to the SciDB
+operators, see the *SciDB Operators* section below. This behavior can
+be disabled using the ``no_ops=True`` parameter. Accessing the SciDB
+operators as described in *SciDB Operators* will not be possible
+until the ``load_ops()`` function is called on the ``DB`` instance:
 
 >>> db_no_ops = connect(no_ops=True)
 >>> db_no_ops.scan
@@ -194,6 +224,20 @@ Operator(db=DB('http://localhost:8080', None, None, None, None),
          name='scan',
          args=[])
 
+Short-lived processes can share the list of operators through an
+on-disk cache, using the ``ops_cache_ttl`` parameter. The list is
+fetched from SciDB only if it is not in the cache or it is older than
+the given number of seconds. The cache is kept in the directory set by
+the ``SCIDBPY_CACHE_DIR`` environment variable (``~/.cache/scidbpy``
+by default) and is keyed by the Shim URL, the SciDB user, and the
+namespace. ``load_library`` and ``unload_library`` queries drop the
+cached list:
+
+>>> db_cached = connect(ops_cache_ttl=3600)
+>>> db_cached.ops_cache
+... # doctest: +ELLIPSIS
+OpsCache('...', 3600)
+
 
 SciDB Arrays
 ============
@@ -223,6 +267,33 @@ SciDB arrays can be accessed using ``DB.arrays``:
 1  1  1.0
 2  2  2.0
 
+Arrays and lazy operators can be sliced. The selection is done in
+SciDB, so only the selected cells are downloaded. Slices select cells
+by position using the ``limit`` operator, attribute names select
+attributes using the ``project`` operator, and tuples select cells by
+dimension coordinates using the ``between`` operator. As with Python
+slices, the end of a coordinate range is excluded. The rows selected
+in SciDB are numbered from ``0``, the cells are identified by their
+dimension values. Other keys, like integers or slices with negative
+positions, are applied to the downloaded DataFrame, which keeps its
+index:
+
+>>> db.arrays.foo[1:3]
+   i    x
+0  1  1.0
+1  2  2.0
+
+>>> db.arrays.foo['x']
+0    0.0
+1    1.0
+2    2.0
+Name: x, dtype: float64
+
+>>> db.arrays.foo[1:,]
+   i    x
+0  1  1.0
+1  2  2.0
+
 To get the schema of an array, we can use the ``schema`` utility
 function:
 
@@ -303,8 +374,8 @@ execute immediately (e.g., ``create_array``, ``remove``, etc.).
 >>> dir(db.arrays)
 []
 
-The list of available operators is re-loaded automatically when
-a ``load_library`` query is issued:
+The list of available operators is re-loaded automatically, on next
+use, after a ``load_library`` query is issued:
 
 >>> db.load_library('limit')
 ... # doctest: +SKIP
@@ -312,11 +383,11 @@ a ``load_library`` query is issued:
 ... # doctest: +SKIP
 True
 
-A similar functionality is **not** implemented for ``unload_library``
-operator. The ``unload_library`` operator requires a SciDB restart,
-which makes re-loading the list of operators not
-practical. Nevertheless, one can trigger the re-loading manually after
-SciDB restart without creating a new ``DB`` instance:
+The list is also dropped after an ``unload_library`` query. The
+``unload_library`` operator requires a SciDB restart, so a list
+fetched before the restart still includes the unloaded
+operators. One can trigger the re-loading manually after SciDB
+restart without creating a new ``DB`` instance:
 
 >>> db.iquery("unload_library('limit')")
 ... # doctest: +SKIP
@@ -401,6 +472,80 @@ Array(DB('http://localhost:8080', None, None, None, None), 'foo')
 
 >>> db.remove(db.arrays.foo)
 
+Before downloading the output of an operator, SciDB-Py needs its
+schema. For common operators (e.g., ``scan``, ``build``, ``apply``,
+``project``, ``filter``, ``between``, ``subarray``, ``limit``,
+``join``, and ``redimension``) the schema is inferred on the client
+side, if the schemas of the input arrays are already known, i.e.,
+from the schema cache (see below). Array schemas are not kept
+otherwise, as the arrays can be removed or stored again. If they are
+not known, the schema is requested from SciDB using a single
+``show()`` query. See :mod:`scidbpy.infer` for
+details.
+
+The schemas returned by ``show()``, including array schemas, can be
+kept in a least recently used cache, ``DB.schema_cache``, enabled by
+the ``schema_cache_size`` argument of ``connect``. Repeated downloads
+of the same query skip the ``show()`` request. Cached schemas are
+discarded when a hungry operator (e.g., ``store``, ``remove``,
+``insert``) changes an array used by the cached query:
+
+>>> db_schemas = connect(schema_cache_size=128)
+>>> db_schemas.iquery('store(build(<x:int64>[i=0:2], i), foo)')
+>>> db_schemas.arrays.foo.fetch().shape
+(3, 2)
+>>> db_schemas.arrays.foo.fetch().shape
+(3, 2)
+>>> db_schemas.schema_cache
+... # doctest: +ELLIPSIS
+SchemaCache(max_size=128, size=..., hits=..., misses=...)
+>>> db_schemas.iquery('remove(foo)')
+
+Changes made to arrays by other connections are not detected, since
+the schemas are used to decode the downloaded data. Enable the cache
+only if the arrays are not changed by others, or use
+``DB.schema_cache.clear()`` to discard all the cached schemas.
+
+Downloaded results can be kept in memory as well, using the
+``result_cache_size`` argument of ``connect``, which sets the maximum
+total size of the cached results in bytes. Before each download, the
+latest versions of the arrays used by the query are requested from
+SciDB with a single ``list('arrays', true)`` query. If the same query
+was downloaded with the same arguments and none of its arrays has a
+new version since, a copy of the cached result is returned without
+downloading it again. The least recently used results are discarded
+first. Queries using temporary arrays, ``input``, ``list``, ``show``,
+or functions like ``random()`` are not cached:
+
+>>> db_results = connect(result_cache_size=2 ** 30)
+>>> db_results.iquery('store(build(<x:int64>[i=0:2], i), foo)')
+>>> db_results.arrays.foo.fetch().shape
+(3, 2)
+>>> db_results.arrays.foo.fetch().shape
+(3, 2)
+>>> db_results.result_cache
+... # doctest: +ELLIPSIS
+ResultCache(max_bytes=1073741824, nbytes=..., size=1, hits=1, misses=1)
+>>> db_results.iquery('remove(foo)')
+
+Results can also be kept on disk, across restarts and shared by
+processes, using the ``disk_cache_size`` argument of ``connect``. The
+results are stored as Arrow IPC files, read back memory-mapped, or as
+Parquet files (``disk_cache_format='parquet'``), and are looked up in
+the same way. The least recently used results are removed once the
+cache is full. The cache is kept in the ``results`` directory of the
+directory set by the ``SCIDBPY_CACHE_DIR`` environment variable
+(``~/.cache/scidbpy`` by default). See :mod:`scidbpy.cache` for
+details and for the ``python -m scidbpy.cache`` command, which lists
+and purges the cached results:
+
+>>> db_disk = connect(disk_cache_size=10 * 2 ** 30)
+>>> db_disk.disk_cache.entries()
+... # doctest: +SKIP
+[{'file': '.../result-....arrow', 'size': ..., 'query': 'scan(foo)', ...}]
+>>> db_disk.disk_cache.purge(2 ** 30)
+... # doctest: +SKIP
+
 
 Upload Data to SciDB
 --------------------
@@ -603,6 +748,21 @@ object records will be used instead of atomic values:
 1  (255, 1)
 2  (255, 2)
 
+To keep the precision of null-able integers, Pandas nullable extension
+types (e.g., ``Int64``, ``boolean``, ``string``) can be used instead,
+by specifying ``dataframe_promo='nullable'``. The extension arrays are
+built directly from the downloaded values and null flags:
+
+>>> iquery(db,
+...        "build(<x:int64>[i=0:2], iif(i = 1, null, i))",
+...        fetch=True,
+...        atts_only=True,
+...        dataframe_promo='nullable')
+      x
+0     0
+1  <NA>
+2     2
+
 
 Download as NumPy Array:
 
@@ -624,6 +784,64 @@ array([((255, 0),), ((255, 1),), ((255, 2),)],
       dtype=[('x', [('null', 'u1'), ('val', '<i8')])])
 
 
+Large results can be downloaded in batches, without holding the
+entire result in memory. The ``iquery_iter`` function returns a
+generator of DataFrames (or NumPy arrays) with ``batch_size`` cells
+each. The result is downloaded from Shim in pages of ``page_size``
+bytes:
+
+>>> for batch in db.iquery_iter('build(<x:int64>[i=0:4], i)',
+...                             batch_size=2,
+...                             page_size=1024):
+...     print(len(batch))
+2
+2
+1
+
+Arrays and operators provide the same functionality through the
+``iter_batches`` function:
+
+>>> [len(batch) for batch in
+...  db.build('<x:int64>[i=0:4]', 'i').iter_batches(batch_size=3)]
+[3, 2]
+
+Results can also be downloaded using several concurrent queries. If
+``parallelism`` is greater than ``1``, the result is split in
+contiguous ranges of chunks along the first dimension with known
+bounds. Each range is downloaded using ``between`` on its own Shim
+session and the parts are concatenated. Queries with unbounded
+dimensions are downloaded using a single query:
+
+>>> db.iquery('build(<x:int64>[i=0:5:0:2], i)',
+...           fetch=True,
+...           parallelism=3)
+   i    x
+0  0  0.0
+1  1  1.0
+2  2  2.0
+3  3  3.0
+4  4  4.0
+5  5  5.0
+
+Results larger than the available memory can be downloaded to a file
+using ``memmap``. The Shim output is written to the file as it arrives
+and is returned memory-mapped. Fixed-size results are returned as a
+NumPy ``memmap`` structured array, with null-able attributes as
+``(null, val)`` records, as with ``as_dataframe=False``. Results with
+variable-size attributes, or downloaded with ``use_arrow``, are
+returned as a ``pyarrow.Table`` backed by an Arrow file, with Arrow
+nulls. If ``memmap`` is ``True``, a temporary file is used:
+
+>>> ar = db.iquery('build(<x:int64 not null>[i=0:2], i)',
+...                fetch=True,
+...                atts_only=True,
+...                memmap=True)
+>>> type(ar).__name__
+'memmap'
+>>> ar['x'].tolist()
+[0, 1, 2]
+
+
 If the `accelerated_io_tools
 <https://github.com/Paradigm4/accelerated_io_tools>`_ SciDB plugin is
 installed and enabled in `Shim <https://github.com/Paradigm4/shim>`_,
@@ -636,6 +854,29 @@ SciDB arrays can be downloaded using the Apache Arrow library:
 1  1  1.0
 2  2  2.0
 
+With ``atts_only=True``, the column names and types are taken from
+the Arrow data, so the array schema is not requested from SciDB. When
+the dimensions are downloaded as well, the schema is still requested,
+to place the dimension columns before the attribute columns.
+
+With ``as_dataframe=False``, the Arrow data is returned as a
+``pyarrow.Table``, without the conversion to Pandas. With
+``iquery_iter``, the Arrow record batches are read from the Shim
+response as they arrive:
+
+>>> db.iquery('scan(foo)', fetch=True, use_arrow=True, as_dataframe=False)
+... # doctest: +SKIP
+pyarrow.Table
+i: int64
+x: double
+
+>>> for batch in db.iquery_iter('scan(foo)',
+...                             use_arrow=True,
+...                             as_dataframe=False):
+...     print(batch.num_rows)
+... # doctest: +SKIP
+3
+
 
 Upload Data to SciDB
 --------------------
@@ -691,6 +932,85 @@ schema using the ``upload_schema`` argument:
 ...           upload_schema=Schema.fromstring('<x:int64 not null>[i]'))
 
 
+Upload DataFrames and Arrow Tables
+^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+Pandas DataFrames and pyarrow Tables are uploaded in the same way. The
+columns are encoded directly, one at a time. If not provided, the
+upload schema is mapped from the column types. Object, categorical,
+and nullable extension type columns map to null-able attributes:
+
+>>> import pandas
+>>> import pyarrow
+>>> db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), bar)",
+...           upload_data=pandas.DataFrame({
+...               'x': pandas.array([1, None, 3], dtype='Int64'),
+...               'y': pandas.Categorical(['a', 'b', 'a'])}))
+
+>>> db.arrays.bar[:]
+   i    x  y
+0  0  1.0  a
+1  1  NaN  b
+2  2  3.0  a
+
+>>> db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), taz)",
+...           upload_data=pyarrow.table({'x': [1.5, 2.5, 3.5]}))
+
+>>> db.arrays.taz[:]
+   i    x
+0  0  1.5
+1  1  2.5
+2  2  3.5
+
+>>> for ar in ['bar', 'taz']: db.remove(ar)
+
+
+Upload in Chunks
+^^^^^^^^^^^^^^^^
+
+Data larger than the available memory can be uploaded as an iterable
+of NumPy arrays, DataFrames, pyarrow Tables, or bytes. The chunks are
+converted as they are sent and the upload uses chunked transfer
+encoding, so only a few chunks are held in memory at a time. If not
+provided, the upload schema is mapped from the first chunk:
+
+>>> db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), bar)",
+...           upload_data=(numpy.arange(i, i + 2) for i in range(0, 6, 2)))
+
+>>> db.arrays.bar[:]
+   i  x
+0  0  0
+1  1  1
+2  2  2
+3  3  3
+4  4  4
+5  5  5
+
+>>> db.remove(db.arrays.bar)
+
+Large NumPy arrays, DataFrames, and pyarrow Tables can be uploaded in
+parts, concurrently, using the ``parallelism`` argument. Each part is
+uploaded on its own Shim session and the parts are combined using
+``union``. Only the data of exactly one ``input({sch}, '{fn}',
+...)`` operator is split, other operators like ``load`` are not. The
+upload schema needs one dimension with a known chunk length, as each
+part starts on a chunk boundary. A ``ValueError`` is raised otherwise:
+
+>>> db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), bar)",
+...           upload_data=numpy.arange(6),
+...           upload_schema=Schema.fromstring(
+...               '<x:int64 not null>[i=0:*:0:2]'),
+...           parallelism=3)
+
+>>> db.input(upload_data=numpy.arange(6),
+...          upload_schema=Schema.fromstring(
+...              '<x:int64 not null>[i=0:*:0:2]')).store(
+...     'bar', parallelism=3)
+Array(DB('http://localhost:8080', None, None, None, None), 'bar')
+
+>>> db.remove(db.arrays.bar)
+
+
 Upload Binary Data
 ^^^^^^^^^^^^^^^^^^
 
@@ -814,6 +1134,36 @@ features of the library:
 >>> db.remove(bar)
 
 
+Asynchronous Queries
+====================
+
+For ``asyncio`` applications, the :class:`AsyncDB<scidbpy.aio.AsyncDB>`
+class provides the same functionality as the ``DB`` class, but its
+query functions are coroutines. It requires Python ``3.9`` or newer
+and the ``aiohttp`` library, version ``3.12`` or newer, which can be
+installed with::
+
+  $ pip install scidb-py[async]
+
+>>> import asyncio
+... # doctest: +SKIP
+>>> from scidbpy.aio import connect as connect_async
+... # doctest: +SKIP
+
+>>> async def fetch_all():
+...     async with await connect_async(pool_size=4) as adb:
+...         return await asyncio.gather(
+...             adb.iquery('build(<x:int64>[i=0:2], i)', fetch=True),
+...             adb.build('<x:int64>[i=0:2]', 'i + 10').fetch())
+... # doctest: +SKIP
+
+>>> len(asyncio.run(fetch_all()))
+... # doctest: +SKIP
+2
+
+See :mod:`scidbpy.aio` for details.
+
+
 SciDB Enterprise Edition Features
 =================================
 
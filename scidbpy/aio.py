@@ -0,0 +1,795 @@
+"""AsyncDB and AsyncOperator
+==========================
+
+Asynchronous counterparts of the :class:`DB<scidbpy.db.DB>` and
+:class:`Operator<scidbpy.db.Operator>` classes for use with
+``asyncio``. Requires Python ``3.9`` or newer and the `aiohttp
+<https://docs.aiohttp.org/>`_ library, version ``3.12`` or newer.
+
+The connection is created using the :func:`connect` coroutine. The
+``iquery``, ``iquery_readlines``, and ``upload`` functions, the
+``fetch`` and ``schema`` functions of arrays and operators, and the
+hungry operators are coroutines. Arrays and operators cannot be
+indexed:
+
+>>> import asyncio
+>>> from scidbpy.aio import connect
+
+>>> async def main():
+...     db = await connect()
+...     await db.iquery('store(build(<x:int64>[i=0:2], i), foo)')
+...     data = await db.arrays.foo.fetch()
+...     await db.remove(db.arrays.foo)
+...     await db.close()
+...     return data
+
+>>> asyncio.run(main())
+   i    x
+0  0  0.0
+1  1  1.0
+2  2  2.0
+
+Each query leases a Shim session from a pool of up to ``pool_size``
+sessions, so many queries can be in flight concurrently from the same
+event loop:
+
+>>> async def main():
+...     async with await connect(pool_size=4) as db:
+...         return await asyncio.gather(*(
+...             db.iquery('build(<x:int64>[i=0:{}], i)'.format(i),
+...                       fetch=True,
+...                       as_dataframe=False)
+...             for i in range(8)))
+
+>>> [len(ar) for ar in asyncio.run(main())]
+[1, 2, 3, 4, 5, 6, 7, 8]
+
+"""
+
+import asyncio
+import copy
+import itertools
+import requests
+import ssl
+import warnings
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from weakref import finalize
+except ImportError:
+    from backports.weakref import finalize
+
+from .db import (Array, Arrays, DB, OpsCache, Operator, Password_Placeholder,
+                 Shim, SchemaCache, _BatchDecoder, _cache_dir, _http_session,
+                 _is_upload_iter, _ops_queries, _ops_query,
+                 _shim_release_sessions, shim_idempotent)
+from .schema import Schema, pyarrow
+
+
+async def _aiter_chunks(chunks):
+    """Iterate over the upload chunks in an executor, so the event
+    loop is not blocked while the chunks are converted to bytes"""
+    loop = asyncio.get_running_loop()
+    chunks = iter(chunks)
+    end = object()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, end)
+        if chunk is end:
+            break
+        yield chunk
+
+
+class AsyncSessionPool(object):
+    """Pool of Shim sessions for use with ``asyncio``. Same as
+    :class:`SessionPool<scidbpy.db.SessionPool>` except that
+    ``new_session`` and ``acquire`` are coroutines.
+
+    """
+    def __init__(self, new_session, max_size):
+        self.new_session = new_session
+        self.max_size = max_size
+        # IDs of all the sessions created, released on close
+        self.ids = []
+
+        self._idle = []
+        self._size = 0
+        self._cond = None
+
+    def _condition(self):
+        # Create the condition inside the running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self):
+        cond = self._condition()
+        async with cond:
+            while not self._idle and self._size >= self.max_size:
+                await cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            # Reserve a slot and create the session outside the lock
+            self._size += 1
+
+        try:
+            id = await self.new_session()
+        except BaseException:
+            async with cond:
+                self._size -= 1
+                cond.notify()
+            raise
+        self.ids.append(id)
+        return id
+
+    async def release(self, id):
+        cond = self._condition()
+        async with cond:
+            if id in self.ids:
+                self._idle.append(id)
+            else:
+                # Released on close, free the slot
+                self._size -= 1
+            cond.notify()
+
+    def close(self):
+        """Drop the idle sessions which are no longer in ``ids``,
+        i.e., released on close, so that new sessions are created"""
+        idle = [id for id in self._idle if id in self.ids]
+        self._size -= len(self._idle) - len(idle)
+        self._idle = idle
+
+    def lease(self):
+        """Asynchronous context manager which acquires a session and
+        releases it on exit"""
+        return _Lease(self)
+
+
+class _Lease(object):
+    def __init__(self, pool):
+        self.pool = pool
+        self.id = None
+
+    async def __aenter__(self):
+        self.id = await self.pool.acquire()
+        return self.id
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.pool.release(self.id)
+
+
+class AsyncDB(DB):
+    """SciDB Shim connection object for use with ``asyncio``.
+
+    The constructor parameters are the same as for
+    :class:`DB<scidbpy.db.DB>`, except for ``no_ops``, which is
+    accepted by :func:`connect`, and for the compression and result
+    cache parameters, which are not supported. The constructor does
+    not make any requests. Use :func:`connect` to create an instance
+    and download the list of operators.
+
+    The connection is closed using the ``close`` coroutine or by using
+    the instance as an asynchronous context manager. Sessions which
+    are not released by ``close`` are released when the instance is
+    garbage collected.
+
+    """
+
+    def __init__(
+            self,
+            scidb_url=None,
+            scidb_auth=None,
+            http_auth=None,
+            namespace=None,
+            verify=None,
+            pool_size=10,
+            timeout=None,
+            retries=3,
+            schema_cache_size=0,
+            ops_cache_ttl=None):
+        if aiohttp is None:
+            raise ImportError('AsyncDB requires the aiohttp library')
+
+        if scidb_url is None:
+            scidb_url = DB._default_url()
+
+        self.scidb_url = scidb_url
+        self.namespace = namespace
+        self.verify = verify
+        self.timeout = timeout
+        self.retries = retries
+        self._pool_size = pool_size
+        self._http = None
+        self.schema_cache = SchemaCache(schema_cache_size)
+        self.ops_cache = (OpsCache(_cache_dir(), ops_cache_ttl)
+                          if ops_cache_ttl else None)
+
+        if http_auth:
+            self._http_auth = requests.auth.HTTPDigestAuth(*http_auth)
+            self._aio_auth = http_auth
+            self.http_auth = (http_auth[0], Password_Placeholder())
+        else:
+            self._http_auth = self._aio_auth = self.http_auth = None
+
+        if scidb_auth:
+            self._scidb_auth = scidb_auth
+            self.scidb_auth = (scidb_auth[0], Password_Placeholder())
+        else:
+            self._scidb_auth = self.scidb_auth = None
+
+        self._sessions = AsyncSessionPool(self._new_session, pool_size)
+
+        # Fall back to synchronous requests for releasing the sessions
+        # if close is not called
+        finalize(self,
+                 _shim_release_sessions,
+                 _http_session(1, retries, self.scidb_url),
+                 self.scidb_url,
+                 self._http_auth,
+                 self.verify,
+                 self.timeout,
+                 self._sessions.ids)
+
+        self.arrays = AsyncArrays(self)
+
+        self._init_state()
+
+    def __getattr__(self, name):
+        if self.operators and name in self.operators:
+            return AsyncOperator(self, name)
+        else:
+            raise AttributeError(
+                '{.__name__!r} object has no attribute {!r}'.format(
+                    type(self), name))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Release all the Shim sessions and close the HTTP
+        connections"""
+        ids = self._sessions.ids
+        try:
+            while ids:
+                await self._shim(Shim.release_session, ids[-1])
+                ids.pop()
+        finally:
+            self._sessions.close()
+            if self._http is not None:
+                await self._http.close()
+                self._http = None
+
+    async def iquery(self,
+                     query,
+                     fetch=False,
+                     use_arrow=False,
+                     atts_only=False,
+                     as_dataframe=True,
+                     dataframe_promo=True,
+                     schema=None,
+                     upload_data=None,
+                     upload_schema=None,
+                     parallelism=1):
+        """Execute query in SciDB. Coroutine version of
+        :meth:`DB.iquery()<scidbpy.db.DB.iquery>`.
+
+        """
+        # Special case: -- - set_namespace - --
+        if self._set_namespace(query):
+            return
+
+        # A callable schema is derived from the query, see DB.iquery
+        if callable(schema):
+            schema = schema()
+
+        if parallelism > 1 and (upload_data is not None or not fetch):
+            raise ValueError(
+                '"parallelism" is only supported for downloads by AsyncDB')
+
+        if fetch and parallelism > 1:
+            return await self._iquery_parallel(
+                query,
+                parallelism,
+                schema,
+                use_arrow=use_arrow,
+                atts_only=atts_only,
+                as_dataframe=as_dataframe,
+                dataframe_promo=dataframe_promo)
+
+        if upload_data is not None:
+            upload_data, upload_schema = self._prepare_upload(
+                query, upload_data, upload_schema)
+
+        # Lease a Shim session for the duration of the query
+        async with self._sessions.lease() as id:
+            if upload_data is not None:
+                fn = (await self._shim(
+                    Shim.upload, id, data=upload_data)).decode('utf-8')
+                query = DB._format_upload_query(query, fn, upload_schema)
+
+            if fetch and use_arrow and atts_only and not schema:
+                # The Arrow data carries its own schema. Dimensions
+                # need the schema to be placed before the attributes.
+                await self._shim(Shim.execute_query,
+                                 id,
+                                 query=query,
+                                 save='arrow',
+                                 atts_only=int(atts_only))
+                buf = await self._shim(Shim.read_bytes, id, n=0)
+
+                return DB._fetch_result(
+                    buf, None, True, as_dataframe, dataframe_promo)
+
+            elif fetch:
+                # Use provided schema or get schema from SciDB
+                if schema:
+                    schema = DB._copy_schema(schema, atts_only)
+                else:
+                    schema = await self._fetch_schema(
+                        id, query, cache=upload_data is None)
+
+                query = DB._fetch_query(query, schema, atts_only)
+
+                # Execute Query and Download content
+                await self._shim(Shim.execute_query,
+                                 id,
+                                 query=query,
+                                 save=('arrow' if use_arrow
+                                       else schema.atts_fmt_scidb))
+                buf = await self._shim(Shim.read_bytes, id, n=0)
+
+                return DB._fetch_result(
+                    buf, schema, use_arrow, as_dataframe, dataframe_promo)
+
+            else:                   # fetch=False
+                await self._shim(Shim.execute_query, id, query=query)
+
+        # Drop the cached schemas of the arrays changed by the query
+        self.schema_cache.invalidate(query)
+
+        # Special case: -- - load_library - --
+        if query.startswith(('load_library(', 'unload_library(')):
+            await self.load_ops()
+
+    async def _iquery_parallel(self, query, parallelism, schema, **kwargs):
+        """Download the query output using up to ``parallelism``
+        concurrent queries"""
+        if schema:
+            schema = DB._copy_schema(schema, False)
+        else:
+            async with self._sessions.lease() as id:
+                schema = await self._fetch_schema(id, query)
+
+        queries = DB._partition_queries(query, schema, parallelism)
+
+        # The Arrow data carries its own schema
+        if kwargs.get('use_arrow') and kwargs.get('atts_only'):
+            schema = None
+        if queries is None:
+            return await self.iquery(
+                query, fetch=True, schema=schema, **kwargs)
+
+        parts = await asyncio.gather(*(
+            self.iquery(q, fetch=True, schema=copy.deepcopy(schema), **kwargs)
+            for q in queries))
+        return DB._concat(parts)
+
+    async def iquery_iter(self,
+                          query,
+                          batch_size=100000,
+                          page_size=2 ** 20,
+                          atts_only=False,
+                          as_dataframe=True,
+                          dataframe_promo=True,
+                          schema=None,
+                          upload_data=None,
+                          upload_schema=None,
+                          use_arrow=False):
+        """Execute query in SciDB and download the result in
+        batches. Asynchronous generator version of
+        :meth:`DB.iquery_iter()<scidbpy.db.DB.iquery_iter>`. If
+        ``use_arrow`` is ``True``, the Arrow stream is downloaded in
+        pages and its record batches are yielded once the download is
+        complete.
+
+        """
+        if upload_data is not None:
+            upload_data, upload_schema = self._prepare_upload(
+                query, upload_data, upload_schema)
+
+        async with self._sessions.lease() as id:
+            if upload_data is not None:
+                fn = (await self._shim(
+                    Shim.upload, id, data=upload_data)).decode('utf-8')
+                query = DB._format_upload_query(query, fn, upload_schema)
+
+            if use_arrow:
+                # Use provided schema, if any. The Arrow data carries
+                # its own schema, but dimensions need the schema to
+                # be placed before the attributes.
+                if schema:
+                    schema = DB._copy_schema(schema, atts_only)
+                elif not atts_only:
+                    schema = await self._fetch_schema(
+                        id, query, cache=upload_data is None)
+                if schema:
+                    query = DB._fetch_query(query, schema, atts_only)
+                await self._shim(Shim.execute_query,
+                                 id,
+                                 query=query,
+                                 save='arrow',
+                                 atts_only=int(atts_only or bool(schema)))
+
+                pages = []
+                while True:
+                    page = await self._read_page(id, page_size)
+                    if not page:
+                        break
+                    pages.append(page)
+                reader = pyarrow.RecordBatchStreamReader(
+                    pyarrow.BufferReader(b''.join(pages)))
+                for batch in reader:
+                    batch = DB._arrow_unique(batch)
+                    yield batch.to_pandas() if as_dataframe else batch
+                return
+
+            # Use provided schema or get schema from SciDB
+            if schema:
+                schema = DB._copy_schema(schema, atts_only)
+            else:
+                schema = await self._fetch_schema(
+                    id, query, cache=upload_data is None)
+
+            query = DB._fetch_query(query, schema, atts_only)
+            await self._shim(Shim.execute_query,
+                             id,
+                             query=query,
+                             save=schema.atts_fmt_scidb)
+
+            decoder = _BatchDecoder(schema, batch_size)
+            while True:
+                page = await self._read_page(id, page_size)
+                for buf in decoder.feed(page):
+                    yield DB._fetch_result(
+                        buf, schema, False, as_dataframe, dataframe_promo)
+                if not page:
+                    break
+
+    async def iquery_readlines(self, query):
+        """Execute query in SciDB. Coroutine version of
+        :meth:`DB.iquery_readlines()<scidbpy.db.DB.iquery_readlines>`.
+
+        """
+        async with self._sessions.lease() as id:
+            await self._shim(Shim.execute_query, id, query=query, save='tsv')
+            ret = await self._shim_readlines(id)
+        self.schema_cache.invalidate(query)
+        return ret
+
+    async def upload(self, upload_data, upload_schema=None, name=None):
+        """Upload data and store it in a SciDB array. If ``name`` is not
+        provided, an array name is generated. Return an ``Array``
+        object. Arrays are not removed on garbage collection.
+
+        :param upload_data: NumPy array, bytes, or file-like object
+          to upload
+
+        :param Schema upload_schema: Schema of the uploaded data. If
+          ``None``, it is generated from the NumPy array dtype
+          (default ``None``)
+
+        :param string name: Name of the array to store the data in
+          (default ``None``)
+
+        """
+        if name is None:
+            name = self.next_array_name()
+        await self.iquery(
+            "store(input({{sch}}, '{{fn}}', 0, '{{fmt}}'), {})".format(name),
+            upload_data=upload_data,
+            upload_schema=upload_schema)
+        return self.arrays[str(name)]
+
+    async def load_ops(self):
+        """Get list of operators and macros.
+        """
+        async with self._sessions.lease() as id:
+            try:
+                await self._shim(Shim.execute_query, id, query=_ops_query,
+                                 save='tsv')
+                operators = await self._shim_readlines(id)
+            except aiohttp.ClientResponseError:
+                operators = []
+                for query in _ops_queries:
+                    await self._shim(Shim.execute_query, id, query=query,
+                                     save='tsv')
+                    operators += await self._shim_readlines(id)
+
+        self._set_ops(operators)
+        if self.ops_cache is not None:
+            self.ops_cache.put(self._ops_key(), operators)
+
+    async def _fetch_schema(self, id, query, cache=True):
+        """Get the schema of the query output from the schema cache or
+        from SciDB using ``show()``"""
+        if cache:
+            schema = self.schema_cache.get(self.namespace, query)
+            if schema is not None:
+                return schema
+
+        await self._shim(
+            Shim.execute_query,
+            id,
+            query=DB._show_query.format(query.replace("'", "\\'")),
+            save='tsv')
+        schema = Schema.fromstring((await self._shim(
+            Shim.read_lines, id, n=0)).decode('utf-8'))
+        if cache:
+            self.schema_cache.put(self.namespace, query, schema)
+        return schema
+
+    async def _read_page(self, id, page_size):
+        """Read the next page of the query output. Return empty bytes
+        at the end of the output."""
+        try:
+            return await self._shim(Shim.read_bytes, id, n=page_size)
+        except aiohttp.ClientResponseError as e:
+            # Shim responds with "410 Gone" at the end of the output
+            if e.status == 410:
+                return b''
+            raise
+
+    def _http_session(self):
+        """Create the HTTP session inside the running event loop"""
+        if self._http is None:
+            if isinstance(self.timeout, tuple):
+                timeout = aiohttp.ClientTimeout(
+                    sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+            kwargs = {}
+            if self._aio_auth:
+                kwargs['middlewares'] = (
+                    aiohttp.DigestAuthMiddleware(*self._aio_auth),)
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=timeout,
+                **kwargs)
+        return self._http
+
+    def _ssl(self):
+        """Map the ``verify`` argument to the aiohttp ``ssl``
+        argument"""
+        if self.verify is False:
+            return False
+        if isinstance(self.verify, str):
+            return ssl.create_default_context(cafile=self.verify)
+        return None
+
+    async def _new_session(self):
+        if self._scidb_auth:
+            return (await self._shim(
+                Shim.new_session,
+                user=self._scidb_auth[0],
+                password=self._scidb_auth[1])).decode('utf-8')
+        else:
+            return (await self._shim(Shim.new_session)).decode('utf-8')
+
+    async def _shim(self, endpoint, id=None, **kwargs):
+        """Make request on Shim endpoint using the given session
+        ID. Return the response content."""
+
+        if endpoint != Shim.new_session:
+            kwargs.update(id=id)
+
+        # Add prefix to request, if necessary
+        if self.namespace and endpoint == Shim.execute_query:
+            kwargs['prefix'] = "set_namespace('{}')".format(self.namespace)
+
+        # Make request
+        url = requests.compat.urljoin(self.scidb_url, endpoint.value)
+        idempotent = endpoint in shim_idempotent
+        http = self._http_session()
+        for attempt in range(self.retries + 1):
+            try:
+                if endpoint == Shim.upload:  # Post request
+                    data = kwargs['data']
+                    if _is_upload_iter(data):
+                        # Sent with chunked transfer encoding
+                        data = _aiter_chunks(data)
+                    resp = await http.post(url,
+                                           params={'id': kwargs['id']},
+                                           data=data,
+                                           ssl=self._ssl())
+                else:                        # Get request
+                    resp = await http.get(
+                        url,
+                        params=dict((k, str(v)) for (k, v) in kwargs.items()),
+                        ssl=self._ssl())
+                break
+            except (aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as e:
+                # Connection attempts are always safe to retry
+                if (attempt == self.retries or
+                        not (idempotent or
+                             isinstance(e, aiohttp.ClientConnectorError))):
+                    raise
+
+        async with resp:
+            content = await resp.read()
+            if resp.status >= 400:
+                raise aiohttp.ClientResponseError(
+                    resp.request_info,
+                    resp.history,
+                    status=resp.status,
+                    message=content.decode('utf-8', 'replace'))
+        return content
+
+    async def _shim_readlines(self, id):
+        """Read data from Shim and parse as text lines"""
+        return [line.split('\t') if '\t' in line else line
+                for line in (await self._shim(
+                        Shim.read_lines, id, n=0)).decode(
+                            'utf-8').splitlines()]
+
+
+def _no_getitem(obj):
+    return TypeError(
+        '{.__name__!r} object does not support indexing, use '
+        '"(await obj.fetch())[key]" instead'.format(type(obj)))
+
+
+class AsyncArrays(Arrays):
+    """Access to arrays available in SciDB for an :class:`AsyncDB`"""
+    def __getattr__(self, name):
+        """db.arrays.foo"""
+        return AsyncArray(self.db, name)
+
+    def __getitem__(self, name):
+        """db.arrays['foo']"""
+        return AsyncArray(self.db, name)
+
+    def __dir__(self):
+        raise TypeError(
+            'The list of arrays cannot be downloaded synchronously, use '
+            '"await db.iquery_readlines(\'project(list(), name)\')" '
+            'instead')
+
+
+class AsyncArray(Array):
+    """Access to individual array for an :class:`AsyncDB`. ``schema``,
+    ``fetch``, and ``head`` return awaitables. Indexing is not
+    supported.
+
+    """
+    # Attribute and dimension names from the last call to schema
+    _names = None
+
+    def __getitem__(self, key):
+        raise _no_getitem(self)
+
+    def __dir__(self):
+        """List the attributes and dimensions of the array, as
+        returned by the last ``await array.schema()`` or from the
+        schema cache."""
+        sh = self.db.schema_cache.get(self.db.namespace, self.name)
+        if sh is not None:
+            ls = [i.name for i in itertools.chain(sh.atts, sh.dims)]
+            ls.sort()
+            return ls
+        if self._names is None:
+            raise TypeError(
+                'The array schema is not known, use '
+                '"await array.schema()" first')
+        return list(self._names)
+
+    def __mod__(self, alias):
+        """Overloads ``%`` operator to add support for aliasing"""
+        return AsyncArray(self.db, '{} as {}'.format(self.name, alias))
+
+    async def head(self, n=5, **kwargs):
+        """Coroutine version of :meth:`Array.head()<scidbpy.db.Array.head>`
+        """
+        if self.db.operators and 'limit' in self.db.operators:
+            return await self.db.iquery('limit({}, {})'.format(self, n),
+                                        fetch=True,
+                                        **kwargs)
+        warnings.warn(
+            '"limit" operator not available. ' +
+            'Fetching the entire array. ' +
+            'See https://github.com/Paradigm4/limit.')
+        return (await self.fetch(**kwargs))[:n]
+
+    async def schema(self):
+        """Get the array schema. The schema is cached in the ``AsyncDB``
+        schema cache, if enabled.
+
+        """
+        schema = self.db.schema_cache.get(self.db.namespace, self.name)
+        if schema is None:
+            schema = Schema.fromstring((await self.db.iquery_readlines(
+                "show({})".format(self)))[0])
+            self.db.schema_cache.put(self.db.namespace, self.name, schema)
+        # Only the names are kept, for dir. The schema is not used for
+        # downloads, as the array can be changed later.
+        self._names = sorted(
+            i.name for i in itertools.chain(schema.atts, schema.dims))
+        return schema
+
+
+class AsyncOperator(Operator):
+    """Store SciDB operator and arguments for an
+    :class:`AsyncDB`. Hungry operators, ``fetch``, and ``schema``
+    return awaitables. Indexing is not supported.
+
+    """
+    def __getitem__(self, key):
+        raise _no_getitem(self)
+
+    def __mod__(self, alias):
+        """Overloads ``%`` operator to add support for aliasing"""
+        return AsyncArray(self.db, '{} as {}'.format(self, alias))
+
+    async def schema(self):
+        if self.is_lazy:
+            async with self.db._sessions.lease() as id:
+                return await self.db._fetch_schema(id, str(self))
+
+    def _output(self, kwargs):
+        """Output of hungry operators, as :class:`AsyncArray`"""
+        out = super()._output(kwargs)
+        if type(out) is Array:
+            out = AsyncArray(self.db, out.name)
+        return out
+
+    async def _execute(self, kwargs):
+        """Execute hungry operator and return its output"""
+        # Special case: -- - store - --
+        # If temp=True in kwargs, create a temporary array first
+        if self.name == 'store' and kwargs.get('temp') is True:
+            new_schema = Schema.fromstring(
+                (await self.db.iquery_readlines(
+                    self._temp_schema_query()))[0])
+            new_schema.name = self.args[1]
+            await self.db.iquery('create temp array {}'.format(new_schema))
+
+        # Execute query
+        await self.db.iquery(str(self),
+                             upload_data=self.upload_data,
+                             upload_schema=self.upload_schema,
+                             parallelism=kwargs.get('parallelism', 1))
+
+        # Arrays cannot be removed asynchronously on garbage collection
+        kwargs['gc'] = False
+        return self._output(kwargs)
+
+
+async def connect(*args, **kwargs):
+    """Create an :class:`AsyncDB` instance, verify the connection, and
+    download the list of operators. Takes the ``scidb_url``,
+    ``scidb_auth``, ``http_auth``, ``namespace``, ``verify``,
+    ``no_ops``, ``pool_size``, ``timeout``, ``retries``,
+    ``schema_cache_size``, and ``ops_cache_ttl`` arguments of
+    :meth:`DB()<scidbpy.db.DB>`. Compression and result caching are
+    not supported.
+
+    """
+    no_ops = kwargs.pop('no_ops', False)
+    db = AsyncDB(*args, **kwargs)
+
+    # Create the first session to verify the connection
+    await db._sessions.release(await db._sessions.acquire())
+
+    if not no_ops:
+        operators = db._cached_ops()
+        if operators is None:
+            await db.load_ops()
+        else:
+            db._set_ops(operators)
+    return db
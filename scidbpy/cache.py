@@ -0,0 +1,337 @@
+"""Result Cache
+============
+
+On-disk cache of downloaded query results, shared by all the
+processes using the same directory and kept across restarts. Results
+are stored as Arrow IPC files or as Parquet files. Arrow tables are
+read back memory-mapped, while NumPy arrays and Pandas DataFrames are
+copied out of the file. The least recently used results are removed
+once the total size of the files exceeds the size of the cache. The
+cache is used by ``DB`` instances created with ``disk_cache_size``,
+see :class:`DB<scidbpy.db.DB>`.
+
+The cache can be inspected and purged from the command line:
+
+.. code-block:: bash
+
+  python -m scidbpy.cache list
+  python -m scidbpy.cache purge --max-bytes 1000000000
+  python -m scidbpy.cache purge
+
+The cache directory is set by the ``SCIDBPY_CACHE_DIR`` environment
+variable (``~/.cache/scidbpy`` by default) or by the ``--path``
+argument.
+
+"""
+
+import argparse
+import hashlib
+import json
+import numpy
+import os
+import sys
+import tempfile
+import time
+
+from .db import _cache_dir
+from .schema import _LazyModule, _is_instance, pyarrow
+
+
+parquet = _LazyModule('pyarrow.parquet')
+
+
+def _to_table(res):
+    """Arrow table and metadata for a NumPy array, a Pandas DataFrame,
+    or an Arrow table. Nested NumPy fields, e.g., nullable attributes,
+    are stored as one column per leaf field."""
+    if _is_instance(res, 'pyarrow', 'Table'):
+        return res, {'kind': 'arrow'}
+    if _is_instance(res, 'pandas', 'DataFrame'):
+        return (pyarrow.Table.from_pandas(res),
+                {'kind': 'dataframe',
+                 'dtypes': [[name, str(res[name].dtype)] for name in res],
+                 'nan': _nan_columns(res)})
+    cols = []
+    names = []
+    for (path, col) in _leaf_fields(res):
+        cols.append(pyarrow.array(numpy.ascontiguousarray(col)))
+        names.append('.'.join(path))
+    return (pyarrow.Table.from_arrays(cols, names=names),
+            {'kind': 'numpy', 'dtype': res.dtype.descr})
+
+
+def _nan_columns(df):
+    """Object columns with ``NaN`` nulls. Arrow converts them to
+    ``None``, so they are restored on read."""
+    names = []
+    for name in df:
+        col = df[name]
+        if col.dtype != object:
+            continue
+        nulls = col[col.isna()]
+        nan = sum(1 for val in nulls if isinstance(val, float))
+        if nan == len(nulls) and nan:
+            names.append(name)
+        elif nan:
+            raise ValueError(
+                'Column {!r} has both None and NaN values'.format(name))
+    return names
+
+
+def _leaf_fields(ar, path=()):
+    for name in ar.dtype.names:
+        if ar.dtype[name].names:
+            for field in _leaf_fields(ar[name], path + (name,)):
+                yield field
+        else:
+            yield path + (name,), ar[name]
+
+
+def _dtype(descr):
+    """NumPy data type from its JSON encoded ``descr``"""
+    return numpy.dtype([
+        (str(field[0]),
+         _dtype(field[1]) if isinstance(field[1], list) else str(field[1]))
+        for field in descr])
+
+
+def _from_table(table, meta):
+    if meta['kind'] == 'arrow':
+        return table
+    if meta['kind'] == 'dataframe':
+        df = table.to_pandas()
+        for (name, dtype) in meta.get('dtypes', ()):
+            if str(df[name].dtype) != dtype:
+                df[name] = df[name].astype(dtype)
+        for name in meta.get('nan', ()):
+            df[name] = df[name].where(df[name].notna(), numpy.nan)
+        return df
+    res = numpy.empty((table.num_rows,), dtype=_dtype(meta['dtype']))
+    for (path, col) in _leaf_fields(res):
+        col[:] = table.column('.'.join(path)).to_numpy()
+    return res
+
+
+class DiskResultCache(object):
+    """On-disk cache of query results, limited by the total size of
+    the files in bytes. Each result is stored in its own file, named
+    after the hash of its key. The last use of a result is tracked by
+    the modification time of its file, so eviction is least recently
+    used across processes.
+
+    >>> c = DiskResultCache(tempfile.mkdtemp(), 2 ** 20)
+    >>> ar = numpy.array([(0,), (1,), (2,)], dtype=[('x', 'int64')])
+    >>> c.put(('scan(foo)', 7), ar, 'scan(foo)')
+    >>> c.get(('scan(foo)', 7))
+    array([(0,), (1,), (2,)], dtype=[('x', '<i8')])
+    >>> [entry['query'] for entry in c.entries()]
+    ['scan(foo)']
+    >>> c.purge(0)
+    1
+    >>> print(c.get(('scan(foo)', 7)))
+    None
+
+    :param string path: Cache directory, created if needed
+
+    :param int max_bytes: Maximum total size of the files in bytes
+
+    :param string format: File format of new results, ``'arrow'``
+      (Arrow IPC) or ``'parquet'`` (default ``'arrow'``)
+
+    """
+    _suffixes = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+    def __init__(self, path, max_bytes, format='arrow'):
+        if format not in DiskResultCache._suffixes:
+            raise ValueError('Unsupported format {!r}'.format(format))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.format = format
+
+    def __repr__(self):
+        return '{}({!r}, {!r}, {!r})'.format(
+            type(self).__name__, self.path, self.max_bytes, self.format)
+
+    def _file(self, key, format):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(
+            self.path,
+            'result-{}{}'.format(digest, DiskResultCache._suffixes[format]))
+
+    @staticmethod
+    def _read(path, format):
+        if format == 'arrow':
+            table = pyarrow.RecordBatchFileReader(
+                pyarrow.memory_map(path)).read_all()
+        else:
+            table = parquet.read_table(path, memory_map=True)
+        metadata = dict(table.schema.metadata)
+        meta = json.loads(metadata.pop(b'scidbpy').decode())
+        return _from_table(
+            table.replace_schema_metadata(metadata or None), meta)
+
+    @staticmethod
+    def _read_schema(path):
+        if path.endswith('.arrow'):
+            return pyarrow.RecordBatchFileReader(
+                pyarrow.memory_map(path)).schema
+        return parquet.read_schema(path)
+
+    def _files(self):
+        """Path, size, and last use of the result files"""
+        if not os.path.isdir(self.path):
+            return []
+        files = []
+        for name in os.listdir(self.path):
+            if (name.startswith('result-') and
+                    name.endswith(tuple(DiskResultCache._suffixes.values()))):
+                path = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue        # Removed by another process
+                files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    @property
+    def nbytes(self):
+        """Total size of the result files"""
+        return sum(size for (_, size, _) in self._files())
+
+    def get(self, key):
+        """Return the cached result or ``None``. Arrow tables stored in
+        Arrow IPC files are memory-mapped. NumPy arrays and Pandas
+        DataFrames are copied out of the file. Files which cannot be
+        read, e.g., truncated files, are removed."""
+        for format in DiskResultCache._suffixes:
+            path = self._file(key, format)
+            try:
+                res = DiskResultCache._read(path, format)
+            except (IOError, OSError):
+                continue
+            except (pyarrow.ArrowInvalid, ValueError, KeyError, TypeError):
+                # Truncated or not written by this cache
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return res
+        return None
+
+    def put(self, key, res, query=None):
+        """Store the result and remove the least recently used results
+        if the cache is full"""
+        (table, meta) = _to_table(res)
+        meta.update({'query': query, 'time': time.time()})
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'scidbpy'] = json.dumps(meta).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        (fd, path) = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                if self.format == 'arrow':
+                    writer = pyarrow.RecordBatchFileWriter(file, table.schema)
+                    writer.write_table(table)
+                    writer.close()
+                else:
+                    parquet.write_table(table, file)
+            getattr(os, 'replace', os.rename)(
+                path, self._file(key, self.format))
+        except Exception:
+            os.remove(path)
+            raise
+        self.purge()
+
+    def entries(self):
+        """List of the cached results, most recently used first. Each
+        entry is a ``dict`` with the ``file``, ``size``, ``last_used``
+        time, ``created`` time, ``query``, and ``kind`` of result."""
+        out = []
+        for (path, size, mtime) in sorted(
+                self._files(), key=lambda f: f[2], reverse=True):
+            try:
+                meta = json.loads(DiskResultCache._read_schema(
+                    path).metadata[b'scidbpy'].decode())
+            except Exception:
+                meta = {}
+            out.append({'file': path,
+                        'size': size,
+                        'last_used': mtime,
+                        'created': meta.get('time'),
+                        'query': meta.get('query'),
+                        'kind': meta.get('kind')})
+        return out
+
+    def purge(self, max_bytes=None):
+        """Remove the least recently used results until the total size
+        is at most ``max_bytes`` (default ``self.max_bytes``). Return
+        the number of results removed."""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        files = sorted(self._files(), key=lambda f: f[2])
+        total = sum(size for (_, size, _) in files)
+        cnt = 0
+        for (path, size, _) in files:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            cnt += 1
+        return cnt
+
+    def clear(self):
+        self.purge(0)
+
+
+def main(argv=None):
+    """Command line interface to inspect and purge the result cache"""
+    parser = argparse.ArgumentParser(
+        prog='python -m scidbpy.cache',
+        description='Inspect and purge the SciDB-Py result cache')
+    parser.add_argument(
+        '--path',
+        default=os.path.join(_cache_dir(), 'results'),
+        help='cache directory (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list', help='list the cached results')
+    purge = commands.add_parser(
+        'purge', help='remove the least recently used results')
+    purge.add_argument(
+        '--max-bytes',
+        type=int,
+        default=0,
+        help='size to keep, in bytes (default: %(default)s, remove all)')
+    args = parser.parse_args(argv)
+
+    cache = DiskResultCache(args.path, 0)
+    if args.command == 'list':
+        entries = cache.entries()
+        for entry in entries:
+            print('{:>12d}  {}  {:<9s}  {}'.format(
+                entry['size'],
+                time.strftime('%Y-%m-%d %H:%M:%S',
+                              time.localtime(entry['last_used'])),
+                entry['kind'] or '?',
+                entry['query'] or os.path.basename(entry['file'])))
+        print('{} results, {} bytes in {}'.format(
+            len(entries), sum(e['size'] for e in entries), args.path))
+    elif args.command == 'purge':
+        print('Removed {} results'.format(cache.purge(args.max_bytes)))
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
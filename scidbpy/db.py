@@ -5,28 +5,44 @@ Classes for connecting to SciDB and executing queries.
 
 """
 
+import collections
+import contextlib
 import copy
 import enum
+import functools
+import hashlib
 import itertools
+import json
 import logging
+import multiprocessing.pool
 import numpy
 import os
-import pandas
-import pyarrow
 import re
 import requests
+import six
+import shutil
 import string
+import tempfile
 import threading
+import time
 import uuid
 import warnings
+import zlib
 
 try:
     from weakref import finalize
 except ImportError:
     from backports.weakref import finalize
 
-from .meta import ops_hungry, string_args
-from .schema import Attribute, Dimension, Schema
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .infer import infer_schema
+from .meta import ops_hungry, ops_hungry_arrays, ops_volatile, string_args
+from .schema import (Attribute, Dimension, Schema, _is_instance, pandas,
+                     pyarrow)
 
 
 class Shim(enum.Enum):
@@ -44,18 +60,740 @@ class Password_Placeholder(object):
         return 'PASSWORD_PROVIDED'
 
 
-def _shim_release_session(scidb_url, http_auth, verify, id):
+# Shim endpoints which are safe to re-send if the connection fails
+# after the request was sent
+shim_idempotent = (Shim.cancel, Shim.release_session)
+
+
+# Identifiers in a query, candidate array names
+_regex_name = re.compile('^[A-Za-z_]\\w*$')
+
+# Names of the operators and the macros, in a single query
+_ops_query = ("union(project(list('operators'), name), "
+              "project(list('macros'), name))")
+
+# Same, in separate queries, for SciDB versions without union
+_ops_queries = ("project(list('operators'), name)",
+                "project(list('macros'), name)")
+
+# input({sch}, '{fn}', ...) with the remaining arguments as group
+_regex_upload_input = re.compile(
+    "input \\( \\s* \\{sch\\} \\s* , \\s* '\\{fn\\}'"
+    "( (?: [^()'] | '[^']*' )* ) \\)", re.VERBOSE)
+
+
+def _http_adapter(pool_size, retries, read_retries):
+    return requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=requests.packages.urllib3.util.retry.Retry(
+            total=retries,
+            connect=retries,
+            read=read_retries,
+            redirect=0,
+            status=0,
+            raise_on_status=False))
+
+
+def _http_session(pool_size, retries, scidb_url):
+    """Create a keep-alive HTTP session with a connection pool of the
+    given size. Failures to establish a connection are retried, since
+    no request has been sent yet. Requests to the idempotent Shim
+    endpoints are also retried on connection errors and timeouts. The
+    session does all the retries, so requests are never re-sent by the
+    callers."""
+    http = requests.Session()
+    adapter = _http_adapter(pool_size, retries, 0)
+    http.mount('http://', adapter)
+    http.mount('https://', adapter)
+    adapter = _http_adapter(1, retries, retries)
+    for endpoint in shim_idempotent:
+        http.mount(requests.compat.urljoin(scidb_url, endpoint.value),
+                   adapter)
+    return http
+
+
+def _shim_request(http, url, **kwargs):
+    """Make HTTP request using the given session. Failed requests are
+    retried by the session, see ``_http_session``."""
+    if 'data' in kwargs:    # Post request
+        return http.post(url, **kwargs)
+    else:                   # Get request
+        return http.get(url, **kwargs)
+
+
+def _is_upload_type(upload_data):
+    """Check if the upload data is converted to bytes using the upload
+    schema, i.e., a NumPy array, a Pandas DataFrame, or a pyarrow
+    Table"""
+    return (isinstance(upload_data, numpy.ndarray) or
+            _is_instance(upload_data, 'pandas', 'DataFrame') or
+            _is_instance(upload_data, 'pyarrow', 'Table'))
+
+
+def _is_upload_iter(upload_data):
+    """Check if the upload data is an iterable of chunks"""
+    return (hasattr(upload_data, '__iter__') and
+            not hasattr(upload_data, 'read') and
+            not isinstance(upload_data,
+                           six.string_types + (bytes, bytearray)) and
+            not _is_upload_type(upload_data))
+
+
+def _upload_bytes(upload_data, upload_schema):
+    """Convert NumPy arrays, Pandas DataFrames, and pyarrow Tables to
+    bytes as per the upload schema"""
+    if not _is_upload_type(upload_data):
+        return upload_data
+    if (isinstance(upload_data, numpy.ndarray) and
+            upload_schema.is_fixsize()):
+        return upload_data.tobytes()
+    return upload_schema.tobytes(upload_data)
+
+
+def _upload_chunks(chunks, upload_schema):
+    """Convert each chunk to bytes as per the upload schema. The next
+    chunk is converted in a background thread while the current chunk
+    is sent."""
+    pool = multiprocessing.pool.ThreadPool(1)
+    try:
+        pending = None
+        for chunk in chunks:
+            res = pool.apply_async(_upload_bytes, (chunk, upload_schema))
+            if pending is not None:
+                yield pending.get()
+            pending = res
+        if pending is not None:
+            yield pending.get()
+    finally:
+        pool.terminate()
+
+
+def _compressor(encoding):
+    """Streaming compressor for the content encoding"""
+    if encoding == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor().compressobj()
+
+
+def _decompressor(encoding):
+    """Streaming decompressor for the content encoding. ``None`` if the
+    content is not compressed."""
+    if encoding == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+def _compress_chunks(chunks, encoding, stats):
+    """Compress a sequence of byte chunks and record the sizes and
+    the time spent"""
+    comp = _compressor(encoding)
+    for chunk in chunks:
+        start = time.time()
+        out = comp.compress(chunk)
+        stats.add_upload(len(chunk), len(out), time.time() - start)
+        if out:
+            yield out
+    start = time.time()
+    out = comp.flush()
+    stats.add_upload(0, len(out), time.time() - start)
+    yield out
+
+
+def _read_chunks(file, size=2 ** 20):
+    """Read a file-like object in chunks"""
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class _DecompressReader(object):
+    """File-like object which reads and decompresses a raw response"""
+    def __init__(self, raw, encoding, stats):
+        self.closed = False
+        self._raw = raw
+        self._decomp = _decompressor(encoding)
+        self._stats = stats
+        self._buf = bytearray()
+        self._eof = False
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buf) < size):
+            chunk = self._raw.read(2 ** 16, decode_content=False)
+            start = time.time()
+            if chunk:
+                out = self._decomp.decompress(chunk)
+            else:
+                out = self._decomp.flush()
+                self._eof = True
+            self._stats.add_download(
+                len(out), len(chunk), time.time() - start)
+            self._buf += out
+        if size < 0:
+            size = len(self._buf)
+        out = bytes(self._buf[:size])
+        del self._buf[:size]
+        return out
+
+    def close(self):
+        self.closed = True
+
+
+class TransferStats(object):
+    """Sizes of compressed transfers and time spent compressing and
+    decompressing. ``*_bytes`` are uncompressed sizes and ``*_wire``
+    are sizes as sent over the network.
+
+    >>> s = TransferStats()
+    >>> s.add_download(300, 100, 0.5)
+    >>> s.download_ratio, s.codec_time
+    (3.0, 0.5)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __repr__(self):
+        return ('{}(download_bytes={!r}, download_wire={!r}, ' +
+                'upload_bytes={!r}, upload_wire={!r}, ' +
+                'codec_time={:.3f})').format(
+                    type(self).__name__,
+                    self.download_bytes,
+                    self.download_wire,
+                    self.upload_bytes,
+                    self.upload_wire,
+                    self.codec_time)
+
+    @property
+    def download_ratio(self):
+        """Compression ratio of the downloads, ``None`` if nothing was
+        downloaded"""
+        if not self.download_wire:
+            return None
+        return float(self.download_bytes) / self.download_wire
+
+    @property
+    def upload_ratio(self):
+        """Compression ratio of the uploads, ``None`` if nothing was
+        uploaded"""
+        if not self.upload_wire:
+            return None
+        return float(self.upload_bytes) / self.upload_wire
+
+    def add_download(self, size, wire, seconds):
+        with self._lock:
+            self.download_bytes += size
+            self.download_wire += wire
+            self.codec_time += seconds
+
+    def add_upload(self, size, wire, seconds):
+        with self._lock:
+            self.upload_bytes += size
+            self.upload_wire += wire
+            self.codec_time += seconds
+
+    def clear(self):
+        with self._lock:
+            self.download_bytes = 0
+            self.download_wire = 0
+            self.upload_bytes = 0
+            self.upload_wire = 0
+            self.codec_time = 0.
+
+
+def _shim_new_session(http, scidb_url, http_auth, verify, timeout,
+                      scidb_auth):
+    """Make Shim new_session request and return the session ID"""
+    url = requests.compat.urljoin(scidb_url, Shim.new_session.value)
+    req = _shim_request(
+        http,
+        url,
+        params=({'user': scidb_auth[0], 'password': scidb_auth[1]}
+                if scidb_auth else {}),
+        auth=http_auth,
+        verify=verify,
+        timeout=timeout)
+    req.reason = req.content
+    req.raise_for_status()
+    return req.text
+
+
+def _shim_release_session(http, scidb_url, http_auth, verify, timeout, id):
     """Make Shim release_session request"""
     url = requests.compat.urljoin(scidb_url, Shim.release_session.value)
-    req = requests.get(
+    req = _shim_request(
+        http,
         url,
         params={'id': id},
         auth=http_auth,
-        verify=verify)
+        verify=verify,
+        timeout=timeout)
     req.reason = req.content
     req.raise_for_status()
 
 
+def _shim_release_sessions(http, scidb_url, http_auth, verify, timeout,
+                           ids):
+    """Make Shim release_session requests for all the sessions in the
+    pool"""
+    for id in ids:
+        try:
+            _shim_release_session(
+                http, scidb_url, http_auth, verify, timeout, id)
+        except requests.RequestException as e:
+            logging.warning('Failed to release Shim session %s: %s', id, e)
+
+
+class SessionPool(object):
+    """Pool of Shim sessions. Sessions are created lazily, up to
+    ``max_size``, and each session is leased to one query at a
+    time. If all the sessions are leased, ``acquire`` blocks until a
+    session is released.
+
+    :param new_session: Callable which creates a new Shim session and
+      returns its ID
+
+    :param int max_size: Maximum number of sessions
+
+    """
+    def __init__(self, new_session, max_size):
+        self.new_session = new_session
+        self.max_size = max_size
+        # IDs of all the sessions created, released on finalize
+        self.ids = []
+
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            # Reserve a slot and create the session outside the lock
+            self._size += 1
+
+        try:
+            id = self.new_session()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.ids.append(id)
+        return id
+
+    def acquire_many(self, count):
+        """Acquire ``count`` sessions in one step. No session is held
+        while waiting, so concurrent callers cannot deadlock each
+        other. ``count`` cannot exceed ``max_size``."""
+        if count > self.max_size:
+            raise ValueError(
+                'Cannot acquire {} sessions from a pool of {}'.format(
+                    count, self.max_size))
+        with self._cond:
+            while len(self._idle) + self.max_size - self._size < count:
+                self._cond.wait()
+            ids = [self._idle.pop()
+                   for _ in range(min(count, len(self._idle)))]
+            new = count - len(ids)
+            # Reserve the slots and create the sessions outside the lock
+            self._size += new
+
+        try:
+            for _ in range(new):
+                id = self.new_session()
+                self.ids.append(id)
+                ids.append(id)
+        except Exception:
+            with self._cond:
+                self._size -= count - len(ids)
+                self._idle.extend(ids)
+                self._cond.notify_all()
+            raise
+        return ids
+
+    def release(self, id):
+        with self._cond:
+            self._idle.append(id)
+            # Wake up all the waiters, some might need several sessions
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def lease(self):
+        """Context manager which acquires a session and releases it on
+        exit"""
+        id = self.acquire()
+        try:
+            yield id
+        finally:
+            self.release(id)
+
+    @contextlib.contextmanager
+    def lease_many(self, count):
+        """Context manager which acquires ``count`` sessions in one
+        step and releases them on exit"""
+        ids = self.acquire_many(count)
+        try:
+            yield ids
+        finally:
+            for id in ids:
+                self.release(id)
+
+
+class SchemaCache(object):
+    """Least recently used cache of query output schemas, as returned
+    by ``show()``. The cache is keyed by the normalized query text and
+    the namespace. Entries are invalidated by hungry queries (e.g.,
+    ``store``, ``remove``) which change arrays referenced by the
+    cached queries. Changes made by other connections are not
+    detected. Use ``clear`` to invalidate all entries.
+
+    >>> c = SchemaCache(10)
+    >>> c.put(None, 'scan(foo)', Schema.fromstring('<x:int64>[i]'))
+    >>> print(c.get(None, 'scan( foo )'))
+    <x:int64> [i]
+    >>> c.invalidate('store(build(<x:int64>[i=0:2], i), bar)')
+    >>> print(c.get(None, 'scan(foo)'))
+    <x:int64> [i]
+    >>> c.invalidate('remove(foo)')
+    >>> print(c.get(None, 'scan(foo)'))
+    None
+    >>> c.hits, c.misses
+    (2, 1)
+
+    :param int max_size: Maximum number of cached schemas. If ``0``,
+      nothing is cached
+
+    """
+    _regex_token = re.compile(
+        "('(?:[^'\\\\]|\\\\.)*')|(\\s+)|(\\w+)|(.)", re.DOTALL)
+    _regex_word = re.compile('\\w')
+    _regex_call = re.compile('\\s*(\\w+)\\s*\\(')
+    _regex_array = re.compile(
+        "^\\s*'?\\s*(?:\\w+\\.)?(\\w+)(?:@\\d+)?\\s*'?\\s*$")
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '{}(max_size={!r}, size={!r}, hits={!r}, misses={!r})'.format(
+            type(self).__name__,
+            self.max_size,
+            len(self),
+            self.hits,
+            self.misses)
+
+    @staticmethod
+    def _normalize(query):
+        """Collapse white space outside of string literals. Return the
+        normalized query and the set of names it references."""
+        parts = []
+        names = set()
+        tokens = SchemaCache._regex_token.findall(query)
+        for (literal, space, name, other) in tokens:
+            if name:
+                names.add(name)
+            if space:
+                # Keep white space only between names
+                parts.append(' ')
+            else:
+                parts.append(literal or name or other)
+        out = []
+        for (pos, part) in enumerate(parts):
+            if (part == ' ' and
+                    not (0 < pos < len(parts) - 1 and
+                         SchemaCache._regex_word.match(parts[pos - 1]) and
+                         SchemaCache._regex_word.match(parts[pos + 1]))):
+                continue
+            out.append(part)
+        return ''.join(out), names
+
+    def get(self, namespace, query):
+        """Return a copy of the cached schema or ``None``"""
+        key = (namespace, SchemaCache._normalize(query)[0])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Move to the most recently used end
+            del self._entries[key]
+            self._entries[key] = entry
+        return copy.deepcopy(entry[0])
+
+    def put(self, namespace, query, schema):
+        if self.max_size <= 0:
+            return
+        (query, names) = SchemaCache._normalize(query)
+        entry = (copy.deepcopy(schema), names)
+        with self._lock:
+            self._entries.pop((namespace, query), None)
+            self._entries[(namespace, query)] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, query):
+        """Remove the entries which reference arrays changed by
+        ``query``. Non-hungry queries do not change any arrays."""
+        match = SchemaCache._regex_call.match(query)
+        if match:
+            name = match.group(1).lower()
+            if name not in ops_hungry:
+                return
+            positions = ops_hungry_arrays.get(name)
+        else:
+            # Not an AFL operator call, e.g., AQL "create array"
+            positions = None
+
+        if positions is not None:
+            args = _split_args(query[match.end():])
+            arrays = set()
+            for pos in positions:
+                array = (SchemaCache._regex_array.match(args[pos])
+                         if pos < len(args) else None)
+                if array is None:
+                    positions = None
+                    break
+                arrays.add(array.group(1))
+            if not arrays and positions is not None:
+                return
+
+        with self._lock:
+            if positions is None:
+                self._entries.clear()
+            else:
+                for key in [key for (key, entry) in self._entries.items()
+                            if entry[1] & arrays]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _cache_dir():
+    """Directory of the on-disk caches, ``SCIDBPY_CACHE_DIR`` or
+    ``~/.cache/scidbpy``"""
+    return os.getenv(
+        'SCIDBPY_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'scidbpy'))
+
+
+def _copy_result(res):
+    """Copy of a query result. Arrow tables are immutable."""
+    if _is_instance(res, 'pyarrow', 'Table'):
+        return res
+    return res.copy()
+
+
+class ResultCache(object):
+    """Least recently used cache of downloaded query results, limited
+    by their total size in bytes. The keys are set by the ``DB``
+    instance and include the versions of the arrays used by the
+    query, so results of arrays changed since are not returned. The
+    results are copied when stored and when returned, except for Arrow
+    tables, which are immutable.
+
+    >>> c = ResultCache(1024)
+    >>> c.put('foo', numpy.arange(10))
+    >>> c.get('foo')
+    array([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+    >>> c.put('bar', numpy.arange(120))
+    >>> print(c.get('foo'))
+    None
+    >>> c.nbytes, c.hits, c.misses
+    (960, 1, 1)
+
+    :param int max_bytes: Maximum total size of the cached results in
+      bytes. The size of object columns (e.g., strings) is
+      approximate. If ``0``, nothing is cached
+
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return ('{}(max_bytes={!r}, nbytes={!r}, size={!r}, hits={!r}, '
+                'misses={!r})').format(
+                    type(self).__name__,
+                    self.max_bytes,
+                    self.nbytes,
+                    len(self),
+                    self.hits,
+                    self.misses)
+
+    @staticmethod
+    def _size(res):
+        if _is_instance(res, 'pandas', 'DataFrame'):
+            return int(res.memory_usage(index=True, deep=True).sum())
+        return res.nbytes
+
+    def get(self, key):
+        """Return a copy of the cached result or ``None``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Move to the most recently used end
+            del self._entries[key]
+            self._entries[key] = entry
+        return _copy_result(entry[0])
+
+    def put(self, key, res):
+        if self.max_bytes <= 0:
+            return
+        size = ResultCache._size(res)
+        if size > self.max_bytes:
+            return
+        entry = (_copy_result(res), size)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = entry
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+class OpsCache(object):
+    """On-disk cache of the list of SciDB operators and macros, shared
+    by all the processes using the same directory. Entries are keyed
+    by the Shim URL, the SciDB user, and the namespace, and expire
+    after ``ttl`` seconds. Libraries loaded or unloaded by other
+    connections are only detected once the entry expires.
+
+    >>> import tempfile
+    >>> c = OpsCache(tempfile.mkdtemp(), 60)
+    >>> c.put(('http://localhost:8080', None, None), ['build', 'scan'])
+    >>> c.get(('http://localhost:8080', None, None))
+    ['build', 'scan']
+    >>> c.invalidate(('http://localhost:8080', None, None))
+    >>> print(c.get(('http://localhost:8080', None, None)))
+    None
+
+    :param string path: Cache directory, created if needed
+
+    :param float ttl: Number of seconds the entries are valid for
+
+    """
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(
+            type(self).__name__, self.path, self.ttl)
+
+    def _file(self, key):
+        digest = hashlib.sha1(json.dumps(list(key)).encode('utf-8'))
+        return os.path.join(
+            self.path, 'ops-{}.json'.format(digest.hexdigest()))
+
+    def get(self, key):
+        """Return the cached list of operators or ``None``"""
+        try:
+            with open(self._file(key)) as file:
+                entry = json.load(file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not 0 <= time.time() - entry['time'] <= self.ttl:
+            return None
+        return entry['operators']
+
+    def put(self, key, operators):
+        """Store the list of operators. The file is replaced atomically,
+        so concurrent readers never see a partial entry."""
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            (fd, path) = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'w') as file:
+                json.dump({'time': time.time(), 'operators': operators}, file)
+            getattr(os, 'replace', os.rename)(path, self._file(key))
+        except (IOError, OSError):
+            # The cache is an optimization only
+            logging.warning('Cannot write operators cache in %s', self.path)
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all the entries"""
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name.startswith('ops-') and name.endswith('.json'):
+                os.remove(os.path.join(self.path, name))
+
+
+def _split_args(args):
+    """Split the top level arguments of an operator call. ``args``
+    starts after the opening parenthesis."""
+    out = []
+    depth = 0
+    start = 0
+    quote = False
+    escape = False
+    for (pos, char) in enumerate(args):
+        if quote:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == "'":
+                quote = False
+        elif char == "'":
+            quote = True
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            if depth == 0:
+                out.append(args[start:pos])
+                return out
+            depth -= 1
+        elif char == ',' and depth == 0:
+            out.append(args[start:pos])
+            start = pos + 1
+    out.append(args[start:])
+    return out
+
+
 class DB(object):
     """SciDB Shim connection object.
 
@@ -99,15 +837,86 @@ class DB(object):
       argument (default ``None``)
 
     :param bool no_ops: If ``True``, the list of operators is not
-      fetched at this time and the connection is not implicitly
-      verified. This expedites the execution of the function but
-      disallows for calling the SciDB operators directly from the
-      ``DB`` instance e.g., ``db.scan`` (default ``False``)
+      fetched when first needed. This disallows for calling the SciDB
+      operators directly from the ``DB`` instance e.g., ``db.scan``,
+      until ``load_ops()`` is called (default ``False``)
+
+    :param int pool_size: Maximum number of persistent (keep-alive)
+      HTTP connections to Shim and maximum number of Shim sessions
+      kept open by this instance. Each query leases a Shim session for
+      its duration, so up to ``pool_size`` threads can run queries
+      concurrently using the same ``DB`` instance (default ``10``)
+
+    :param timeout: Timeout in seconds for Shim requests. It can be a
+      number or a ``(connect, read)`` tuple. This value is passed to
+      the Python ``requests`` library. If ``None``, wait forever
+      (default ``None``)
+
+    :param int retries: Number of times a Shim request is retried if
+      the connection to Shim cannot be established. Requests to
+      idempotent Shim endpoints (e.g., ``release_session``) are also
+      re-sent on connection errors and timeouts. Other requests are
+      never re-sent once sent (default ``3``)
+
+    :param int schema_cache_size: Maximum number of query output
+      schemas kept in the ``schema_cache``. Cached schemas are used
+      instead of running ``show()`` before downloading query
+      results. Changes made to arrays by other connections are not
+      detected, so enable the cache only if the arrays are not
+      changed by others. See :class:`SchemaCache` (default ``0``,
+      disabled)
+
+    :param string compression: Content encoding requested for the
+      data downloaded from Shim, ``'gzip'`` or ``'zstd'``. ``'zstd'``
+      requires the ``zstandard`` library. If Shim (or a proxy in
+      front of it) does not compress, the data is downloaded as
+      is. The sizes and the time spent are recorded in
+      ``transfer_stats``. See :class:`TransferStats` (default
+      ``None``)
+
+    :param bool compress_uploads: If ``True``, the uploaded data is
+      compressed using ``compression`` as well. Requires Shim (or a
+      proxy in front of it) to accept compressed request bodies
+      (default ``False``)
+
+    :param int result_cache_size: Maximum total size in bytes of the
+      downloaded results kept in the ``result_cache``. Repeated
+      downloads of the same query return a copy of the cached result,
+      as long as the arrays used by the query have no new
+      versions. Only queries which read arrays of the current
+      namespace are cached. See :class:`ResultCache` (default ``0``,
+      disabled)
+
+    :param int disk_cache_size: Maximum total size in bytes of the
+      downloaded results kept on disk in the ``disk_cache``, shared
+      with other processes and kept across restarts. Results are
+      looked up as for ``result_cache_size``, after the in-memory
+      cache. The cache directory is ``results`` in the directory set
+      by the ``SCIDBPY_CACHE_DIR`` environment variable, which
+      defaults to ``~/.cache/scidbpy``. See
+      :class:`DiskResultCache<scidbpy.cache.DiskResultCache>`
+      (default ``0``, disabled)
+
+    :param string disk_cache_format: File format of the results kept
+      on disk, ``'arrow'`` (Arrow IPC, Arrow results are read
+      memory-mapped) or ``'parquet'`` (default ``'arrow'``)
+
+    :param float ops_cache_ttl: If set, the list of operators is
+      cached on disk for this number of seconds and shared with other
+      processes, instead of being fetched from SciDB by every new
+      ``DB`` instance. The cache directory is set by the
+      ``SCIDBPY_CACHE_DIR`` environment variable and defaults to
+      ``~/.cache/scidbpy``. See :class:`OpsCache` (default ``None``)
 
     """
 
     _show_query = "show('{}', 'afl')"
 
+    # Operators are fetched on first use, see the operators property
+    _operators = None
+    _dir = None
+    _lazy_ops = False
+
     def __init__(
             self,
             scidb_url=None,
@@ -115,13 +924,49 @@ class DB(object):
             http_auth=None,
             namespace=None,
             verify=None,
-            no_ops=False):
+            no_ops=False,
+            pool_size=10,
+            timeout=None,
+            retries=3,
+            schema_cache_size=0,
+            compression=None,
+            compress_uploads=False,
+            ops_cache_ttl=None,
+            result_cache_size=0,
+            disk_cache_size=0,
+            disk_cache_format='arrow'):
         if scidb_url is None:
-            scidb_url = os.getenv('SCIDB_URL', 'http://localhost:8080')
+            scidb_url = DB._default_url()
+        if compression not in (None, 'gzip', 'zstd'):
+            raise ValueError(
+                'Unsupported compression {!r}'.format(compression))
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('zstd compression requires the zstandard '
+                              'library')
 
         self.scidb_url = scidb_url
         self.namespace = namespace
         self.verify = verify
+        self.timeout = timeout
+        self.retries = retries
+        self.compression = compression
+        self.compress_uploads = compress_uploads
+        self._http = _http_session(pool_size, retries, scidb_url)
+        self.schema_cache = SchemaCache(schema_cache_size)
+        self.result_cache = ResultCache(result_cache_size)
+        if disk_cache_size:
+            # Not imported with the package, so that it can run as
+            # "python -m scidbpy.cache"
+            from .cache import DiskResultCache
+            self.disk_cache = DiskResultCache(
+                os.path.join(_cache_dir(), 'results'),
+                disk_cache_size,
+                disk_cache_format)
+        else:
+            self.disk_cache = None
+        self.transfer_stats = TransferStats()
+        self.ops_cache = (OpsCache(_cache_dir(), ops_cache_ttl)
+                          if ops_cache_ttl else None)
 
         if http_auth:
             self._http_auth = requests.auth.HTTPDigestAuth(*http_auth)
@@ -130,34 +975,65 @@ class DB(object):
             self._http_auth = self.http_auth = None
 
         if scidb_auth:
-            self._id = self._shim(Shim.new_session,
-                                  user=scidb_auth[0],
-                                  password=scidb_auth[1]).text
             self.scidb_auth = (scidb_auth[0], Password_Placeholder())
         else:
-            self._id = self._shim(Shim.new_session).text
             self.scidb_auth = None
 
+        # Sessions are created on demand. The first session is created
+        # now to verify the connection.
+        self._sessions = SessionPool(
+            functools.partial(_shim_new_session,
+                              self._http,
+                              self.scidb_url,
+                              self._http_auth,
+                              self.verify,
+                              self.timeout,
+                              scidb_auth),
+            pool_size)
+        self._sessions.release(self._sessions.acquire())
+
         finalize(self,
-                 _shim_release_session,
+                 _shim_release_sessions,
+                 self._http,
                  self.scidb_url,
                  self._http_auth,
                  self.verify,
-                 self._id)
+                 self.timeout,
+                 self._sessions.ids)
 
         self.arrays = Arrays(self)
 
+        self._init_state()
+
+        self._ops_lock = threading.Lock()
+        self._lazy_ops = not no_ops
+
+    @property
+    def operators(self):
+        """List of SciDB operators and macros. The list is fetched from
+        SciDB on first use, unless ``no_ops`` is set. If
+        ``ops_cache_ttl`` is set, the list is read from the on-disk
+        cache, if available."""
+        if self._operators is None and self._lazy_ops:
+            with self._ops_lock:
+                if self._operators is None:
+                    operators = self._cached_ops()
+                    if operators is None:
+                        self.load_ops()
+                    else:
+                        self._set_ops(operators)
+        return self._operators
+
+    @staticmethod
+    def _default_url():
+        return os.getenv('SCIDB_URL', 'http://localhost:8080')
+
+    def _init_state(self):
         self._uid = uuid.uuid1().hex
         self._lock = threading.Lock()
         self._array_cnt = 0
         self._formatter = string.Formatter()
 
-        if no_ops:
-            self.operators = None
-            self._dir = None
-        else:
-            self.load_ops()
-
     def __iter__(self):
         return (i for i in (
             self.scidb_url,
@@ -187,6 +1063,8 @@ verify     = {}'''.format(*self)
                     type(self), name))
 
     def __dir__(self):
+        if self.operators is None:
+            return []
         return self._dir
 
     def iquery(self,
@@ -198,7 +1076,9 @@ verify     = {}'''.format(*self)
                dataframe_promo=True,
                schema=None,
                upload_data=None,
-               upload_schema=None):
+               upload_schema=None,
+               parallelism=1,
+               memmap=None):
         """Execute query in SciDB
 
         :param string query: SciDB AFL query to execute
@@ -208,20 +1088,35 @@ verify     = {}'''.format(*self)
 
         :param bool use_arrow: If ``True``, download SciDB array using
           Apache Arrow library. Requires ``accelerated_io_tools`` and
-          ``aio`` enabled in ``Shim``. (default ``False``)
+          ``aio`` enabled in ``Shim``. If ``as_dataframe`` is
+          ``False``, the Arrow data is returned as a ``pyarrow.Table``
+          without conversion. If ``schema`` is not provided and
+          ``atts_only`` is ``True``, the column names and types are
+          taken from the Arrow data and the array schema is not
+          requested from SciDB. In this case, duplicate column names
+          are made unique. If ``atts_only`` is ``False``, the schema
+          is still requested with ``show()``, since Shim writes the
+          dimensions after the attributes and they are only told
+          apart, and placed first, using the schema (default
+          ``False``)
 
         :param bool atts_only: If ``True``, download only SciDB array
           attributes without dimensions (default ``False``)
 
         :param bool as_dataframe: If ``True``, return a Pandas
-          DataFrame. If ``False``, return a NumPy array (default
+          DataFrame. If ``False``, return a NumPy array, or a
+          ``pyarrow.Table`` if ``use_arrow`` is ``True`` (default
           ``True``)
 
-        :param bool dataframe_promo: If ``True``, null-able types are
+        :param dataframe_promo: If ``True``, null-able types are
           promoted as per Pandas `promotion scheme
           <http://pandas.pydata.org/pandas-docs/stable/gotchas.html
-          #na-type-promotions>`_ If ``False``, object records are used
-          for null-able types (default ``True``)
+          #na-type-promotions>`_ If ``'nullable'``, Pandas nullable
+          extension types (e.g., ``Int64``, ``boolean``, ``string``)
+          are used instead, without loss of precision. See
+          :meth:`Schema.promote()<scidbpy.schema.Schema.promote>`. If
+          ``False``, object records are used for null-able types
+          (default ``True``)
 
         :param schema: Schema of the SciDB array to use when
           downloading the array. Schema is not verified. If schema is
@@ -229,6 +1124,40 @@ verify     = {}'''.format(*self)
           :py:class:``Schema`` object is built using
           :py:func:``Schema.fromstring`` (default ``None``)
 
+        :param int parallelism: If greater than ``1``, the download is
+          split in up to ``parallelism`` queries using ``between``,
+          along the first dimension with known bounds and chunk
+          length. The split is aligned to chunk boundaries. The
+          queries are executed concurrently, each on its own Shim
+          session, and the results are concatenated. If
+          ``upload_data`` is provided instead, it is split in up to
+          ``parallelism`` parts which are uploaded concurrently, each
+          on its own Shim session, and the ``input`` is replaced with
+          a ``union`` of per-part ``input`` operators. Only NumPy
+          arrays, Pandas DataFrames, or pyarrow Tables uploaded by
+          exactly one ``input({sch}, '{fn}', ...)`` operator are
+          split, e.g., not ``load``. The upload schema needs one
+          dimension with a known chunk length and the parts start on
+          chunk boundaries, so that ``union`` accepts them.
+          ``ValueError`` is raised if the query or the upload cannot
+          be split (default ``1``)
+
+        :param memmap: If set, the downloaded data is written to a file
+          instead of memory and a memory-mapped result is returned.
+          If ``use_arrow`` is ``True``, the Shim Arrow output is kept
+          as is and a ``pyarrow.Table`` is returned. Otherwise, if the
+          schema is fixed-size, the SciDB binary output is kept as is
+          and a NumPy ``memmap`` structured array is returned, as with
+          ``as_dataframe=False``: null-able attributes are ``(null,
+          val)`` records. Otherwise, the output is decoded and written
+          in the Arrow IPC format and a ``pyarrow.Table`` is returned,
+          with nulls stored as Arrow nulls and ``char`` and
+          ``binary`` attributes as Arrow ``binary``. ``as_dataframe``
+          is not used and ``parallelism`` is only supported for
+          uploads. If ``True``, a temporary file is used and removed
+          once mapped. Otherwise, the file is created at the given
+          path and kept (default ``None``)
+
         >>> DB().iquery('build(<x:int64>[i=0:1; j=0:1], i + j)', fetch=True)
            i  j    x
         0  0  0  0.0
@@ -245,139 +1174,783 @@ verify     = {}'''.format(*self)
         2  2  5
 
         """
+        # A callable schema is derived from the query, e.g., by
+        # Array.fetch. It is called only if the result is not cached
+        # and is not part of the result key, since the result is the
+        # same as without a schema.
+        derive_schema = schema if callable(schema) else None
+        if derive_schema is not None:
+            schema = None
+
+        # Serve repeated downloads from the result cache
+        key = None
+        if fetch and upload_data is None and not memmap:
+            key = self._result_key(query,
+                                   schema,
+                                   use_arrow,
+                                   atts_only,
+                                   as_dataframe,
+                                   dataframe_promo)
+        if key is not None:
+            res = self.result_cache.get(key)
+            if res is None and self.disk_cache is not None:
+                res = self.disk_cache.get(key)
+                if res is not None:
+                    self.result_cache.put(key, res)
+            if res is not None:
+                return res
+
+        if derive_schema is not None:
+            schema = derive_schema()
+        res = self._iquery(query,
+                           fetch,
+                           use_arrow,
+                           atts_only,
+                           as_dataframe,
+                           dataframe_promo,
+                           schema,
+                           upload_data,
+                           upload_schema,
+                           parallelism,
+                           memmap)
+        if key is not None:
+            self.result_cache.put(key, res)
+            if self.disk_cache is not None:
+                try:
+                    self.disk_cache.put(key, res, query)
+                except Exception as e:
+                    # The cache is an optimization only, e.g., some
+                    # results cannot be stored as Arrow tables
+                    logging.warning('Cannot write result cache in %s: %s',
+                                    self.disk_cache.path, e)
+        return res
+
+    def _iquery(self,
+                query,
+                fetch=False,
+                use_arrow=False,
+                atts_only=False,
+                as_dataframe=True,
+                dataframe_promo=True,
+                schema=None,
+                upload_data=None,
+                upload_schema=None,
+                parallelism=1,
+                memmap=None):
+        """Execute query in SciDB, without the result cache. See
+        ``iquery``."""
         # Special case: -- - set_namespace - --
-        if query.startswith('set_namespace(') and query[-1] == ')':
-            param = query[len('set_namespace('):-1]
-            # Unquote if quoted. Will be quoted when set in prefix.
-            if param[0] == "'" and param[-1] == "'":
-                param = param[1:-1]
-            self.namespace = param
+        if self._set_namespace(query):
             return
 
-        if upload_data is not None:
-            if isinstance(upload_data, numpy.ndarray):
-                if upload_schema is None:
+        if parallelism > 1 and upload_data is None and (
+                not fetch or memmap):
+            raise ValueError(
+                '"parallelism" requires "upload_data", or "fetch" ' +
+                'without "memmap"')
+
+        if fetch and parallelism > 1 and upload_data is None:
+            return self._iquery_parallel(query,
+                                         parallelism,
+                                         schema,
+                                         use_arrow=use_arrow,
+                                         atts_only=atts_only,
+                                         as_dataframe=as_dataframe,
+                                         dataframe_promo=dataframe_promo)
+
+        # Split the upload data in parts uploaded concurrently
+        upload_parts = None
+        if upload_data is not None and parallelism > 1:
+            # Each part needs its own session
+            upload_parts = DB._partition_upload(
+                query,
+                upload_data,
+                upload_schema,
+                min(parallelism, self._sessions.max_size))
+        if upload_parts is not None:
+            (query, upload_parts, upload_schema) = upload_parts
+        elif upload_data is not None:
+            upload_data, upload_schema = self._prepare_upload(
+                query, upload_data, upload_schema)
+
+        # Lease a Shim session for the duration of the query, and one
+        # more for each additional upload part, all at once. The
+        # uploaded parts are removed when their sessions are released.
+        with self._sessions.lease_many(
+                len(upload_parts) if upload_parts else 1) as ids:
+            id = ids[0]
+            if upload_parts is not None:
+                query = self._upload_parts(
+                    ids, query, upload_parts, upload_schema)
+            elif upload_data is not None:
+                fn = self._shim(Shim.upload, id, data=upload_data).text
+                query = DB._format_upload_query(query, fn, upload_schema)
+
+            if fetch and use_arrow and atts_only and not schema:
+                # The Arrow data carries its own schema. Dimensions
+                # need the schema to be placed before the attributes.
+                self._shim(Shim.execute_query,
+                           id,
+                           query=query,
+                           save='arrow',
+                           atts_only=int(atts_only))
+                if memmap:
+                    return self._fetch_memmap(id, None, True, memmap)
+                buf = self._shim(Shim.read_bytes, id, n=0).content
+
+                return DB._fetch_result(
+                    buf, None, True, as_dataframe, dataframe_promo)
+
+            elif fetch:
+                # Use provided schema or get schema from SciDB
+                if schema:
+                    schema = DB._copy_schema(schema, atts_only)
+                else:
+                    schema = self._fetch_schema(
+                        id, query, cache=upload_data is None)
+
+                query = DB._fetch_query(query, schema, atts_only)
+
+                # Execute Query and Download content
+                self._shim(Shim.execute_query,
+                           id,
+                           query=query,
+                           save=('arrow' if use_arrow
+                                 else schema.atts_fmt_scidb))
+                if memmap:
+                    return self._fetch_memmap(id, schema, use_arrow, memmap)
+                buf = self._shim(Shim.read_bytes, id, n=0).content
+
+                return DB._fetch_result(
+                    buf, schema, use_arrow, as_dataframe, dataframe_promo)
+
+            else:                   # fetch=False
+                self._shim(Shim.execute_query, id, query=query)
+
+        # Drop the cached schemas of the arrays changed by the query
+        self.schema_cache.invalidate(query)
+
+        # Special case: -- - load_library - --
+        if query.startswith(('load_library(', 'unload_library(')):
+            self._reset_ops()
+
+    def _fetch_memmap(self, id, schema, use_arrow, memmap):
+        """Write the query output to a file and return it memory
+        mapped. SciDB binary output with variable-size attributes is
+        decoded in batches and written in the Arrow IPC format."""
+        if memmap is True:
+            (fd, path) = tempfile.mkstemp(prefix='scidbpy-')
+            os.close(fd)
+        else:
+            path = memmap
+
+        try:
+            with open(path, 'wb') as file:
+                if use_arrow or schema.is_fixsize():
+                    resp = self._shim(Shim.read_bytes, id, stream=True, n=0)
                     try:
-                        upload_schema = Schema.fromdtype(upload_data.dtype)
-                    except Exception as e:
-                        warnings.warn(
-                            'Mapping NumPy dtype to SciDB schema failed. ' +
-                            'Try providing an explicit upload_schema')
-                        raise e
-
-                # Convert upload data to bytes
-                if upload_schema.is_fixsize():
-                    upload_data = upload_data.tobytes()
+                        shutil.copyfileobj(
+                            self._response_reader(resp), file, 2 ** 20)
+                    finally:
+                        resp.close()
                 else:
-                    upload_data = upload_schema.tobytes(upload_data)
+                    DB._write_arrow(
+                        file,
+                        schema,
+                        iter(functools.partial(self._read_page, id, 2 ** 20),
+                             b''))
 
-            # Check if placeholders are present
-            place_holders = set(
-                field_name
-                for _1, field_name, _3, _4 in self._formatter.parse(query))
-            if 'fn' not in place_holders:
-                warnings.warn(
-                    'upload_data provided, but {fn} placeholder is missing',
-                    stacklevel=2)
-            if 'fmt' in place_holders and upload_schema is None:
-                warnings.warn(
-                    'upload_data and {fmt} placeholder provided, ' +
-                    'but upload_schema is None',
-                    stacklevel=2)
-
-            # Check if upload data is bytes or file-like object
-            if not (isinstance(upload_data, bytes) or
-                    isinstance(upload_data, bytearray) or
-                    hasattr(upload_data, 'read')):
-                warnings.warn(
-                    'upload_data is not bytes or file-like object',
-                    stacklevel=2)
+            if use_arrow:
+                return pyarrow.RecordBatchStreamReader(
+                    pyarrow.memory_map(path)).read_all()
+            elif schema.is_fixsize():
+                if not os.path.getsize(path):
+                    return numpy.empty((0,), dtype=schema.atts_dtype)
+                return numpy.memmap(path, dtype=schema.atts_dtype, mode='r+')
+            else:
+                return pyarrow.RecordBatchFileReader(
+                    pyarrow.memory_map(path)).read_all()
+        finally:
+            # The mapping stays valid after the file is removed
+            if memmap is True:
+                os.remove(path)
+
+    @staticmethod
+    def _arrow_schema(schema):
+        """Arrow schema of the DataFrame pages written by
+        ``_write_arrow``, from the SciDB schema. Object columns hold
+        ``bytes`` values, e.g., null-able ``char`` or ``binary``
+        attributes. The types are not inferred from the data, since a
+        page where all the values are null has the ``null`` type."""
+        data = DB._fetch_result(b'', schema, False, True, 'nullable')
+        nullable = dict((a.name, not a.not_null) for a in schema.atts)
+        return pyarrow.schema(
+            pyarrow.field(name,
+                          pyarrow.binary()
+                          if data[name].dtype == object
+                          else pyarrow.Array.from_pandas(data[name]).type,
+                          nullable.get(name, False))
+            for name in data)
+
+    @staticmethod
+    def _write_arrow(file, schema, pages, batch_size=100000):
+        """Decode pages of SciDB binary data and write them in the Arrow
+        IPC file format"""
+        decoder = _BatchDecoder(schema, batch_size)
+        arrow_schema = DB._arrow_schema(schema)
+        writer = pyarrow.RecordBatchFileWriter(file, arrow_schema)
+        for page in itertools.chain(pages, (b'',)):
+            for buf in decoder.feed(page):
+                writer.write_table(pyarrow.Table.from_pandas(
+                    DB._fetch_result(buf, schema, False, True, 'nullable'),
+                    schema=arrow_schema,
+                    preserve_index=False))
+        writer.close()
+
+    def _result_key(self, query, schema, *args):
+        """Key of the query result in the result cache. It includes the
+        SciDB URL and user, the normalized query, the download
+        arguments, and the latest versions of the arrays used by the
+        query. Return ``None`` if the result is not cached."""
+        if self.result_cache.max_bytes <= 0 and self.disk_cache is None:
+            return None
+        (normalized, names) = SchemaCache._normalize(query)
+        names = set(name for name in names if _regex_name.match(name))
+        if any(name.lower() in ops_hungry or name.lower() in ops_volatile
+               for name in names):
+            return None
+        if self._operators:
+            names.difference_update(self._operators)
+        versions = self._array_versions(names, DB._qualifiers(query))
+        if not versions:
+            return None
+        return ((self.scidb_url,
+                 self.scidb_auth and self.scidb_auth[0],
+                 self.namespace,
+                 normalized,
+                 schema and str(schema)) +
+                args +
+                (versions,))
+
+    @staticmethod
+    def _qualifiers(query):
+        """Names followed by a dot in the query, e.g., ``foo`` in
+        ``foo.x`` or ``ns`` in ``ns.bar``"""
+        tokens = [literal or name or other
+                  for (literal, space, name, other)
+                  in SchemaCache._regex_token.findall(query)
+                  if not space]
+        return set(tokens[pos - 1]
+                   for pos in range(1, len(tokens) - 1)
+                   if (tokens[pos] == '.' and
+                       _regex_name.match(tokens[pos - 1]) and
+                       _regex_name.match(tokens[pos + 1])))
+
+    def _array_versions(self, names, qualifiers=()):
+        """Latest version IDs of the arrays with the given names, in a
+        single query. Names which are not arrays are ignored. Return
+        ``None`` if any of the arrays is temporary, since temporary
+        arrays change without new versions, or if any of the
+        ``qualifiers`` is not an array, since arrays in other
+        namespaces, e.g., ``ns.bar``, are not listed."""
+        if not names:
+            return ()
+        with self._sessions.lease() as id:
+            self._shim(
+                Shim.execute_query,
+                id,
+                query=("project(filter(list('arrays', true), "
+                       "regex(name, '^({})(@[0-9]+)?$')), "
+                       "name, aid, temporary)").format(
+                           '|'.join(sorted(names))),
+                save='tsv')
+            lines = self._shim_readlines(id)
+
+        versions = {}
+        for (name, aid, temporary) in lines:
+            if temporary == 'true':
+                return None
+            name = name.split('@')[0]
+            versions[name] = max(versions.get(name, 0), int(aid))
+        if any(name not in versions for name in qualifiers):
+            return None
+        return tuple(sorted(versions.items()))
+
+    def _iquery_parallel(self, query, parallelism, schema, **kwargs):
+        """Download the query output using up to ``parallelism``
+        concurrent queries"""
+        if schema:
+            schema = DB._copy_schema(schema, False)
+        else:
+            with self._sessions.lease() as id:
+                schema = self._fetch_schema(id, query)
+
+        queries = DB._partition_queries(query, schema, parallelism)
+
+        # The Arrow data carries its own schema
+        if kwargs.get('use_arrow') and kwargs.get('atts_only'):
+            schema = None
+        if queries is None:
+            return self._iquery(query, fetch=True, schema=schema, **kwargs)
+
+        pool = multiprocessing.pool.ThreadPool(len(queries))
+        try:
+            parts = pool.map(
+                lambda q: self._iquery(q,
+                                       fetch=True,
+                                       schema=copy.deepcopy(schema),
+                                       **kwargs),
+                queries)
+        finally:
+            pool.terminate()
+        return DB._concat(parts)
+
+    @staticmethod
+    def _partition_queries(query, schema, parts):
+        """Split the query in at most ``parts`` ``between`` queries
+        along the first dimension with known bounds and chunk
+        length. Each query covers a range of whole chunks. Return
+        ``None`` if the query cannot be split."""
+        for (pos, dim) in enumerate(schema.dims):
+            if (all(isinstance(v, six.integer_types)
+                    for v in (dim.low_value,
+                              dim.high_value,
+                              dim.chunk_length)) and
+                    dim.chunk_length > 0):
+                break
+        else:
+            return None
+
+        chunks = (dim.high_value - dim.low_value) // dim.chunk_length + 1
+        parts = min(parts, chunks)
+        if parts < 2:
+            return None
+
+        queries = []
+        for part in range(parts):
+            low = ['null'] * len(schema.dims)
+            high = ['null'] * len(schema.dims)
+            low[pos] = str(dim.low_value +
+                           chunks * part // parts * dim.chunk_length)
+            high[pos] = str(min(dim.low_value +
+                                chunks * (part + 1) // parts *
+                                dim.chunk_length - 1,
+                                dim.high_value))
+            queries.append('between({}, {}, {})'.format(
+                query, ', '.join(low), ', '.join(high)))
+        return queries
+
+    @staticmethod
+    def _concat(parts):
+        """Concatenate partial results"""
+        if _is_instance(parts[0], 'pandas', 'DataFrame'):
+            return pandas.concat(parts, ignore_index=True)
+        elif _is_instance(parts[0], 'pyarrow', 'Table'):
+            return pyarrow.concat_tables(parts)
+        else:
+            return numpy.concatenate(parts)
+
+    def iquery_iter(self,
+                    query,
+                    batch_size=100000,
+                    page_size=2 ** 20,
+                    atts_only=False,
+                    as_dataframe=True,
+                    dataframe_promo=True,
+                    schema=None,
+                    upload_data=None,
+                    upload_schema=None,
+                    use_arrow=False):
+        """Execute query in SciDB and download the result in batches.
+        Return a generator of NumPy arrays or Pandas DataFrames with
+        ``batch_size`` cells each (the last batch might be
+        smaller). The result is downloaded from Shim in pages of at
+        most ``page_size`` bytes, so only one page and one batch are
+        held in memory at a time.
+
+        A Shim session is leased until the generator is exhausted or
+        closed.
+
+        :param int batch_size: Number of cells in each batch (default
+          ``100000``)
+
+        :param int page_size: Maximum number of bytes downloaded from
+          Shim in one request (default ``1048576``)
+
+        :param bool use_arrow: If ``True``, download the result in
+          Apache Arrow format and yield each record batch as it is
+          read from the Shim response stream, as a ``pyarrow.RecordBatch``
+          if ``as_dataframe`` is ``False`` or converted to a Pandas
+          DataFrame otherwise. The batches are as written by SciDB;
+          ``batch_size`` and ``page_size`` are not used (default
+          ``False``)
+
+        The rest of the parameters are the same as for
+        :meth:`iquery()<DB.iquery>`.
+
+        >>> for batch in DB().iquery_iter(
+        ...         'build(<x:int64 not null>[i=0:4], i)', batch_size=2):
+        ...     print(batch.shape)
+        (2, 2)
+        (2, 2)
+        (1, 2)
+
+        """
+        if upload_data is not None:
+            upload_data, upload_schema = self._prepare_upload(
+                query, upload_data, upload_schema)
 
-            fn = self._shim(Shim.upload, data=upload_data).text
-            query = query.format(
-                sch=upload_schema,
-                fn=fn,
-                fmt=upload_schema.atts_fmt_scidb if upload_schema else None)
+        with self._sessions.lease() as id:
+            if upload_data is not None:
+                fn = self._shim(Shim.upload, id, data=upload_data).text
+                query = DB._format_upload_query(query, fn, upload_schema)
+
+            if use_arrow:
+                # Use provided schema, if any. The Arrow data carries
+                # its own schema, but dimensions need the schema to
+                # be placed before the attributes.
+                if schema:
+                    schema = DB._copy_schema(schema, atts_only)
+                elif not atts_only:
+                    schema = self._fetch_schema(
+                        id, query, cache=upload_data is None)
+                if schema:
+                    query = DB._fetch_query(query, schema, atts_only)
+                self._shim(Shim.execute_query,
+                           id,
+                           query=query,
+                           save='arrow',
+                           atts_only=int(atts_only or bool(schema)))
+
+                # Read record batches from the response as they arrive
+                resp = self._shim(Shim.read_bytes, id, stream=True, n=0)
+                try:
+                    for batch in pyarrow.RecordBatchStreamReader(
+                            self._response_reader(resp)):
+                        batch = DB._arrow_unique(batch)
+                        yield batch.to_pandas() if as_dataframe else batch
+                finally:
+                    resp.close()
+                return
 
-        if fetch:
             # Use provided schema or get schema from SciDB
             if schema:
-                # Deep-copy schema since we might be mutating it
-                if isinstance(schema, Schema):
-                    if not atts_only:
-                        schema = copy.deepcopy(schema)
-                else:
-                    schema = Schema.fromstring(schema)
+                schema = DB._copy_schema(schema, atts_only)
             else:
-                # Execute 'show(...)' and Download text
-                self._shim(
-                    Shim.execute_query,
-                    query=DB._show_query.format(query.replace("'", "\\'")),
-                    save='tsv')
-                schema = Schema.fromstring(
-                    self._shim(Shim.read_lines, n=0).text)
-
-            # Attributes and dimensions can collide. Run make_unique to
-            # remove any collisions.
-            #
-            # make_unique fixes any collision, but if we don't
-            # download the dimensions, we don't need to fix collisions
-            # between dimensions and attributes. So, we use
-            # make_unique only if there are collisions within the
-            # attribute names.
-            if ((not atts_only or
-                 len(set((a.name for a in schema.atts))) <
-                 len(schema.atts)) and schema.make_unique()):
-                # Dimensions or attributes were renamed due to
-                # collisions. We need to cast.
-                query = 'cast({}, {:h})'.format(query, schema)
-
-            # Unpack
-            if not atts_only:
-                # apply: add dimensions as attributes
-                # project: place dimensions first
-                query = 'project(apply({}, {}), {})'.format(
-                    query,
-                    ', '.join('{0}, {0}'.format(d.name) for d in schema.dims),
-                    ', '.join(i.name for i in itertools.chain(
-                        schema.dims, schema.atts)))
+                schema = self._fetch_schema(
+                    id, query, cache=upload_data is None)
 
-                # update schema after apply
-                schema.make_dims_atts()
-
-            # Execute Query and Download content
+            query = DB._fetch_query(query, schema, atts_only)
             self._shim(Shim.execute_query,
+                       id,
                        query=query,
-                       save='arrow' if use_arrow else schema.atts_fmt_scidb)
-            buf = self._shim(Shim.read_bytes, n=0).content
-
-            # Build result
-            if use_arrow:
-                data = pyarrow.RecordBatchStreamReader(
-                    pyarrow.BufferReader(buf)).read_pandas()
-            elif schema.is_fixsize():
-                data = numpy.frombuffer(buf, dtype=schema.atts_dtype)
+                       save=schema.atts_fmt_scidb)
+
+            decoder = _BatchDecoder(schema, batch_size)
+            while True:
+                page = self._read_page(id, page_size)
+                for buf in decoder.feed(page):
+                    yield DB._fetch_result(
+                        buf, schema, False, as_dataframe, dataframe_promo)
+                if not page:
+                    break
+
+    def _array_schema(self, array):
+        """Schema of a stored array, given as an ``Array`` or a name, if
+        known without asking SciDB, i.e., from the schema cache, where
+        it is discarded when the array is changed. Return ``None``
+        otherwise."""
+        return self.schema_cache.get(self.namespace, str(array))
+
+    def _fetch_schema(self, id, query, cache=True):
+        """Get the schema of the query output from the schema cache or
+        from SciDB using ``show()``"""
+        if cache:
+            schema = self.schema_cache.get(self.namespace, query)
+            if schema is not None:
+                return schema
+
+        # Execute 'show(...)' and Download text
+        self._shim(
+            Shim.execute_query,
+            id,
+            query=DB._show_query.format(query.replace("'", "\\'")),
+            save='tsv')
+        schema = Schema.fromstring(self._shim(Shim.read_lines, id, n=0).text)
+        if cache:
+            self.schema_cache.put(self.namespace, query, schema)
+        return schema
+
+    def _read_page(self, id, page_size):
+        """Read the next page of the query output. Return empty bytes
+        at the end of the output."""
+        try:
+            return self._shim(Shim.read_bytes, id, n=page_size).content
+        except requests.HTTPError as e:
+            # Shim responds with "410 Gone" at the end of the output
+            if e.response is not None and e.response.status_code == 410:
+                return b''
+            raise
+
+    def _set_namespace(self, query):
+        """Handle ``set_namespace(...)`` queries locally. Return ``True``
+        if the query was handled."""
+        if query.startswith('set_namespace(') and query[-1] == ')':
+            param = query[len('set_namespace('):-1]
+            # Unquote if quoted. Will be quoted when set in prefix.
+            if param[0] == "'" and param[-1] == "'":
+                param = param[1:-1]
+            self.namespace = param
+            return True
+        return False
+
+    def _prepare_upload(self, query, upload_data, upload_schema):
+        """Convert upload data to bytes, if necessary, and check the query
+        placeholders. Return the upload data and schema. An iterable
+        of chunks is converted to a generator of bytes, encoded as it
+        is consumed."""
+        if _is_upload_iter(upload_data):
+            # Map the upload schema from the first chunk
+            chunks = iter(upload_data)
+            first = next(chunks, b'')
+            upload_data = itertools.chain((first,), chunks)
+        else:
+            first = upload_data
 
-                if as_dataframe:
-                    data = pandas.DataFrame.from_records(data)
+        if upload_schema is None and _is_upload_type(first):
+            try:
+                upload_schema = DB._upload_schema(first)
+            except Exception as e:
+                warnings.warn(
+                    'Mapping {} types to SciDB schema failed. '.format(
+                        type(first).__name__) +
+                    'Try providing an explicit upload_schema')
+                raise e
+
+        # Convert upload data to bytes
+        if _is_upload_iter(upload_data):
+            upload_data = _upload_chunks(upload_data, upload_schema)
+        else:
+            upload_data = _upload_bytes(upload_data, upload_schema)
 
-                    if dataframe_promo:
-                        schema.promote(data)
+        # Check if placeholders are present
+        place_holders = set(
+            field_name
+            for _1, field_name, _3, _4 in self._formatter.parse(query))
+        if 'fn' not in place_holders:
+            warnings.warn(
+                'upload_data provided, but {fn} placeholder is missing',
+                stacklevel=3)
+        if 'fmt' in place_holders and upload_schema is None:
+            warnings.warn(
+                'upload_data and {fmt} placeholder provided, ' +
+                'but upload_schema is None',
+                stacklevel=3)
+
+        # Check if upload data is bytes, file-like object, or chunks
+        if not (isinstance(upload_data, bytes) or
+                isinstance(upload_data, bytearray) or
+                hasattr(upload_data, 'read') or
+                _is_upload_iter(upload_data)):
+            warnings.warn(
+                'upload_data is not bytes, file-like object, or iterable',
+                stacklevel=3)
+
+        return upload_data, upload_schema
+
+    @staticmethod
+    def _upload_schema(upload_data):
+        """Map the types of the upload data to an upload schema"""
+        if _is_instance(upload_data, 'pandas', 'DataFrame'):
+            return Schema.fromdataframe(upload_data)
+        elif _is_instance(upload_data, 'pyarrow', 'Table'):
+            return Schema.fromarrow(upload_data.schema)
+        return Schema.fromdtype(upload_data.dtype)
+
+    @staticmethod
+    def _format_upload_query(query, fn, upload_schema, **kwargs):
+        """Replace the upload placeholders in the query"""
+        return query.format(
+            sch=upload_schema,
+            fn=fn,
+            fmt=upload_schema.atts_fmt_scidb if upload_schema else None,
+            **kwargs)
+
+    @staticmethod
+    def _partition_upload(query, upload_data, upload_schema, parts):
+        """Split the upload data in at most ``parts`` parts of whole
+        chunks of consecutive cells. Replace the ``input({sch}, '{fn}',
+        ...)`` operator in the query with a ``union`` of ``input``
+        operators, one for each part, with ``{fn_N}`` placeholders.
+        The parts keep the attributes, chunk length, and chunk overlap
+        of the upload schema, as required by ``union``, and start on
+        chunk boundaries. Return the query, a list of part data and
+        schema pairs, and the upload schema, or ``None`` if the data
+        fits in one part. Raise ``ValueError`` if the upload cannot be
+        split."""
+        if not _is_upload_type(upload_data):
+            raise ValueError(
+                'Only NumPy arrays, Pandas DataFrames, or pyarrow Tables ' +
+                'can be uploaded in parallel')
+        matches = _regex_upload_input.findall(query)
+        if len(matches) != 1:
+            raise ValueError(
+                "Parallel uploads require exactly one " +
+                "input({sch}, '{fn}', ...) operator in the query")
+        if upload_schema is None:
+            upload_schema = DB._upload_schema(upload_data)
+        dim = upload_schema.dims[0] if upload_schema.dims else None
+        if (len(upload_schema.dims) != 1 or
+                not isinstance(dim.chunk_length, six.integer_types)):
+            raise ValueError(
+                'Parallel uploads require an upload schema with one ' +
+                'dimension and a known chunk length, ' +
+                'e.g., [i=0:*:0:1000000], got {}'.format(upload_schema))
+
+        cnt = len(upload_data)
+        chunks = -(-cnt // dim.chunk_length)
+        size = -(-chunks // parts) * dim.chunk_length
+        if size >= cnt:
+            return None
+        low = dim.low_value
+        if not isinstance(low, six.integer_types):
+            low = 0
+        overlap = dim.chunk_overlap
+        if overlap is None:
+            overlap = 0
+        upload_parts = []
+        inputs = []
+        for (pos, start) in enumerate(range(0, cnt, size)):
+            if _is_instance(upload_data, 'pyarrow', 'Table'):
+                data = upload_data.slice(start, size)
+            elif _is_instance(upload_data, 'pandas', 'DataFrame'):
+                data = upload_data.iloc[start:start + size]
             else:
-                # Parse binary buffer
-                data = schema.frombytes(buf, as_dataframe, dataframe_promo)
-
-                if as_dataframe:
-                    data = pandas.DataFrame.from_records(data)
-
+                data = upload_data[start:start + size]
+            # Only the start changes, on a chunk boundary, so that the
+            # parts can be combined with union
+            schema = Schema(None,
+                            upload_schema.atts,
+                            (Dimension(dim.name,
+                                       low + start,
+                                       dim.high_value,
+                                       overlap,
+                                       dim.chunk_length),))
+            upload_parts.append((data, schema))
+            inputs.append("input({}, '{{fn_{}}}'{})".format(
+                schema, pos, matches[0]))
+
+        query = _regex_upload_input.sub(
+            lambda m: 'union({})'.format(', '.join(inputs)), query)
+        return query, upload_parts, upload_schema
+
+    def _upload_parts(self, ids, query, upload_parts, upload_schema):
+        """Upload the parts concurrently, each using its own session,
+        and replace the upload placeholders in the query"""
+        pool = multiprocessing.pool.ThreadPool(len(upload_parts))
+        try:
+            fns = pool.map(
+                lambda args: self._shim(
+                    Shim.upload,
+                    args[0],
+                    data=_upload_bytes(*args[1])).text,
+                zip(ids, upload_parts))
+        finally:
+            pool.terminate()
+        return DB._format_upload_query(
+            query,
+            None,
+            upload_schema,
+            **dict(('fn_{}'.format(pos), fn) for (pos, fn) in enumerate(fns)))
+
+    @staticmethod
+    def _copy_schema(schema, atts_only):
+        """Deep-copy schema since we might be mutating it"""
+        if isinstance(schema, Schema):
+            if not atts_only:
+                schema = copy.deepcopy(schema)
+        else:
+            schema = Schema.fromstring(schema)
+        return schema
+
+    @staticmethod
+    def _fetch_query(query, schema, atts_only):
+        """Wrap the query for download. Update the schema to match the
+        downloaded data."""
+        # Attributes and dimensions can collide. Run make_unique to
+        # remove any collisions.
+        #
+        # make_unique fixes any collision, but if we don't
+        # download the dimensions, we don't need to fix collisions
+        # between dimensions and attributes. So, we use
+        # make_unique only if there are collisions within the
+        # attribute names.
+        if ((not atts_only or
+             len(set((a.name for a in schema.atts))) <
+             len(schema.atts)) and schema.make_unique()):
+            # Dimensions or attributes were renamed due to
+            # collisions. We need to cast.
+            query = 'cast({}, {:h})'.format(query, schema)
+
+        # Unpack
+        if not atts_only:
+            # apply: add dimensions as attributes
+            # project: place dimensions first
+            query = 'project(apply({}, {}), {})'.format(
+                query,
+                ', '.join('{0}, {0}'.format(d.name) for d in schema.dims),
+                ', '.join(i.name for i in itertools.chain(
+                    schema.dims, schema.atts)))
+
+            # update schema after apply
+            schema.make_dims_atts()
+
+        return query
+
+    @staticmethod
+    def _arrow_unique(data):
+        """Make the column names of the Arrow table or record batch
+        unique, as in :meth:`Schema.make_unique()
+        <scidbpy.schema.Schema.make_unique>`"""
+        names = data.schema.names
+        if len(set(names)) == len(names):
             return data
+        schema = Schema(None, (Attribute(n, 'int64') for n in names), ())
+        schema.make_unique()
+        names = [a.name for a in schema.atts]
+        if _is_instance(data, 'pyarrow', 'Table'):
+            return data.rename_columns(names)
+        return pyarrow.RecordBatch.from_arrays(data.columns, names=names)
+
+    @staticmethod
+    def _fetch_result(buf, schema, use_arrow, as_dataframe, dataframe_promo):
+        """Build the result from the downloaded buffer"""
+        if use_arrow:
+            # The table references the buffer without copying
+            data = DB._arrow_unique(pyarrow.RecordBatchStreamReader(
+                pyarrow.BufferReader(buf)).read_all())
+            if as_dataframe:
+                data = data.to_pandas()
+        elif schema.is_fixsize():
+            data = numpy.frombuffer(buf, dtype=schema.atts_dtype)
+
+            if as_dataframe:
+                # Build and promote each column directly from the
+                # downloaded buffer
+                data = schema.todataframe(data, dataframe_promo)
+        else:
+            # Parse binary buffer. Nullable extension types are built
+            # from the null and value fields.
+            nullable = dataframe_promo == 'nullable'
+            data = schema.frombytes(buf,
+                                    as_dataframe,
+                                    dataframe_promo and not nullable)
 
-        else:                   # fetch=False
-            self._shim(Shim.execute_query, query=query)
+            if as_dataframe:
+                data = schema.todataframe(
+                    data, 'nullable' if nullable else False)
 
-            # Special case: -- - load_library - --
-            if query.startswith('load_library('):
-                self.load_ops()
+        return data
 
     def iquery_readlines(self, query):
         """Execute query in SciDB
@@ -391,10 +1964,103 @@ verify     = {}'''.format(*self)
         ... # doctest: +ELLIPSIS
         [[...'0', ...'10'], [...'1', ...'11'], [...'2', ...'12']]
         """
-        self._shim(Shim.execute_query, query=query, save='tsv')
-        ret = self._shim_readlines()
+        with self._sessions.lease() as id:
+            self._shim(Shim.execute_query, id, query=query, save='tsv')
+            ret = self._shim_readlines(id)
+        self.schema_cache.invalidate(query)
         return ret
 
+    def _getitem(self, query, key, schema, **kwargs):
+        """Download the part of the query output selected by ``key``.
+        The selection is done in SciDB, if possible, so that only the
+        selected cells are downloaded:
+
+        * ``[start:stop]`` selects cells by position using ``limit``
+
+        * ``['name']`` or ``[['name', ...]]`` selects attributes using
+          ``project``; dimensions are always included
+
+        * ``[coord, start:stop, ...]`` selects cells by dimension
+          coordinates using ``between``; the ``stop`` coordinate is
+          excluded, as in Python slices
+
+        Other keys, e.g., integers, are applied to the entire
+        downloaded output, so ``[pos]`` is a column lookup on
+        DataFrames. The rows selected in SciDB are numbered from
+        ``0``; the cells are identified by their dimension values.
+        Slices applied to the downloaded output, e.g., with negative
+        positions, keep its index.
+
+        :param callable schema: Function returning the query output
+          schema. The schema is used for the downloads, so the output
+          of the selection queries is not inspected with ``show()``.
+
+        """
+        def fetch(query, schema):
+            return self.iquery(query, fetch=True, schema=schema, **kwargs)
+
+        # Positions: limit
+        if isinstance(key, slice) and key.step in (None, 1):
+            start = 0 if key.start is None else key.start
+            if (start == 0 and key.stop is None or
+                    not all(isinstance(i, six.integer_types) and i >= 0
+                            for i in (start, key.stop)) or
+                    key.stop <= start or
+                    not self.operators or 'limit' not in self.operators):
+                return fetch(query, schema())[key]
+            return fetch(DB._limit_query(query, key.stop - start, start),
+                         schema())
+
+        # Attributes: project
+        if isinstance(key, six.string_types) or (
+                isinstance(key, list) and
+                key and
+                all(isinstance(i, six.string_types) for i in key)):
+            sch = schema()
+            names = [key] if isinstance(key, six.string_types) else key
+            atts = [a.name for a in sch.atts]
+            dims = [d.name for d in sch.dims]
+            if not all(i in atts or i in dims for i in names):
+                return fetch(query, sch)[key]
+            # At least one attribute is required by project
+            prj = [i for i in names if i in atts] or atts[:1]
+            return fetch('project({}, {})'.format(query, ', '.join(prj)),
+                         Schema(None,
+                                (a for i in prj
+                                 for a in sch.atts if a.name == i),
+                                sch.dims))[key]
+
+        # Coordinates: between
+        if isinstance(key, tuple):
+            sch = schema()
+            if len(key) > len(sch.dims):
+                raise IndexError(
+                    'too many indices: {} for {} dimensions'.format(
+                        len(key), len(sch.dims)))
+            low = ['null'] * len(sch.dims)
+            high = ['null'] * len(sch.dims)
+            for (pos, i) in enumerate(key):
+                if isinstance(i, slice):
+                    if i.step not in (None, 1):
+                        raise NotImplementedError(
+                            'Slices with step are not supported')
+                    if i.start is not None:
+                        low[pos] = str(int(i.start))
+                    if i.stop is not None:
+                        high[pos] = str(int(i.stop) - 1)
+                else:
+                    low[pos] = high[pos] = str(int(i))
+            return fetch('between({}, {}, {})'.format(
+                query, ', '.join(low), ', '.join(high)), sch)
+
+        return fetch(query, schema())[key]
+
+    @staticmethod
+    def _limit_query(query, count, offset):
+        if offset:
+            return 'limit({}, {}, {})'.format(query, count, offset)
+        return 'limit({}, {})'.format(query, count)
+
     def next_array_name(self):
         """Generate a uniqu array name. Keep track on these names using the
            _uid field and a counter
@@ -407,60 +2073,161 @@ verify     = {}'''.format(*self)
     def load_ops(self):
         """Get list of operators and macros.
         """
-        query_id = self._shim(
-            Shim.execute_query,
-            query="project(list('operators'), name)",
-            save='tsv').text  # set query ID as DB instance ID
-        operators = self._shim_readlines()
-
-        self._shim(
-            Shim.execute_query,
-            query="project(list('macros'), name)",
-            save='tsv').content
-        macros = self._shim_readlines()
-
-        self.operators = operators + macros
+        with self._sessions.lease() as id:
+            try:
+                self._shim(Shim.execute_query, id, query=_ops_query,
+                           save='tsv')
+                operators = self._shim_readlines(id)
+            except requests.HTTPError:
+                operators = []
+                for query in _ops_queries:
+                    self._shim(Shim.execute_query, id, query=query,
+                               save='tsv')
+                    operators += self._shim_readlines(id)
+
+        self._set_ops(operators)
+        if self.ops_cache is not None:
+            self.ops_cache.put(self._ops_key(), operators)
+
+    def _ops_key(self):
+        return (self.scidb_url,
+                self.scidb_auth and self.scidb_auth[0],
+                self.namespace)
+
+    def _cached_ops(self):
+        """List of operators from the on-disk cache or ``None``"""
+        if self.ops_cache is None:
+            return None
+        return self.ops_cache.get(self._ops_key())
+
+    def _reset_ops(self):
+        """Drop the list of operators, including the on-disk cache
+        entry. It is fetched again on first use."""
+        self._lazy_ops = True
+        self._operators = None
+        if self.ops_cache is not None:
+            self.ops_cache.invalidate(self._ops_key())
+
+    def _set_ops(self, operators):
+        self._operators = operators
         self._dir = (self.operators +
                      ['arrays',
                       'gc',
                       'iquery',
+                      'iquery_iter',
                       'iquery_readlines',
                       'upload'])
         self._dir.sort()
 
-    def _shim(self, endpoint, **kwargs):
-        """Make request on Shim endpoint"""
+    def _shim(self, endpoint, id=None, stream=False, **kwargs):
+        """Make request on Shim endpoint using the given session ID. If
+        ``stream`` is ``True``, the response content is not read."""
 
         if endpoint != Shim.new_session:
-            kwargs.update(id=self._id)
+            kwargs.update(id=id)
 
         # Add prefix to request, if necessary
         if self.namespace and endpoint == Shim.execute_query:
             kwargs['prefix'] = "set_namespace('{}')".format(self.namespace)
 
+        # Request compressed data, if enabled
+        headers = {}
+        compressed = self.compression and endpoint in (Shim.read_bytes,
+                                                       Shim.read_lines)
+        if compressed:
+            headers['Accept-Encoding'] = self.compression
+
         # Make request
         url = requests.compat.urljoin(self.scidb_url, endpoint.value)
         if endpoint == Shim.upload:  # Post request
-            req = requests.post(
+            data = kwargs['data']
+            if self.compression and self.compress_uploads:
+                headers['Content-Encoding'] = self.compression
+                data = self._compress(data)
+            req = _shim_request(
+                self._http,
                 '{}?id={}'.format(url, kwargs['id']),
-                data=kwargs['data'],
+                data=data,
+                headers=headers,
                 auth=self._http_auth,
-                verify=self.verify)
+                verify=self.verify,
+                timeout=self.timeout)
         else:                        # Get request
-            req = requests.get(
+            req = _shim_request(
+                self._http,
                 url,
                 params=kwargs,
+                headers=headers,
                 auth=self._http_auth,
-                verify=self.verify)
-        req.reason = req.content
+                verify=self.verify,
+                timeout=self.timeout,
+                stream=stream or compressed)
+        if compressed and req.ok and not stream:
+            # Decompress here to record the sizes and the time spent
+            req._content = self._response_reader(req).read()
+        if not stream or not req.ok:
+            req.reason = req.content
         req.raise_for_status()
         return req
 
-    def _shim_readlines(self):
+    def _compress(self, data):
+        """Compress upload data. Bytes are compressed at once, while
+        file-like objects and iterables are compressed in chunks."""
+        if isinstance(data, (bytes, bytearray)):
+            return b''.join(_compress_chunks(
+                (data,), self.compression, self.transfer_stats))
+        if hasattr(data, 'read'):
+            data = _read_chunks(data)
+        return _compress_chunks(data, self.compression, self.transfer_stats)
+
+    def _response_reader(self, resp):
+        """File-like object with the content of a streamed response,
+        decompressed if necessary"""
+        encoding = resp.headers.get('Content-Encoding')
+        if self.compression and _decompressor(encoding) is not None:
+            return _DecompressReader(
+                resp.raw, encoding, self.transfer_stats)
+        resp.raw.decode_content = True
+        return resp.raw
+
+    def _shim_readlines(self, id):
         """Read data from Shim and parse as text lines"""
         return [line.split('\t') if '\t' in line else line
                 for line in self._shim(
-                        Shim.read_lines, n=0).text.splitlines()]
+                        Shim.read_lines, id, n=0).text.splitlines()]
+
+
+class _BatchDecoder(object):
+    """Split a stream of pages of SciDB binary data into buffers of
+    ``batch_size`` complete cells"""
+    def __init__(self, schema, batch_size):
+        self.schema = schema
+        self.batch_size = batch_size
+
+        self._buf = bytearray()
+        self._cnt = 0                # Complete cells scanned so far
+        self._end = 0                # Offset after the last scanned cell
+
+    def feed(self, page):
+        """Add a page and yield the complete batches. An empty page marks
+        the end of the stream and yields the remaining cells."""
+        self._buf += page
+        while True:
+            cnt, _, self._end = self.schema._scan_lengths(
+                self._buf, self._end, self.batch_size - self._cnt)
+            self._cnt += cnt
+            if self._cnt < self.batch_size and page:
+                return
+            if self._cnt == 0:
+                if self._buf:
+                    raise ValueError(
+                        'Incomplete cell at the end of the SciDB output')
+                return
+
+            buf = bytes(self._buf[:self._end])
+            del self._buf[:self._end]
+            self._cnt = self._end = 0
+            yield buf
 
 
 class Arrays(object):
@@ -513,12 +2280,11 @@ class Array(object):
         return ArrayExp('{}.{}'.format(self.name, key))
 
     def __getitem__(self, key):
-        return self.fetch()[key]
+        return self.db._getitem('scan({})'.format(self), key, self.schema)
 
     def __dir__(self):
         """Download the schema of the SciDB array, using ``show()``"""
-        sh = Schema.fromstring(
-            self.db.iquery_readlines('show({})'.format(self))[0])
+        sh = self.schema()
         ls = [i.name for i in itertools.chain(sh.atts, sh.dims)]
         ls.sort()
         return ls
@@ -528,10 +2294,19 @@ class Array(object):
         return Array(self.db, '{} as {}'.format(self.name, alias))
 
     def fetch(self, **kwargs):
+        if kwargs.get('schema') is None:
+            kwargs['schema'] = functools.partial(self.db._array_schema, self)
         return self.db.iquery('scan({})'.format(self),
                               fetch=True,
                               **kwargs)
 
+    def iter_batches(self, **kwargs):
+        """Download the array in batches. See
+        :meth:`DB.iquery_iter()<DB.iquery_iter>`"""
+        if kwargs.get('schema') is None:
+            kwargs['schema'] = self.db._array_schema(self)
+        return self.db.iquery_iter('scan({})'.format(self), **kwargs)
+
     def head(self, n=5, **kwargs):
         """Similar to ``pandas.DataFrame.head``. Makes use of the ``limit``
         operator, if available.
@@ -549,8 +2324,18 @@ class Array(object):
             return self.fetch(**kwargs)[:n]
 
     def schema(self):
-        return Schema.fromstring(
-            self.db.iquery_readlines("show({})".format(self))[0])
+        """Get the array schema. The schema is cached in the ``DB``
+        schema cache, if enabled, and used for downloading the array
+        or operators over it, without asking SciDB for the schema
+        again.
+
+        """
+        schema = self.db.schema_cache.get(self.db.namespace, self.name)
+        if schema is None:
+            schema = Schema.fromstring(
+                self.db.iquery_readlines("show({})".format(self))[0])
+            self.db.schema_cache.put(self.db.namespace, self.name, schema)
+        return schema
 
 
 class ArrayExp(object):
@@ -583,7 +2368,7 @@ class Operator(object):
         self.args = list(args)
         self.is_lazy = self.name not in ops_hungry
 
-        self._dir = self.db.operators + ['fetch']
+        self._dir = self.db.operators + ['fetch', 'iter_batches']
         self._dir.sort()
 
     def __repr__(self):
@@ -656,13 +2441,20 @@ class Operator(object):
                 # Pass through if provided as argument
                 self.upload_schema = kwargs['upload_schema']
             if self.upload_schema is None:
-                # If the upload_data is a NumPy array try to map the
-                # array dtype to upload schema
-                if (self.upload_data is not None and
-                        isinstance(self.upload_data, numpy.ndarray)):
+                # If the upload_data is a NumPy array, a Pandas
+                # DataFrame, or a pyarrow Table try to map its types
+                # to upload schema
+                upload_data = self.upload_data
+                if _is_upload_iter(upload_data):
+                    # Map the first chunk and put it back
+                    chunks = iter(upload_data)
+                    upload_data = next(chunks, None)
+                    self.upload_data = itertools.chain(
+                        () if upload_data is None else (upload_data,),
+                        chunks)
+                if _is_upload_type(upload_data):
                     try:
-                        self.upload_schema = Schema.fromdtype(
-                            self.upload_data.dtype)
+                        self.upload_schema = DB._upload_schema(upload_data)
                     except Exception:
                         # Might fail if the dtype contains
                         # objects. The same type mapping is attempted
@@ -705,58 +2497,85 @@ class Operator(object):
                 # Garbage collect (if not specified)
                 if 'gc' not in kwargs.keys():
                     kwargs['gc'] = True
-            # If temp=True in kwargs, create a temporary array first
-            if 'temp' in kwargs.keys() and kwargs['temp'] is True:
-                # Get the schema of the new array
-                try:
-                    new_schema = Schema.fromstring(
-                        self.db.iquery_readlines(
-                            "show('{}', 'afl')".format(
-                                str(self.args[0]).replace("'", "\\'")))[0])
-                except requests.HTTPError as e:
-                    e.args = (
-                        '"temp=True" not supported for complex queries\n' +
-                        e.args[0],
-                    )
-                    raise
-                # Set array name
-                new_schema.name = self.args[1]
-                # Create temporary array
-                self.db.iquery('create temp array {}'.format(new_schema))
 
         # Lazy or hungry
         if self.is_lazy:        # Lazy
+            if 'parallelism' in kwargs:
+                raise ValueError(
+                    '"parallelism" is not supported by lazy operators, ' +
+                    'use it with fetch or a hungry operator, e.g., store')
             return self
 
         else:                   # Hungry
-            # Execute query
-            self.db.iquery(str(self),
-                           upload_data=self.upload_data,
-                           upload_schema=self.upload_schema)
-
-            # Handle output
-            # Special case: -- - load - --
-            if self.name == 'load':
-                if isinstance(self.args[0], Array):
-                    return self.args[0]
-                else:
-                    return Array(self.db, self.args[0])
+            return self._execute(kwargs)
 
-            # Special case: -- - store - --
-            elif self.name == 'store':
-                if isinstance(self.args[1], Array):
-                    return self.args[1]
-                else:
-                    return Array(self.db,
-                                 self.args[1],
-                                 kwargs.get('gc', False))
+    def _execute(self, kwargs):
+        """Execute hungry operator and return its output"""
+        # Special case: -- - store - --
+        # If temp=True in kwargs, create a temporary array first
+        if self.name == 'store' and kwargs.get('temp') is True:
+            # Get the schema of the new array
+            try:
+                new_schema = Schema.fromstring(
+                    self.db.iquery_readlines(self._temp_schema_query())[0])
+            except requests.HTTPError as e:
+                e.args = (
+                    '"temp=True" not supported for complex queries\n' +
+                    e.args[0],
+                )
+                raise
+            # Set array name
+            new_schema.name = self.args[1]
+            # Create temporary array
+            self.db.iquery('create temp array {}'.format(new_schema))
+
+        # Execute query
+        self.db.iquery(str(self),
+                       upload_data=self.upload_data,
+                       upload_schema=self.upload_schema,
+                       parallelism=kwargs.get('parallelism', 1))
+
+        return self._output(kwargs)
+
+    def _temp_schema_query(self):
+        """Query for the schema of the array to be stored"""
+        return "show('{}', 'afl')".format(
+            str(self.args[0]).replace("'", "\\'"))
+
+    def _output(self, kwargs):
+        """Output of hungry operators"""
+        # Special case: -- - load - --
+        if self.name == 'load':
+            if isinstance(self.args[0], Array):
+                return self.args[0]
+            else:
+                return Array(self.db, self.args[0])
+
+        # Special case: -- - store - --
+        elif self.name == 'store':
+            if isinstance(self.args[1], Array):
+                return self.args[1]
+            else:
+                return Array(self.db,
+                             self.args[1],
+                             kwargs.get('gc', False))
 
     def __getitem__(self, key):
+        if self.is_lazy:
+            # show() cannot run on the query before the data is uploaded
+            if self.upload_data is not None and self._infer_schema() is None:
+                return self.fetch()[key]
+            return self.db._getitem(str(self),
+                                    key,
+                                    lambda: (self._infer_schema() or
+                                             self.schema()),
+                                    upload_data=self.upload_data,
+                                    upload_schema=self.upload_schema)
         return self.fetch()[key]
 
     def __getattr__(self, name):
         if name in self.db.operators:
-            return Operator(
+            return type(self)(
                 self.db, name, self.upload_data, self.upload_schema, self)
         else:
             raise AttributeError(
@@ -772,17 +2591,35 @@ class Operator(object):
 
     def fetch(self, **kwargs):
         if self.is_lazy:
+            if kwargs.get('schema') is None:
+                kwargs['schema'] = self._infer_schema
             return self.db.iquery(str(self),
                                   fetch=True,
                                   upload_data=self.upload_data,
                                   upload_schema=self.upload_schema,
                                   **kwargs)
 
+    def iter_batches(self, **kwargs):
+        """Download the operator output in batches. See
+        :meth:`DB.iquery_iter()<DB.iquery_iter>`"""
+        if self.is_lazy:
+            if kwargs.get('schema') is None:
+                kwargs['schema'] = self._infer_schema()
+            return self.db.iquery_iter(str(self),
+                                       upload_data=self.upload_data,
+                                       upload_schema=self.upload_schema,
+                                       **kwargs)
+
     def schema(self):
         if self.is_lazy:
-            return Schema.fromstring(
-                self.db.iquery_readlines(
-                    "show('{}', 'afl')".format(self))[0])
+            with self.db._sessions.lease() as id:
+                return self.db._fetch_schema(id, str(self))
+
+    def _infer_schema(self):
+        """Infer the output schema on the client side, using only the
+        array schemas known without asking SciDB. Return ``None`` if
+        not possible. See :mod:`scidbpy.infer`."""
+        return infer_schema(self, self.db._array_schema)
 
 
 connect = DB
@@ -0,0 +1,238 @@
+"""Schema Inference
+================
+
+Infer the schema of the output of a lazy operator expression on the
+client side, without asking SciDB. This saves the ``show()`` round
+trip when the result is downloaded. Only common operators are
+supported:
+
+>>> from scidbpy.schema import Schema
+>>> class Op(object):
+...     is_lazy = True
+...     def __init__(self, name, *args):
+...         self.name = name
+...         self.args = args
+
+>>> print(infer_schema(
+...     Op('apply',
+...        Op('build', '<x:int64 not null>[i=0:9]', 'i'),
+...        'y', 'x',
+...        'z', "'foo'"),
+...     lambda name: None))
+<x:int64 NOT NULL,y:int64 NOT NULL,z:string NOT NULL> [i=0:9]
+
+The schema of a stored array is provided by the ``array_schema``
+function:
+
+>>> print(infer_schema(
+...     Op('project', Op('scan', 'foo'), 'y'),
+...     lambda name: Schema.fromstring('foo<x:int64, y:double>[i=0:9]')))
+<y:double> [i=0:9]
+
+If the schema cannot be inferred, ``None`` is returned:
+
+>>> print(infer_schema(
+...     Op('apply', Op('scan', 'foo'), 'y', 'x + 1'),
+...     lambda name: Schema.fromstring('foo<x:int64>[i=0:9]')))
+None
+
+"""
+
+import copy
+import re
+import six
+
+from .schema import Attribute, Dimension, Schema
+
+
+_regex_array = re.compile('^ \\w+ (?: \\. \\w+ )? (?: @ \\d+ )? $', re.VERBOSE)
+_regex_name = re.compile('^ [A-Za-z_] \\w* $', re.VERBOSE)
+_regex_int = re.compile('^ [+-]? \\d+ $', re.VERBOSE)
+_regex_float = re.compile(
+    '^ [+-]? (?: \\d+ \\. \\d* | \\. \\d+ | \\d+ (?= [eE] ) )'
+    ' (?: [eE] [+-]? \\d+ )? $', re.VERBOSE)
+_regex_string = re.compile("^ ' (?: [^'\\\\] | \\\\ . )* ' $", re.VERBOSE)
+
+
+def infer_schema(op, array_schema):
+    """Infer the schema of the output of a lazy operator. Return
+    ``None`` if the schema cannot be inferred. The returned schema can
+    be safely modified.
+
+    :param Operator op: Operator expression
+
+    :param callable array_schema: Function taking a stored array, as
+      given in the operator arguments (e.g., a name), and returning
+      its ``Schema`` or ``None`` if the schema is not known
+
+    """
+    rule = _rules.get(op.name)
+    if rule is None or not op.is_lazy:
+        return None
+
+    def input(arg):
+        # Arrays answer any attribute lookup, so look for operators
+        # in the instance attributes
+        if 'args' in getattr(arg, '__dict__', ()):
+            return infer_schema(arg, array_schema)
+        if _regex_array.match(str(arg)):
+            return array_schema(arg)
+        return None
+
+    try:
+        schema = rule([str(a).strip() for a in op.args], op.args, input)
+    except Exception:
+        # Unexpected arguments. Let SciDB report the error, if any.
+        return None
+    if schema is None:
+        return None
+    return copy.deepcopy(Schema(None, schema.atts, schema.dims))
+
+
+def _is_int(arg):
+    return _regex_int.match(arg) is not None
+
+
+def _parse_schema(arg, input_arg, input):
+    """Schema argument given as a schema string or as an array"""
+    if '<' in arg:
+        return Schema.fromstring(arg.strip("'"))
+    return input(input_arg)
+
+
+def _expression_att(name, exp, schema):
+    """Attribute for expression ``exp`` evaluated over ``schema``. Only
+    references to attributes or dimensions and constants are
+    supported."""
+    for a in schema.atts:
+        if a.name == exp:
+            return Attribute(name, a.type_name, a.not_null)
+    for d in schema.dims:
+        if d.name == exp:
+            return Attribute(name, 'int64', True)
+    if _regex_int.match(exp):
+        return Attribute(name, 'int64', True)
+    if _regex_float.match(exp):
+        return Attribute(name, 'double', True)
+    if _regex_string.match(exp):
+        return Attribute(name, 'string', True)
+    if exp.lower() in ('true', 'false'):
+        return Attribute(name, 'bool', True)
+    return None
+
+
+def _scan(args, input_args, input):
+    if len(args) not in (1, 2):
+        return None
+    return input(input_args[0])
+
+
+def _same(args, input_args, input):
+    """Output schema same as the input schema, e.g., filter"""
+    return input(input_args[0])
+
+
+def _between(args, input_args, input):
+    schema = input(input_args[0])
+    if schema is None or len(args) != 1 + 2 * len(schema.dims):
+        return None
+    return schema
+
+
+def _limit(args, input_args, input):
+    if len(args) not in (2, 3) or not all(_is_int(a) for a in args[1:]):
+        return None
+    return input(input_args[0])
+
+
+def _build(args, input_args, input):
+    if len(args) not in (2, 3):
+        return None
+    return _parse_schema(args[0], input_args[0], input)
+
+
+def _apply(args, input_args, input):
+    if len(args) < 3 or len(args) % 2 != 1:
+        return None
+    schema = input(input_args[0])
+    if schema is None:
+        return None
+    names = set(i.name for i in schema.atts + schema.dims)
+    atts = list(schema.atts)
+    for (name, exp) in zip(args[1::2], args[2::2]):
+        if not _regex_name.match(name) or name in names:
+            return None
+        att = _expression_att(name, exp, schema)
+        if att is None:
+            return None
+        atts.append(att)
+        names.add(name)
+    return Schema(None, atts, schema.dims)
+
+
+def _project(args, input_args, input):
+    if len(args) < 2:
+        return None
+    schema = input(input_args[0])
+    if schema is None:
+        return None
+    atts = dict((a.name, a) for a in schema.atts)
+    if not all(i in atts for i in args[1:]):
+        return None
+    return Schema(None, (atts[i] for i in args[1:]), schema.dims)
+
+
+def _subarray(args, input_args, input):
+    schema = input(input_args[0])
+    if schema is None or len(args) != 1 + 2 * len(schema.dims):
+        return None
+    dims = []
+    for (pos, d) in enumerate(schema.dims):
+        low = args[1 + pos]
+        high = args[1 + len(schema.dims) + pos]
+        low = int(low) if _is_int(low) else d.low_value
+        high = int(high) if _is_int(high) else d.high_value
+        if not isinstance(low, six.integer_types):
+            return None
+        if isinstance(d.low_value, six.integer_types):
+            low = max(low, d.low_value)
+        if (isinstance(high, six.integer_types) and
+                isinstance(d.high_value, six.integer_types)):
+            high = min(high, d.high_value)
+        dims.append(Dimension(
+            d.name,
+            0,
+            high - low if isinstance(high, six.integer_types) else high,
+            d.chunk_overlap,
+            d.chunk_length))
+    return Schema(None, schema.atts, dims)
+
+
+def _join(args, input_args, input):
+    if len(args) != 2:
+        return None
+    left = input(input_args[0])
+    right = input(input_args[1])
+    if left is None or right is None:
+        return None
+    return Schema(None, left.atts + right.atts, left.dims)
+
+
+def _redimension(args, input_args, input):
+    if len(args) != 2 or '<' not in args[1]:
+        return None
+    return Schema.fromstring(args[1].strip("'"))
+
+
+_rules = {
+    'apply': _apply,
+    'between': _between,
+    'build': _build,
+    'filter': _same,
+    'join': _join,
+    'limit': _limit,
+    'project': _project,
+    'redimension': _redimension,
+    'scan': _scan,
+    'subarray': _subarray,
+}
@@ -56,6 +56,57 @@ ops_hungry = (
     'set_role_permissions',
     )
 
+# Positions of the array arguments changed by hungry operators. Used
+# to invalidate cached schemas. Hungry operators not listed here might
+# change any array.
+#
+ops_hungry_arrays = {
+    # list('operators');
+    # ---
+    'cancel': (),
+    'consume': (),
+    'create_array': (0,),
+    'create_array_using': (0,),
+    'delete': (0,),
+    'help': (),
+    'insert': (1,),
+    'remove': (0,),
+    'remove_versions': (0,),
+    'rename': (0, 1),
+    'save': (),
+    'store': (1,),
+
+    # list('macros');
+    # ---
+    'load': (0,),
+    }
+
+# Operators and functions with results which can change without a new
+# version of the input arrays. Queries using them are not kept in the
+# result cache.
+#
+ops_volatile = (
+    # list('operators');
+    # ---
+    'aio_input',
+    'input',
+    'list',
+    'show',
+    'versions',
+
+    '_explain_logical',
+    '_explain_physical',
+    'explain_logical',
+    'explain_physical',
+
+    # Functions
+    # ---
+    'instanceid',
+    'now',
+    'random',
+    'tnow',
+    )
+
 # List of operators with string arguments. The list is groupped by
 # argument position. If an operator has multiple string arguments, it
 # is listed multiple times. If an argument can be a string or somting
@@ -5,15 +5,43 @@ Classes for accessing SciDB data and schemas.
 
 """
 
+import collections
+import importlib
 import itertools
 import numpy
-import pandas
 import re
 import six
 import struct
+import sys
 import warnings
 
 
+class _LazyModule(object):
+    """Module imported on first attribute access. Pandas and pyarrow
+    take long to import and are not needed by many scripts, e.g.,
+    scripts which only run queries without fetching data."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, name)
+
+
+def _is_instance(obj, module, name):
+    """Same as ``isinstance(obj, module.name)``, without importing the
+    module. If the module is not imported yet, ``obj`` cannot be one
+    of its types."""
+    module = sys.modules.get(module)
+    return module is not None and isinstance(obj, getattr(module, name))
+
+
+pandas = _LazyModule('pandas')
+pyarrow = _LazyModule('pyarrow')
+
+
 type_map_numpy = dict(
     (k, numpy.dtype(v)) for (k, v) in
     [(t.__name__, t) for t in (
@@ -100,10 +128,221 @@ type_map_promo = dict(
         ('uint64', numpy.float64),
     ])
 
+# Pandas nullable extension types
+# https://pandas.pydata.org/pandas-docs/stable/user_guide/integer_na.html
+type_map_nullable = {
+    'bool': 'boolean',
+    'string': 'string',
+
+    'float': 'Float32',
+    'double': 'Float64',
+
+    'int8': 'Int8',
+    'int16': 'Int16',
+    'int32': 'Int32',
+    'int64': 'Int64',
+
+    'uint8': 'UInt8',
+    'uint16': 'UInt16',
+    'uint32': 'UInt32',
+    'uint64': 'UInt64',
+}
+
 one_att_name = 'x'
 one_dim_name = 'i'
 
 
+def _fill_null(col, mask):
+    """Set the masked values of a promoted column to the null value
+    supported by its type (``None``, ``NaN``, or ``NaT``)"""
+    if col.dtype == numpy.object:
+        col[mask] = None
+    elif col.dtype.kind == 'f':
+        col[mask] = numpy.nan
+    elif col.dtype.kind in 'mM':
+        col[mask] = col.dtype.type('NaT')
+
+
+def _nullable_array(att, val, mask):
+    """Build a Pandas nullable extension array from the values and the
+    null mask of an attribute"""
+    dtype = pandas.api.types.pandas_dtype(type_map_nullable[att.type_name])
+    if att.type_name == 'string':
+        if mask is not None and mask.any():
+            val = val.copy()
+            val[mask] = pandas.NA
+        return pandas.array(val, dtype=dtype)
+    if mask is None:
+        mask = numpy.zeros(val.shape, dtype=bool)
+    # Values can be objects if the DataFrame has other object columns
+    return dtype.construct_array_type()(
+        numpy.ascontiguousarray(val, dtype=att.dtype_val), mask)
+
+
+def _is_promoted(att, nullable):
+    """Check if the attribute column is changed by promotion"""
+    return not att.not_null or (nullable and att.type_name == 'string')
+
+
+def _promote_column(att, col, nullable):
+    """Promote a column of (null, val) records, or of values for
+    strings converted to the nullable ``string`` type. See
+    :meth:`Schema.promote`."""
+    if nullable and att.type_name in type_map_nullable:
+        if att.not_null:
+            return _nullable_array(att, col, None)
+        return _nullable_array(att, col['val'], col['null'] != 255)
+
+    val = col['val'].astype(type_map_promo.get(
+        att.type_name, type_map_numpy.get(att.type_name, numpy.object)))
+    mask = col['null'] != 255
+    if mask.any():
+        if val.dtype.kind in 'mM':
+            val[mask] = val.dtype.type('NaT')
+        else:
+            val[mask] = numpy.nan
+    return val
+
+
+def _type_name(dtype):
+    """SciDB type name for a NumPy, Pandas, or Arrow data type"""
+    if _is_instance(dtype, 'pyarrow', 'DataType'):
+        if pyarrow.types.is_dictionary(dtype):
+            return _type_name(dtype.value_type)
+        if pyarrow.types.is_string(dtype) or pyarrow.types.is_large_string(
+                dtype):
+            return 'string'
+        if pyarrow.types.is_binary(dtype) or pyarrow.types.is_large_binary(
+                dtype):
+            return 'binary'
+        return _type_name(numpy.dtype(dtype.to_pandas_dtype()))
+    if isinstance(dtype, pandas.CategoricalDtype):
+        return _type_name(dtype.categories.dtype)
+    if isinstance(dtype, pandas.StringDtype) or dtype == numpy.object:
+        return 'string'
+    # Pandas nullable extension types, e.g., Int64
+    dtype = getattr(dtype, 'numpy_dtype', dtype)
+    return Attribute.fromdtype(('', dtype.str)).type_name
+
+
+def _missing(mask):
+    """Null codes for the mask of missing values. ``None`` if no value
+    is missing."""
+    if mask is None or not mask.any():
+        return None
+    return numpy.where(mask, 0, 255).astype(numpy.uint8)
+
+
+def _column_pandas(att, col):
+    """Null codes and values of a Pandas Series, encoded as per the
+    attribute. Missing strings are set to ``None``."""
+    if isinstance(col.dtype, pandas.CategoricalDtype):
+        codes = col.cat.codes.to_numpy()
+        mask = codes < 0
+        cats = col.cat.categories.to_numpy()
+        if len(cats):
+            val = cats.take(codes)
+        else:
+            val = numpy.empty(len(col), dtype=cats.dtype)
+    elif pandas.api.types.is_extension_array_dtype(col.dtype):
+        mask = col.isna().to_numpy()
+        if att.is_fixsize():
+            val = col.to_numpy(dtype=att.dtype_val,
+                               na_value=att.dtype_val.type(0))
+        else:
+            val = col.to_numpy(dtype=numpy.object, na_value=None)
+    else:
+        val = col.to_numpy()
+        mask = None if att.not_null else pandas.isna(val)
+    if not att.is_fixsize() and mask is not None and mask.any():
+        val = val.astype(numpy.object)
+        val[mask] = None
+    return _missing(mask), val
+
+
+def _column_arrow(att, col):
+    """Null codes and values of an Arrow chunked array, encoded as per
+    the attribute"""
+    if pyarrow.types.is_dictionary(col.type):
+        col = col.cast(col.type.value_type)
+    mask = None
+    if col.null_count:
+        mask = col.is_null().to_numpy()
+        if att.is_fixsize():
+            col = col.fill_null(pyarrow.scalar(0).cast(col.type))
+    return _missing(mask), col.to_numpy()
+
+
+def _gather(buf_arr, off, size):
+    """Gather ``size`` bytes at each offset into a ``(len(off), size)``
+    array. Copy one byte column at a time to keep the index arrays
+    small."""
+    out = numpy.empty((len(off), size), dtype=numpy.uint8)
+    for pos in range(size):
+        out[:, pos] = buf_arr[off + pos]
+    return out
+
+
+def _scatter(buf_arr, off, val):
+    """Scatter the rows of a ``(len(off), size)`` byte array at the
+    given offsets. Inverse of ``_gather``."""
+    for pos in range(val.shape[1]):
+        buf_arr[off + pos] = val[:, pos]
+
+
+def _value_index(start, ln, low, high, pos, end):
+    """Buffer offset of each byte of the values ``pos:end``, which are
+    the bytes ``low:high`` of the concatenated values"""
+    # Start of its cell value plus its position within the value
+    idx = numpy.repeat(start[pos:end] - (low + numpy.cumsum(ln[pos:end]) -
+                                         ln[pos:end]),
+                       ln[pos:end])
+    idx += numpy.arange(low, high)
+    return idx
+
+
+def _value_blocks(ln, block):
+    """Split the concatenated values of lengths ``ln`` in blocks of
+    about ``block`` bytes. Yield the value range and the byte range of
+    each block. Values larger than ``block`` are in their own block."""
+    val_end = numpy.cumsum(ln)
+    pos = 0
+    while pos < len(ln):
+        low = int(val_end[pos] - ln[pos])
+        end = max(int(numpy.searchsorted(
+            val_end, low + block, side='right')), pos + 1)
+        yield pos, end, low, int(val_end[end - 1])
+        pos = end
+
+
+def _gather_values(buf_arr, start, ln, block=2 ** 20):
+    """Gather the variable-size values of lengths ``ln`` at the
+    ``start`` offsets into one contiguous byte array. Inverse of
+    ``_scatter_values``."""
+    out = numpy.empty((int(ln.sum()),), dtype=numpy.uint8)
+    for (pos, end, low, high) in _value_blocks(ln, block):
+        if end == pos + 1:
+            out[low:high] = buf_arr[start[pos]:start[pos] + high - low]
+        else:
+            out[low:high] = buf_arr[_value_index(
+                start, ln, low, high, pos, end)]
+    return out
+
+
+def _scatter_values(buf_arr, start, ln, payload, block=2 ** 20):
+    """Scatter the concatenated variable-size values in ``payload``,
+    of lengths ``ln``, at the ``start`` offsets. The byte index arrays
+    are built for about ``block`` payload bytes at a time, to bound
+    the temporary memory. Larger values are copied one at a time."""
+    payload = numpy.frombuffer(payload, dtype=numpy.uint8)
+    for (pos, end, low, high) in _value_blocks(ln, block):
+        if end == pos + 1:
+            buf_arr[start[pos]:start[pos] + high - low] = payload[low:high]
+        else:
+            buf_arr[_value_index(start, ln, low, high, pos, end)] = (
+                payload[low:high])
+
+
 class Attribute(object):
     """Represent SciDB array attribute
 
@@ -157,6 +396,7 @@ class Attribute(object):
     # length dtype for variable-size SciDB types
     _length_dtype = numpy.dtype(numpy.uint32)
     _length_fmt = '<I'
+    _length_struct = struct.Struct(_length_fmt)
 
     def __init__(self,
                  name,
@@ -578,8 +818,9 @@ class Schema(object):
             ','.join(str(a) for a in self.atts),
             '; '.join(str(d) for d in self.dims))
 
-    def _promo_warning(self):
-        cnt = sum(not a.not_null for a in self.atts)
+    def _promo_warning(self, atts=None):
+        cnt = sum(not a.not_null
+                  for a in (self.atts if atts is None else atts))
         if cnt:
             warnings.warn(
                 ('{} type(s) promoted for null support.' +
@@ -737,77 +978,360 @@ class Schema(object):
                   a.type_name, type_map_numpy.get(a.type_name, numpy.object)))
              for a in self.atts])
 
-    def promote(self, data):
+    def promote(self, data, nullable=False):
         """Promote nullable attributes in the DataFrame to types which
         support some type of null values as per Pandas 'promotion
         scheme
         <http://pandas.pydata.org/pandas-docs/stable/gotchas.html
         #na-type-promotions>`_
 
+        If ``nullable`` is ``True``, nullable attributes are converted
+        to the Pandas nullable extension types in
+        ``type_map_nullable`` instead (e.g., ``Int64``, ``boolean``),
+        which do not lose precision. String attributes are converted
+        to the ``string`` type even if not nullable. The other
+        nullable attributes are promoted as above.
+
         """
-        self._promo_warning()
+        self._promo_warning(self._promo_atts(nullable))
         for a in self.atts:
-            if not a.not_null:
-                data[a.name] = pandas.Series(
-                    data=[attr[1] if attr[0] == 255 else numpy.NAN
-                          for attr in data[a.name]],
-                    dtype=type_map_promo.get(
-                        a.type_name, type_map_numpy.get(
-                            a.type_name, numpy.object)))
+            if _is_promoted(a, nullable):
+                data[a.name] = _promote_column(
+                    a, numpy.asarray(data[a.name]), nullable)
+
+    def _promo_atts(self, nullable):
+        """Attributes which might lose precision when promoted"""
+        if nullable:
+            return [a for a in self.atts
+                    if a.type_name not in type_map_nullable]
+        return self.atts
+
+    def todataframe(self, data, dataframe_promo=True):
+        """Build a DataFrame from a NumPy record array with the schema
+        attributes, one column at a time. Each column is copied once
+        out of the record array, with nullable attributes promoted in
+        the same pass. The columns are not consolidated into blocks,
+        so no further copies are made.
+
+        >>> s = Schema.fromstring('<x:int64, y:double not null>[i]')
+        >>> s.todataframe(numpy.array([((255, 1), .5), ((0, 0), 1.5)],
+        ...                           dtype=s.atts_dtype))
+             x    y
+        0  1.0  0.5
+        1  NaN  1.5
+
+        :param dataframe_promo: Promote nullable attributes. See
+          :meth:`promote` and :meth:`DB.iquery()<scidbpy.db.DB.iquery>`
+          (default ``True``)
+
+        """
+        nullable = dataframe_promo == 'nullable'
+        if dataframe_promo:
+            self._promo_warning(self._promo_atts(nullable))
+
+        cols = collections.OrderedDict()
+        for a in self.atts:
+            col = data[str(a.name)]
+            if dataframe_promo and _is_promoted(a, nullable):
+                cols[a.name] = _promote_column(a, col, nullable)
+            else:
+                cols[a.name] = numpy.array(col)
+        return pandas.DataFrame(cols, copy=False)
+
+    def _scan_lengths(self, buf, offset=0, max_cells=None):
+        """Scan the binary buffer, starting at ``offset``, and return the
+        number of complete cells, the length prefixes of the
+        variable-size attributes, as a ``(cells, var_attributes)``
+        NumPy array, and the offset after the last complete cell. At
+        most ``max_cells`` cells are scanned, if provided. An
+        incomplete cell at the end of the buffer is ignored.
+
+        The position of each length prefix depends on all the
+        previous lengths, so this is the only sequential part of the
+        decoder. Only the length prefixes are read. After each cell,
+        the next cells are assumed to have the same lengths and their
+        length prefixes are checked in bulk, so runs of cells of the
+        same size, e.g., null or fixed-width strings, are skipped at
+        once. If the check fails, the next few cells are read one at a
+        time before checking again.
+
+        """
+        # Byte gaps between the end of the previous variable-size value
+        # (or the start of the cell) and the next length prefix
+        gaps = []
+        gap = 0
+        for att in self.atts:
+            if att.is_fixsize():
+                gap += att.dtype.itemsize
+            else:
+                gaps.append(gap + (0 if att.not_null else 1))
+                gap = 0
+        tail = gap
+
+        if not gaps:
+            cnt = (len(buf) - offset) // tail
+            if max_cells is not None:
+                cnt = min(cnt, max_cells)
+            return (cnt,
+                    numpy.empty((cnt, 0), dtype=numpy.uint32),
+                    offset + cnt * tail)
+
+        unpack = Attribute._length_struct.unpack_from
+        length_size = Attribute._length_dtype.itemsize
+        fix_size = sum(gaps) + len(gaps) * length_size + tail
+        buf_arr = numpy.frombuffer(buf, dtype=numpy.uint8)
+        blocks = []
+        lengths = []
+        cnt = 0
+        off = cell_end = offset
+        end = len(buf)
+        window = 16             # Cells checked at once
+        skip = backoff = 0      # Cells read one at a time before a check
+        try:
+            while off < end and cnt != max_cells:
+                row = []
+                for gap in gaps:
+                    off += gap
+                    ln = unpack(buf, off)[0]
+                    row.append(ln)
+                    off += length_size + ln
+                off += tail
+                if off > end:
+                    break
+                lengths.extend(row)
+                cnt += 1
+                cell_end = off
+
+                if skip:
+                    skip -= 1
+                    continue
+                size = fix_size + sum(row)
+                run = (end - off) // size
+                if max_cells is not None:
+                    run = min(run, max_cells - cnt)
+                run = min(run, window)
+                if run < 1:
+                    continue
+
+                # Check the length prefixes of the next cells, assuming
+                # they have the same lengths. The first mismatch ends
+                # the run.
+                same = numpy.ones((run,), dtype=bool)
+                pos = off + size * numpy.arange(run, dtype=numpy.int64)
+                for (gap, ln) in zip(gaps, row):
+                    pos += gap
+                    same &= _gather(buf_arr, pos, length_size).view(
+                        Attribute._length_dtype).reshape((run,)) == ln
+                    pos += length_size + ln
+                same = run if same.all() else int(same.argmin())
+
+                if same:
+                    blocks.append(lengths)
+                    blocks.append(numpy.tile(
+                        numpy.array(row, dtype=numpy.uint32), same))
+                    lengths = []
+                    cnt += same
+                    off += same * size
+                    cell_end = off
+                if same == run:
+                    window = min(window * 2, 2 ** 16)
+                    backoff = 0
+                elif same:
+                    window = 16
+                    backoff = 0
+                else:
+                    # Wait longer after each check which did not help
+                    window = 16
+                    backoff = min(max(backoff * 2, 1), 1024)
+                    skip = backoff
+        except struct.error:
+            # Incomplete length prefix at the end of the buffer
+            pass
+
+        blocks.append(lengths)
+        lengths = numpy.concatenate(
+            [numpy.asarray(b, dtype=numpy.uint32) for b in blocks])
+        lengths = lengths[:cnt * len(gaps)].reshape((cnt, len(gaps)))
+        return cnt, lengths, cell_end
 
     def frombytes(self, buf, as_dataframe=False, dataframe_promo=True):
-        # Scan content and build (offset, size) metadata
-        off = 0
-        buf_meta = []
-        while off < len(buf):
-            meta = []
-            for att in self.atts:
-                sz = att.itemsize(buf, off)
-                meta.append((off, sz))
-                off += sz
-            buf_meta.append(meta)
+        promo = as_dataframe and dataframe_promo
+        length_size = Attribute._length_dtype.itemsize
+        cnt, lengths, _ = self._scan_lengths(buf)
+        buf_arr = numpy.frombuffer(buf, dtype=numpy.uint8)
+
+        # Compute the offset of each cell using a cumulative sum over
+        # the cell sizes
+        fix_size = sum(a.dtype.itemsize if a.is_fixsize() else
+                       (0 if a.not_null else 1) + length_size
+                       for a in self.atts)
+        cell_size = fix_size + lengths.sum(axis=1, dtype=numpy.int64)
+        cell_off = numpy.zeros((cnt,), dtype=numpy.int64)
+        numpy.cumsum(cell_size[:-1], out=cell_off[1:])
 
         # Create NumPy record array
-        if as_dataframe and dataframe_promo:
-            data = numpy.empty((len(buf_meta),),
-                               dtype=self.get_promo_atts_dtype())
+        if promo:
+            data = numpy.empty((cnt,), dtype=self.get_promo_atts_dtype())
         else:
-            data = numpy.empty((len(buf_meta),), dtype=self.atts_dtype)
+            data = numpy.empty((cnt,), dtype=self.atts_dtype)
+
+        # Extract each attribute column in bulk
+        att_off = cell_off
+        var_pos = 0
+        for att in self.atts:
+            null_size = 0 if att.not_null else 1
+            val_off = att_off + null_size
+
+            if att.is_fixsize():
+                size = att.dtype_val.itemsize
+                val = _gather(buf_arr, val_off, size).view(
+                    att.dtype_val).reshape((cnt,))
+                next_off = val_off + size
+            else:
+                ln = lengths[:, var_pos].astype(numpy.int64)
+                var_pos += 1
+                start = val_off + length_size
+                next_off = start + ln
+                if att.type_name == 'string':
+                    # Drop the trailing null character
+                    ln = numpy.maximum(ln - 1, 0)
+                    arrow_type = pyarrow.large_string()
+                else:
+                    arrow_type = pyarrow.large_binary()
+                # Decode all the values at once from a contiguous copy
+                offsets = numpy.zeros((cnt + 1,), dtype=numpy.int64)
+                numpy.cumsum(ln, out=offsets[1:])
+                values = _gather_values(buf_arr, start, ln)
+                try:
+                    val = pyarrow.Array.from_buffers(
+                        arrow_type,
+                        cnt,
+                        [None,
+                         pyarrow.py_buffer(offsets),
+                         pyarrow.py_buffer(values)],
+                    ).to_numpy(zero_copy_only=False)
+                except pyarrow.ArrowException:
+                    # Invalid UTF-8, raise UnicodeDecodeError for the
+                    # first invalid value
+                    for pos in range(cnt):
+                        values[offsets[pos]:offsets[pos + 1]].tobytes(
+                        ).decode('utf-8')
+                    raise
+
+            name = str(att.name)
+            if att.not_null:
+                data[name] = val
+            else:
+                missing = buf_arr[att_off]
+                if promo:
+                    data[name] = val
+                    _fill_null(data[name], missing != 255)
+                else:
+                    data[name]['null'] = missing
+                    data[name]['val'] = val
 
-        # Extract values using (offset, size) metadata
-        # Populate NumPy record array
-        pos = 0
-        for meta in buf_meta:
-            data.put((pos,),
-                     tuple(att.frombytes(
-                         buf,
-                         off,
-                         sz,
-                         promo=as_dataframe and dataframe_promo)
-                           for (att, (off, sz)) in zip(self.atts, meta)))
-            pos += 1
+            att_off = next_off
         return data
 
     def tobytes(self, data):
-        buf_lst = []
-        if len(data.dtype) > 0:
-            # NumPy structured array
-            if len(self.atts_dtype) == 1:
-                # One attribute
-                atr = self.atts[0]
-                for cell in data:
-                    buf_lst.append(atr.tobytes(cell[0]))
-            else:
-                # Multiple attributes
-                for cell in data:
-                    for (atr, val) in zip(self.atts, cell):
-                        buf_lst.append(atr.tobytes(val))
+        """Encode the data in SciDB binary format as per the schema
+        attributes. The data can be a NumPy array, a Pandas DataFrame,
+        or a pyarrow Table. DataFrame and Table columns are matched to
+        the attributes by position and encoded one at a time.
+
+        >>> s = Schema.fromstring('<x:int64 not null, y:string>[i]')
+        >>> s.tobytes(pandas.DataFrame({'x': [1], 'y': [None]}))
+        b'\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x00'
+
+        """
+        if _is_instance(data, 'pandas', 'DataFrame'):
+            cols = [_column_pandas(att, data.iloc[:, pos])
+                    for (pos, att) in enumerate(self.atts)]
+        elif _is_instance(data, 'pyarrow', 'Table'):
+            cols = [_column_arrow(att, data.column(pos))
+                    for (pos, att) in enumerate(self.atts)]
         else:
-            # NumPy single-field array
-            atr = self.atts[0]
-            for val in data:
-                buf_lst.append(atr.tobytes(val))
-        return b''.join(buf_lst)
+            if len(data.dtype) > 0:
+                # NumPy structured array
+                cols = [data[name] for name in data.dtype.names]
+            else:
+                # NumPy single-field array
+                cols = [data]
+            cols = [(col['null'], col['val'])
+                    if col.dtype.names and 'null' in col.dtype.names
+                    else (None, col)
+                    for col in cols]
+        cnt = len(data)
+        length_size = Attribute._length_dtype.itemsize
+
+        # Split each column in null codes and values. Variable-size
+        # values are encoded to bytes and concatenated.
+        parts = []
+        cell_size = numpy.zeros((cnt,), dtype=numpy.int64)
+        for (att, (missing, col)) in zip(self.atts, cols):
+            null_size = 0 if att.not_null else 1
+            if att.is_fixsize():
+                val = numpy.ascontiguousarray(col, dtype=att.dtype_val)
+                if missing is None:
+                    missing = 255
+                cell_size += null_size + att.dtype_val.itemsize
+                parts.append((missing, val.view(numpy.uint8).reshape(
+                    (cnt, att.dtype_val.itemsize)), None))
+            else:
+                if missing is None:
+                    missing = numpy.where(
+                        numpy.equal(numpy.asarray(col, dtype=numpy.object),
+                                    None),
+                        0,
+                        255).astype(numpy.uint8)
+                if att.type_name == 'string':
+                    val = [b'' if v is None else
+                           v if isinstance(v, bytes) else v.encode('utf-8')
+                           for v in col]
+                elif att.type_name == 'binary':
+                    val = [b'' if v is None else bytes(v) for v in col]
+                else:
+                    raise NotImplementedError(
+                        'Convert <{}> to bytes'.format(att))
+                ln = numpy.fromiter(map(len, val),
+                                    dtype=numpy.int64,
+                                    count=cnt)
+                if att.type_name == 'string':
+                    # Null-terminate each string while joining them
+                    ln += 1
+                    val.append(b'')
+                    payload = b'\x00'.join(val)
+                else:
+                    payload = b''.join(val)
+                del val
+                cell_size += null_size + length_size + ln
+                parts.append((missing, ln, payload))
+
+        # Compute the offset of each cell and write each attribute
+        # column in bulk
+        cell_off = numpy.zeros((cnt,), dtype=numpy.int64)
+        numpy.cumsum(cell_size[:-1], out=cell_off[1:])
+        buf_arr = numpy.empty((int(cell_size.sum()),), dtype=numpy.uint8)
+
+        att_off = cell_off
+        for (att, (missing, val, payload)) in zip(self.atts, parts):
+            if not att.not_null:
+                buf_arr[att_off] = missing
+                att_off = att_off + 1
+
+            if payload is None:
+                _scatter(buf_arr, att_off, val)
+                att_off = att_off + val.shape[1]
+            else:
+                _scatter(buf_arr,
+                         att_off,
+                         val.astype(Attribute._length_dtype).view(
+                             numpy.uint8).reshape((cnt, length_size)))
+                start = att_off + length_size
+                _scatter_values(buf_arr, start, val, payload)
+                att_off = start + val
+
+        return buf_arr.tobytes()
 
     @classmethod
     def fromstring(cls, string):
@@ -830,6 +1354,44 @@ class Schema(object):
             (Attribute.fromdtype(dt) for dt in dtype.descr),
             (Dimension(one_dim_name),))
 
+    @classmethod
+    def fromdataframe(cls, data):
+        """Build the schema of a Pandas DataFrame. NumPy columns map to
+        not null attributes. Object, categorical, and nullable extension
+        type columns map to null-able attributes. The index is not
+        used.
+
+        >>> print(Schema.fromdataframe(pandas.DataFrame({
+        ...     'x': numpy.arange(2),
+        ...     'y': pandas.array([1, None], dtype='Int32'),
+        ...     'z': pandas.Categorical(['a', None])})))
+        <x:int64 NOT NULL,y:int32,z:string> [i]
+        """
+        return cls(
+            None,
+            (Attribute(str(name),
+                       _type_name(dtype),
+                       not (dtype == numpy.object or
+                            pandas.api.types.is_extension_array_dtype(dtype)))
+             for (name, dtype) in data.dtypes.items()),
+            (Dimension(one_dim_name),))
+
+    @classmethod
+    def fromarrow(cls, schema):
+        """Build the schema of a pyarrow Table from its Arrow schema.
+        Null-able fields map to null-able attributes.
+
+        >>> print(Schema.fromarrow(pyarrow.schema([
+        ...     pyarrow.field('x', pyarrow.int64(), nullable=False),
+        ...     pyarrow.field('y', pyarrow.string())])))
+        <x:int64 NOT NULL,y:string> [i]
+        """
+        return cls(
+            None,
+            (Attribute(field.name, _type_name(field.type), not field.nullable)
+             for field in schema),
+            (Dimension(one_dim_name),))
+
 
 if __name__ == "__main__":
     import doctest
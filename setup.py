@@ -35,6 +35,10 @@ setup(
         'requests',
         'six',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.12; python_version >= "3.9"'],
+        'zstd': ['zstandard'],
+    },
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Console',
@@ -1,4 +1,5 @@
 import scidbpy
+import subprocess
 import sys
 import timeit
 
@@ -166,6 +167,28 @@ Total:            {:6.2f} seconds {:6.2f} MB/second""".format(
       rt, mb / rt))
 
 
+def import_time(runs):
+    """Time the import of SciDB-Py in a new interpreter. Pandas and
+    pyarrow are imported on first use only."""
+    print("""
+Import
+------
+""")
+    for (label, code) in (('Python:', 'pass'),
+                          ('SciDB-Py:', 'import scidbpy'),
+                          ('SciDB-Py, Pandas:', 'import scidbpy, pandas')):
+        rt = timeit.Timer(
+            stmt='subprocess.check_call([sys.executable, "-c", {!r}])'.format(
+                code),
+            setup='import subprocess, sys').timeit(number=runs) / runs
+        print('{:<18s}{:6.2f} seconds'.format(label, rt))
+    out = subprocess.check_output([
+        sys.executable,
+        '-c',
+        "import scidbpy, sys; print('pandas' in sys.modules)"])
+    assert out.strip() == b'False', 'Pandas imported by scidbpy'
+
+
 if __name__ == "__main__":
     try:
         mb = int(sys.argv[1])
@@ -173,6 +196,8 @@ if __name__ == "__main__":
         mb = 5                      # MB
     runs = 3
 
+    import_time(runs)
+
     db = setup(mb)
 
     download(mb, runs)
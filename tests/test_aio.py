@@ -0,0 +1,138 @@
+import asyncio
+import numpy
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from scidbpy.aio import (  # noqa: E402
+    AsyncArray, AsyncDB, AsyncOperator, AsyncSessionPool, connect)
+from scidbpy.schema import Schema  # noqa: E402
+
+
+# The module-scoped connection is bound to one event loop
+loop = asyncio.new_event_loop()
+
+
+def run(coro):
+    return loop.run_until_complete(coro)
+
+
+@pytest.fixture(scope='module')
+def db():
+    db = run(connect())
+    yield db
+    run(db.close())
+
+
+class TestAsyncDB:
+
+    @pytest.mark.parametrize('query', [
+        'list()',
+        "list('operators')",
+    ])
+    def test_iquery(self, db, query):
+        assert run(db.iquery(query)) is None
+        assert type(run(db.iquery(
+            query, fetch=True, as_dataframe=False))) == numpy.ndarray
+
+    def test_iquery_readlines(self, db):
+        assert len(run(db.iquery_readlines(
+            'build(<x:int64>[i=0:2], i * i)'))) == 3
+
+    def test_gather(self):
+        async def main():
+            async with await connect(pool_size=4) as db:
+                return await asyncio.gather(*(
+                    db.iquery('build(<x:int64 not null>[i=0:{}], i)'.format(i),
+                              fetch=True,
+                              as_dataframe=False)
+                    for i in range(16)))
+        assert [ar.shape for ar in run(main())] == [
+            (i + 1,) for i in range(16)]
+
+    def test_operators(self, db):
+        ar = run(db.build('<x:int64 not null>[i=0:2]', 'i').store('foo'))
+        assert run(ar.fetch(as_dataframe=False)).shape == (3,)
+        assert run(db.scan(ar).apply('y', 'x + 1').fetch()).shape == (3, 3)
+        run(db.remove(ar))
+
+    def test_schema(self, db):
+        ar = run(db.build('<x:int64 not null>[i=0:2]', 'i').store('foo'))
+        assert [a.name for a in run(ar.schema()).atts] == ['x']
+        assert dir(ar) == ['i', 'x']
+        assert [a.name for a in run(
+            db.scan(ar).apply('y', 'x + 1').schema()).atts] == ['x', 'y']
+        assert run(ar.head(2, as_dataframe=False)).shape == (2,)
+        run(db.remove(ar))
+
+    def test_upload(self, db):
+        ar = run(db.upload(numpy.arange(3)))
+        assert run(db.scan(ar).fetch(
+            as_dataframe=False))['x'].tolist() == [0, 1, 2]
+        run(db.remove(ar))
+
+    def test_no_ops(self):
+        db = run(connect(no_ops=True))
+        assert isinstance(db, AsyncDB)
+        with pytest.raises(AttributeError):
+            db.scan
+        run(db.close())
+
+
+class TestAsyncSync:
+    """Synchronous functions of arrays and operators, without a
+    server"""
+
+    schema = Schema.fromstring('<x:int64>[i]')
+
+    @pytest.fixture
+    def db(self):
+        return AsyncDB('http://127.0.0.1:1/', schema_cache_size=10)
+
+    def test_array(self, db):
+        ar = db.arrays.foo
+        with pytest.raises(TypeError):
+            dir(ar)
+        db.schema_cache.put(None, 'foo', self.schema)
+        assert str(run(ar.schema())) == str(self.schema)
+        assert dir(ar) == ['i', 'x']
+        with pytest.raises(TypeError):
+            ar[0]
+
+    def test_arrays(self, db):
+        with pytest.raises(TypeError):
+            dir(db.arrays)
+
+    def test_operator(self, db):
+        db._set_ops(['scan', 'store'])
+        op = db.scan(db.arrays.foo)
+        assert isinstance(op, AsyncOperator)
+        with pytest.raises(TypeError):
+            op[0]
+        assert isinstance(op % 'bar', AsyncArray)
+
+
+class TestAsyncSessionPool:
+
+    def test_close(self):
+        count = iter(range(10))
+
+        async def new_session():
+            return next(count)
+
+        async def main():
+            pool = AsyncSessionPool(new_session, 2)
+            async with pool.lease() as id0:
+                id1 = await pool.acquire()
+            assert sorted(pool._idle) == [0]
+            # Released on close, e.g., by AsyncDB.close
+            del pool.ids[:]
+            pool.close()
+            assert pool._idle == []
+            await pool.release(id1)
+            assert pool._idle == []
+            async with pool.lease() as id0:
+                async with pool.lease() as id1:
+                    return id0, id1
+
+        assert run(main()) == (2, 3)
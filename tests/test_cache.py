@@ -0,0 +1,108 @@
+import numpy
+import os
+import pandas
+import pyarrow
+import pytest
+
+from scidbpy.cache import DiskResultCache, main
+
+
+results = [
+    numpy.array([(0, (255, 1.5), (255, 'a')),
+                 (1, (0, 0.), (0, None))],
+                dtype=[('x', 'int64'),
+                       ('y', [('null', 'u1'), ('val', 'float64')]),
+                       ('z', [('null', 'u1'), ('val', object)])]),
+    pandas.DataFrame({'x': [0, 1],
+                      'y': pandas.array([1, None], dtype='Int64'),
+                      'z': ['a', None]}),
+    pandas.DataFrame({'b': pandas.Series([True, numpy.nan], dtype=object),
+                      'c': pandas.Series([b'a', numpy.nan], dtype=object),
+                      'y': numpy.array([1.5, numpy.nan], dtype='float32')}),
+    pyarrow.table({'x': [0, 1], 'z': ['a', None]}),
+]
+
+
+class TestDiskResultCache:
+
+    @pytest.mark.parametrize('format', ['arrow', 'parquet'])
+    @pytest.mark.parametrize('res', results)
+    def test_put_get(self, tmpdir, format, res):
+        cache = DiskResultCache(str(tmpdir), 2 ** 20, format)
+        cache.put(('scan(foo)', 1), res, 'scan(foo)')
+        assert cache.get(('scan(foo)', 2)) is None
+        out = cache.get(('scan(foo)', 1))
+        assert type(out) is type(res)
+        if isinstance(res, numpy.ndarray):
+            assert out.dtype == res.dtype
+            assert out.tolist() == res.tolist()
+        elif isinstance(res, pandas.DataFrame):
+            assert out.dtypes.tolist() == res.dtypes.tolist()
+            assert [[repr(val) for val in out[name]] for name in out] == [
+                [repr(val) for val in res[name]] for name in res]
+        else:
+            assert out.equals(res)
+        assert [e['query'] for e in cache.entries()] == ['scan(foo)']
+
+    def test_mixed_nulls(self, tmpdir):
+        cache = DiskResultCache(str(tmpdir), 2 ** 20)
+        with pytest.raises(ValueError):
+            cache.put(1, pandas.DataFrame({'z': ['a', None, numpy.nan]}))
+        assert cache.entries() == []
+
+    def test_evict(self, tmpdir):
+        cache = DiskResultCache(str(tmpdir), 2 ** 20)
+        for i in range(3):
+            cache.put(i, results[3])
+        assert len(cache.entries()) == 3
+
+        # 1 is the least recently used
+        for (key, last_used) in ((0, 20), (1, 10), (2, 30)):
+            os.utime(cache._file(key, 'arrow'), (last_used, last_used))
+        cache.max_bytes = cache.nbytes - 1
+        assert cache.purge() == 1
+        assert cache.get(1) is None
+        assert cache.get(0) is not None
+        assert cache.get(2) is not None
+
+        cache.clear()
+        assert cache.nbytes == 0
+
+    @pytest.mark.parametrize('format', ['arrow', 'parquet'])
+    @pytest.mark.parametrize('data', [
+        b'corrupt',
+        pyarrow.table({'x': [1]}),
+        pyarrow.table({'x': [1]}).replace_schema_metadata(
+            {b'scidbpy': b'{}'}),
+    ])
+    def test_corrupt(self, tmpdir, format, data):
+        cache = DiskResultCache(str(tmpdir), 2 ** 20, format)
+        cache.put(1, results[0])
+        path = cache._file(1, format)
+        with open(path, 'wb') as file:
+            if isinstance(data, pyarrow.Table):
+                writer = pyarrow.RecordBatchFileWriter(file, data.schema)
+                writer.write_table(data)
+                writer.close()
+            else:
+                file.write(data)
+        assert cache.get(1) is None
+        assert not os.path.exists(path)
+
+    def test_format(self, tmpdir):
+        with pytest.raises(ValueError):
+            DiskResultCache(str(tmpdir), 0, 'csv')
+
+    def test_main(self, tmpdir, capsys):
+        cache = DiskResultCache(str(tmpdir), 2 ** 20)
+        cache.put(1, results[0], 'scan(foo)')
+        cache.put(2, results[1], 'scan(bar)')
+
+        assert main(['--path', str(tmpdir), 'list']) == 0
+        out = capsys.readouterr().out
+        assert 'scan(foo)' in out and 'scan(bar)' in out
+        assert '2 results' in out
+
+        assert main(['--path', str(tmpdir), 'purge']) == 0
+        assert 'Removed 2 results' in capsys.readouterr().out
+        assert cache.entries() == []
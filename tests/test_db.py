@@ -1,10 +1,20 @@
 import gc
 import numpy
+import os
 import pandas
+import pyarrow
 import pytest
 import random
-
-from scidbpy.db import Array, connect, iquery
+import requests
+import six
+import subprocess
+import sys
+import threading
+
+from scidbpy.db import (Array, DB, Operator, SchemaCache, connect, iquery,
+                        zstandard, _BatchDecoder, _compressor, _decompressor,
+                        _is_upload_iter, _shim_release_sessions,
+                        _upload_chunks)
 from scidbpy.schema import Schema
 
 
@@ -142,6 +152,90 @@ class TestDB:
         assert ar.shape == (10, 1)
         assert ar.ndim == 2
 
+    def test_pool(self):
+        db = connect(pool_size=1, timeout=60, retries=0)
+        for i in range(5):
+            assert db.iquery('list()') is None
+        assert db.iquery('list()', fetch=True).shape[1] > 0
+
+    def test_threads(self):
+        db = connect(pool_size=4)
+        out = []
+
+        def run(i):
+            out.append((i, db.iquery(
+                'build(<x:int64 not null>[i=0:{}], i)'.format(i),
+                fetch=True,
+                as_dataframe=False).shape))
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(out) == [(i, (i + 1,)) for i in range(16)]
+
+    @pytest.mark.parametrize('batch_size', [1, 3, 10, 100])
+    @pytest.mark.parametrize('page_size', [1, 7, 2 ** 20])
+    def test_iquery_iter(self, db, batch_size, page_size):
+        batches = list(db.iquery_iter(
+            "build(<x:int64 not null, s:string>[i=0:9], i)",
+            batch_size=batch_size,
+            page_size=page_size))
+        assert [len(b) for b in batches[:-1]] == [batch_size] * (
+            len(batches) - 1)
+        assert pandas.concat(batches)['x'].tolist() == list(range(10))
+
+    @pytest.mark.parametrize('parallelism', [1, 2, 3, 20])
+    def test_parallelism(self, db, parallelism):
+        query = "build(<x:int64 not null>[i=0:9:0:2; j=0:1], i * 2 + j)"
+        ar = db.iquery(query,
+                       fetch=True,
+                       atts_only=True,
+                       as_dataframe=False,
+                       parallelism=parallelism)
+        assert sorted(ar['x'].tolist()) == list(range(20))
+
+    @pytest.mark.parametrize(('key', 'expected', 'index'), [
+        (slice(None), list(range(10)), list(range(10))),
+        (slice(3, 6), [3, 4, 5], [0, 1, 2]),
+        (slice(0, 2), [0, 1], [0, 1]),
+        (slice(-2, None), [8, 9], [8, 9]),
+        ((slice(2, 4),), [2, 3], [0, 1]),
+        ((7,), [7], [0]),
+        ((slice(None, 2),), [0, 1], [0, 1]),
+    ])
+    def test_getitem(self, db, key, expected, index):
+        op = db.build('<x:int64 not null>[i=0:9:0:5]', 'i')
+        ar = op[key]
+        assert sorted(ar['x'].tolist()) == expected
+        # Rows selected in SciDB are numbered from 0, the slices of
+        # the downloaded output keep its index
+        assert ar.index.tolist() == index
+
+    def test_getitem_columns(self, db):
+        op = db.build('<x:int64 not null>[i=0:2]', 'i').apply('y', 'x * 2')
+        assert op['y'].tolist() == [0, 2, 4]
+        assert op[['i', 'y']].columns.tolist() == ['i', 'y']
+        # Integers are column lookups, as on the downloaded DataFrame
+        with pytest.raises(KeyError):
+            op[1]
+
+    def test_schema_cache(self):
+        db = connect(schema_cache_size=128)
+        db.iquery('store(build(<x:int64>[i=0:2], i), foo_cache)')
+        hits = db.schema_cache.hits
+        db.arrays.foo_cache.fetch()
+        db.arrays.foo_cache.fetch()
+        assert db.schema_cache.hits == hits + 1
+
+        db.iquery('remove(foo_cache)')
+        db.iquery('store(build(<y:double>[j=0:1], j), foo_cache)')
+        ar = db.arrays.foo_cache.fetch()
+        assert ar.columns.tolist() == ['j', 'y']
+        db.iquery('remove(foo_cache)')
+
     def test_flood(self):
         for i in range(100):
             db = connect()
@@ -779,6 +873,42 @@ class TestUpload:
                            if upload_schema_str else None)) is None
         db.remove('foo')
 
+    @pytest.mark.parametrize('convert', [
+        lambda df: df,
+        lambda df: pyarrow.Table.from_pandas(df, preserve_index=False),
+    ])
+    def test_iquery_dataframe(self, db, convert):
+        df = pandas.DataFrame({
+            'x': foo_np,
+            'y': pandas.array([None] + foo_np[1:].tolist(), dtype='Int64'),
+            's': pandas.Categorical(['a', None] * 5)})
+        db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), foo)",
+                  upload_data=convert(df))
+        out = db.arrays.foo.fetch(dataframe_promo='nullable')
+        assert out['x'].tolist() == foo_np.tolist()
+        assert out['y'].isna().tolist() == [True] + [False] * 9
+        assert out['s'].tolist()[:2] == ['a', pandas.NA]
+        db.remove('foo')
+
+    def test_iquery_chunks(self, db):
+        db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), foo)",
+                  upload_data=(pandas.DataFrame({'x': foo_np[i:i + 3]})
+                               for i in range(0, len(foo_np), 3)))
+        assert db.arrays.foo[:]['x'].tolist() == foo_np.tolist()
+        db.input(upload_data=iter(numpy.array_split(foo_np, 4))).store('foo')
+        assert db.arrays.foo[:]['x'].tolist() == foo_np.tolist()
+        db.remove('foo')
+
+    @pytest.mark.parametrize('parallelism', [1, 2, 3, 20])
+    def test_iquery_parallelism(self, db, parallelism):
+        db.iquery("store(input({sch}, '{fn}', 0, '{fmt}'), foo)",
+                  upload_data=pandas.DataFrame({'x': foo_np}),
+                  parallelism=parallelism)
+        assert db.arrays.foo[:]['x'].tolist() == foo_np.tolist()
+        db.input(upload_data=foo_np).store('foo', parallelism=parallelism)
+        assert db.arrays.foo[:]['x'].tolist() == foo_np.tolist()
+        db.remove('foo')
+
     # -- - --
     # -- - Input - --
     # -- - --
@@ -1172,3 +1302,856 @@ class TestCreate:
         assert type(db.create_array('foo', schema) == Array)
         assert type(db.build(schema_str, 'null').store('foo') == Array)
         db.remove('foo')
+
+
+class TestBatchDecoder:
+
+    @pytest.mark.parametrize('batch_size', [1, 2, 5, 10])
+    @pytest.mark.parametrize('page_size', [1, 3, 100])
+    def test_feed(self, batch_size, page_size):
+        schema = Schema.fromstring('<x:int64 not null, s:string>[i]')
+        data = numpy.array([(i, (255, 'a' * i)) for i in range(7)],
+                           dtype=schema.atts_dtype)
+        buf = schema.tobytes(data)
+        decoder = _BatchDecoder(schema, batch_size)
+        out = []
+        for pos in range(0, len(buf), page_size):
+            out.extend(decoder.feed(buf[pos:pos + page_size]))
+        out.extend(decoder.feed(b''))
+        assert [len(schema.frombytes(b)) for b in out[:-1]] == [
+            batch_size] * (len(out) - 1)
+        assert b''.join(out) == buf
+
+    def test_incomplete(self):
+        schema = Schema.fromstring('<x:int64 not null>[i]')
+        decoder = _BatchDecoder(schema, 10)
+        assert list(decoder.feed(b'\x00' * 12)) == []
+        with pytest.raises(ValueError):
+            list(decoder.feed(b''))
+
+
+class TestUploadChunks:
+
+    @pytest.mark.parametrize(('upload_data', 'expected'), [
+        (b'foo', False),
+        (bytearray(b'foo'), False),
+        (u'foo', False),
+        (foo_np, False),
+        (pandas.DataFrame({'x': foo_np}), False),
+        (iter([foo_np]), True),
+        ([b'foo'], True),
+    ])
+    def test_is_upload_iter(self, upload_data, expected):
+        assert _is_upload_iter(upload_data) == expected
+
+    def test_chunks(self):
+        schema = Schema.fromstring('<x:int64 not null, s:string>[i]')
+        chunks = [pandas.DataFrame({'x': [i, i + 1], 's': ['a', None]})
+                  for i in range(0, 6, 2)]
+        out = list(_upload_chunks(iter(chunks + [b'foo']), schema))
+        assert out == [schema.tobytes(c) for c in chunks] + [b'foo']
+        assert list(_upload_chunks(iter([]), schema)) == []
+
+
+class TestPartitionQueries:
+
+    @pytest.mark.parametrize(('schema', 'parts', 'queries'), [
+        ('<x:int64>[i=0:9:0:2; j=0:1]', 3,
+         ['between(foo, 0, null, 1, null)',
+          'between(foo, 2, null, 5, null)',
+          'between(foo, 6, null, 9, null)']),
+        ('<x:int64>[i=0:3:0:2]', 5,
+         ['between(foo, 0, 1)',
+          'between(foo, 2, 3)']),
+        ('<x:int64>[i=0:*:0:2; j=-5:20:0:10]', 3,
+         ['between(foo, null, -5, null, 4)',
+          'between(foo, null, 5, null, 14)',
+          'between(foo, null, 15, null, 20)']),
+        ('<x:int64>[i=0:9:0:10]', 3, None),
+        ('<x:int64>[i]', 3, None),
+    ])
+    def test_partition(self, schema, parts, queries):
+        assert DB._partition_queries(
+            'foo', Schema.fromstring(schema), parts) == queries
+
+
+class TestFetchArrow:
+
+    @staticmethod
+    def stream(table):
+        sink = pyarrow.BufferOutputStream()
+        writer = pyarrow.RecordBatchStreamWriter(sink, table.schema)
+        writer.write_table(table, max_chunksize=2)
+        writer.close()
+        return sink.getvalue().to_pybytes()
+
+    def test_table(self):
+        table = pyarrow.table({'i': [0, 1, 2], 'x': [1.5, None, 3.5]})
+        buf = self.stream(table)
+        res = DB._fetch_result(buf, None, True, False, True)
+        assert isinstance(res, pyarrow.Table)
+        assert res.equals(table)
+        res = DB._fetch_result(buf, None, True, True, True)
+        assert isinstance(res, pandas.DataFrame)
+        assert res['x'].tolist()[::2] == [1.5, 3.5]
+
+    def test_unique(self):
+        table = pyarrow.table([[1], [2], [3], [4]],
+                              names=['x', 'i', 'x', 'x_1'])
+        res = DB._fetch_result(self.stream(table), None, True, True, True)
+        assert res.columns.tolist() == ['x', 'i', 'x_2', 'x_1']
+        batch = DB._arrow_unique(table.to_batches()[0])
+        assert batch.schema.names == ['x', 'i', 'x_2', 'x_1']
+
+    @pytest.mark.parametrize('fetch', [
+        lambda db, **kwargs: db.iquery(
+            'scan(foo)', fetch=True, use_arrow=True, **kwargs),
+        lambda db, **kwargs: pandas.concat(db.iquery_iter(
+            'scan(foo)', use_arrow=True, **kwargs)),
+    ])
+    def test_schema(self, standin, fetch):
+        ShimStandIn.output = self.stream(
+            pyarrow.table({'i': [0, 1], 'x': [1.5, 2.5]}))
+        ShimStandIn.lines = b'<x:double> [i=0:*]\n'
+        db = DB(standin, no_ops=True)
+
+        # With dimensions, the schema is requested to place them first
+        res = fetch(db)
+        assert res.columns.tolist() == ['i', 'x']
+        assert ShimStandIn.queries == [
+            "show('scan(foo)', 'afl')",
+            'project(apply(scan(foo), i, i), i, x)']
+
+        # Without dimensions, the schema is not requested
+        ShimStandIn.queries = []
+        fetch(db, atts_only=True)
+        assert ShimStandIn.queries == ['scan(foo)']
+
+    def test_concat(self):
+        table = pyarrow.table({'x': [1, 2]})
+        assert DB._concat([table, table])['x'].to_pylist() == [1, 2, 1, 2]
+
+
+class TestPartitionUpload:
+
+    def test_partition(self):
+        query, parts, schema = DB._partition_upload(
+            "store(input({sch}, '{fn}', 0, '{fmt}'), foo)",
+            numpy.arange(5),
+            Schema.fromstring('<x:int64 not null>[i=0:*:0:2]'),
+            2)
+        assert query == (
+            "store(union(" +
+            "input(<x:int64 NOT NULL> [i=0:*:0:2], '{fn_0}', 0, '{fmt}'), " +
+            "input(<x:int64 NOT NULL> [i=4:*:0:2], '{fn_1}', 0, '{fmt}')" +
+            "), foo)")
+        assert [p[0].tolist() for p in parts] == [[0, 1, 2, 3], [4]]
+        assert str(schema) == '<x:int64 NOT NULL> [i=0:*:0:2]'
+
+    def test_partition_schema(self):
+        upload_schema = Schema.fromstring(
+            '<x:int64 not null, y:double>[j=10:*:1:3]')
+        query, parts, schema = DB._partition_upload(
+            "input({sch}, '{fn}', 0, '{fmt}')",
+            numpy.array([(i, i) for i in range(8)],
+                        dtype=[('x', 'int64'), ('y', 'float64')]),
+            upload_schema,
+            3)
+        assert len(parts) == 3
+        assert [len(p[0]) for p in parts] == [3, 3, 2]
+        # union requires the same attributes, chunk length, and
+        # chunk overlap
+        for (_, part_schema) in parts:
+            assert part_schema.atts == upload_schema.atts
+            dim = part_schema.dims[0]
+            assert dim.name == 'j'
+            assert dim.chunk_length == 3
+            assert dim.chunk_overlap == 1
+            assert (dim.low_value - 10) % 3 == 0
+        assert [p[1].dims[0].low_value for p in parts] == [10, 13, 16]
+        assert query == 'union({})'.format(', '.join(
+            "input({}, '{{fn_{}}}', 0, '{{fmt}}')".format(p[1], pos)
+            for (pos, p) in enumerate(parts)))
+        assert query.format(
+            fmt=schema.atts_fmt_scidb,
+            **dict(('fn_{}'.format(pos), pos) for pos in range(3))) == (
+                "union(" +
+                "input(<x:int64 NOT NULL,y:double> [j=10:*:1:3], " +
+                "'0', 0, '(int64, double null)'), " +
+                "input(<x:int64 NOT NULL,y:double> [j=13:*:1:3], " +
+                "'1', 0, '(int64, double null)'), " +
+                "input(<x:int64 NOT NULL,y:double> [j=16:*:1:3], " +
+                "'2', 0, '(int64, double null)'))")
+
+    @pytest.mark.parametrize(('query', 'upload_data', 'parts'), [
+        ("input({sch}, '{fn}', 0, '(int64)')",
+         pandas.DataFrame({'x': foo_np}), 3),
+        ("input({sch}, '{fn}', 0, '(int64)')",
+         pyarrow.table({'x': foo_np}), 4),
+    ])
+    def test_partition_types(self, query, upload_data, parts):
+        res = DB._partition_upload(
+            query,
+            upload_data,
+            Schema.fromstring('<x:int64 not null>[i=0:*:0:1]'),
+            parts)
+        assert len(res[1]) == parts
+        assert sum(len(p[0]) for p in res[1]) == len(foo_np)
+
+    @pytest.mark.parametrize(('upload_data', 'upload_schema'), [
+        (foo_np[:1], '<x:int64 not null>[i=0:*:0:1]'),
+        (foo_np, '<x:int64 not null>[i=0:*:0:1000]'),
+    ])
+    def test_partition_none(self, upload_data, upload_schema):
+        assert DB._partition_upload(
+            "input({sch}, '{fn}')",
+            upload_data,
+            Schema.fromstring(upload_schema),
+            2) is None
+
+    @pytest.mark.parametrize(('query', 'upload_data', 'upload_schema'), [
+        ("input(foo, '{fn}', 0, '{fmt}')", foo_np, None),
+        ("load(foo, '{fn}', 0, '{fmt}')", foo_np, None),
+        ("input({sch}, '{fn}')", foo_np.tobytes(),
+         '<x:int64 not null>[i=0:*:0:1]'),
+        ("input({sch}, '{fn}')", iter([foo_np]),
+         '<x:int64 not null>[i=0:*:0:1]'),
+        ("input({sch}, '{fn}')", foo_np, None),
+        ("input({sch}, '{fn}')", foo_np, '<x:int64 not null>[i]'),
+        ("input({sch}, '{fn}')", foo_np,
+         '<x:int64 not null>[i=0:*:0:1; j=0:*:0:1]'),
+        ("join(input({sch}, '{fn}'), input({sch}, '{fn}'))", foo_np,
+         '<x:int64 not null>[i=0:*:0:1]'),
+    ])
+    def test_partition_error(self, query, upload_data, upload_schema):
+        with pytest.raises(ValueError):
+            DB._partition_upload(
+                query,
+                upload_data,
+                upload_schema and Schema.fromstring(upload_schema),
+                2)
+
+    def test_unsupported(self, standin):
+        db = DB(standin, no_ops=True)
+        with pytest.raises(ValueError):
+            db.iquery('store(foo, bar)', parallelism=2)
+        with pytest.raises(ValueError):
+            db.iquery('scan(foo)',
+                      fetch=True,
+                      memmap=True,
+                      schema='<x:int64>[i=0:9:0:5]',
+                      parallelism=2)
+        with pytest.raises(ValueError):
+            db.iquery("store(input({sch}, '{fn}'), bar)",
+                      upload_data=foo_np,
+                      parallelism=2)
+        assert ShimStandIn.uploads == []
+
+    def test_pool_size(self, standin):
+        db = DB(standin, no_ops=True, pool_size=10)
+        upload_data = numpy.arange(30)
+        threads = [threading.Thread(
+            target=db.iquery,
+            args=("store(input({sch}, '{fn}', 0, '{fmt}'), foo)",),
+            kwargs={'upload_data': upload_data,
+                    'upload_schema': Schema.fromstring(
+                        '<x:int64 not null>[i=0:*:0:3]'),
+                    'parallelism': 15})
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+        assert not any(thread.is_alive() for thread in threads)
+        assert len(ShimStandIn.uploads) == 20
+        assert sum(len(data) for data in ShimStandIn.uploads) == (
+            2 * upload_data.nbytes)
+
+
+class TestSchemaCache:
+
+    schema = Schema.fromstring('<x:int64>[i]')
+
+    @pytest.mark.parametrize(('query', 'key'), [
+        ('scan(foo)', ' scan( foo ) '),
+        ("filter(foo, x > 1 and y = 'a  b')",
+         "filter(foo,x>1  and y='a  b')"),
+        ('apply(foo, y, x - 1)', 'apply(foo,y,x-1)'),
+    ])
+    def test_normalize(self, query, key):
+        cache = SchemaCache(10)
+        cache.put(None, query, self.schema)
+        assert cache.get(None, key) == self.schema
+        assert cache.get('ns', key) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru(self):
+        cache = SchemaCache(2)
+        cache.put(None, 'scan(a)', self.schema)
+        cache.put(None, 'scan(b)', self.schema)
+        cache.get(None, 'scan(a)')
+        cache.put(None, 'scan(c)', self.schema)
+        assert len(cache) == 2
+        assert cache.get(None, 'scan(b)') is None
+        assert cache.get(None, 'scan(a)') is not None
+
+    def test_copy(self):
+        cache = SchemaCache(2)
+        cache.put(None, 'scan(a)', self.schema)
+        cache.get(None, 'scan(a)').make_dims_atts()
+        assert cache.get(None, 'scan(a)') == self.schema
+
+    @pytest.mark.parametrize(('query', 'kept'), [
+        ('scan(foo)', ['foo', 'bar', 'taz']),
+        ('remove(foo)', ['bar', 'taz']),
+        ("remove('ns.foo@2')", ['bar', 'taz']),
+        ('store(filter(bar, x > 1), foo)', ['bar', 'taz']),
+        ('insert(foo, bar)', ['foo', 'taz']),
+        ('rename(foo, taz)', ['bar']),
+        ("load(foo, '/tmp/foo', -2, 'tsv')", ['bar', 'taz']),
+        ("save(foo, '/tmp/foo')", ['foo', 'bar', 'taz']),
+        ("load_library('limit')", []),
+        ('create temp array foo<x:int64>[i]', []),
+    ])
+    def test_invalidate(self, query, kept):
+        cache = SchemaCache(10)
+        for name in ('foo', 'bar', 'taz'):
+            cache.put(None, 'filter({}, x > 1)'.format(name), self.schema)
+        cache.invalidate(query)
+        assert [name for name in ('foo', 'bar', 'taz')
+                if cache.get(
+                    None, 'filter({}, x > 1)'.format(name))] == kept
+
+
+class ShimStandIn(six.moves.BaseHTTPServer.BaseHTTPRequestHandler):
+    """Local stand-in for the Shim endpoints used by downloads and
+    uploads. Responses are compressed as per the Accept-Encoding
+    header. Compressed uploads are decompressed. Requests to the
+    endpoints in ``drop`` get no response."""
+    protocol_version = 'HTTP/1.1'
+    output = numpy.arange(10000).tobytes()
+    lines = b'foo\nbar\n' * 100
+    uploads = []
+    endpoints = []
+    queries = []
+    drop = ()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, code=200):
+        encoding = self.headers.get('Accept-Encoding')
+        self.send_response(code)
+        if code == 200 and encoding in ('gzip', 'zstd'):
+            comp = _compressor(encoding)
+            body = comp.compress(body) + comp.flush()
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            data = b''
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                data += self.rfile.read(size)
+                self.rfile.readline()
+                if size == 0:
+                    break
+        else:
+            data = self.rfile.read(int(self.headers['Content-Length']))
+        decomp = _decompressor(self.headers.get('Content-Encoding'))
+        if decomp is not None:
+            data = decomp.decompress(data) + decomp.flush()
+        ShimStandIn.uploads.append(data)
+        self._send(b'/tmp/upload')
+
+    def do_GET(self):
+        url = six.moves.urllib.parse.urlparse(self.path)
+        params = dict(six.moves.urllib.parse.parse_qsl(url.query))
+        endpoint = url.path.strip('/')
+        ShimStandIn.endpoints.append(endpoint)
+        if endpoint == 'execute_query':
+            ShimStandIn.queries.append(params['query'])
+        if endpoint in self.drop:
+            self.close_connection = True
+            return
+        if endpoint == 'read_bytes':
+            n = int(params['n'])
+            if n == 0:
+                return self._send(self.output)
+            pos = ShimStandIn.pos
+            if pos >= len(self.output):
+                ShimStandIn.pos = 0
+                return self._send(b'EOF', 410)
+            ShimStandIn.pos = pos + n
+            return self._send(self.output[pos:pos + n])
+        if endpoint == 'read_lines':
+            return self._send(self.lines)
+        if endpoint == 'new_session':
+            return self._send(b'1')
+        return self._send(b'')
+
+
+class ThreadingHTTPServer(six.moves.socketserver.ThreadingMixIn,
+                          six.moves.BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def standin():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ShimStandIn)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    ShimStandIn.output = numpy.arange(10000).tobytes()
+    ShimStandIn.lines = b'foo\nbar\n' * 100
+    ShimStandIn.pos = 0
+    ShimStandIn.uploads = []
+    ShimStandIn.endpoints = []
+    ShimStandIn.queries = []
+    ShimStandIn.drop = ()
+    yield 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+class TestRetries:
+
+    def test_not_idempotent(self, standin):
+        db = DB(standin, no_ops=True, retries=2)
+        ShimStandIn.drop = ('execute_query',)
+        with pytest.raises(requests.ConnectionError):
+            db.iquery('list()')
+        assert ShimStandIn.endpoints.count('execute_query') == 1
+
+    def test_idempotent(self, standin):
+        db = DB(standin, no_ops=True, retries=2)
+        ShimStandIn.drop = ('release_session',)
+        _shim_release_sessions(
+            db._http, db.scidb_url, None, None, None, ['1'])
+        assert ShimStandIn.endpoints.count('release_session') == 3
+
+
+class TestCompression:
+
+    encodings = ['gzip'] + (['zstd'] if zstandard else [])
+
+    @pytest.mark.parametrize('compression', encodings)
+    def test_download(self, standin, compression):
+        db = DB(standin, no_ops=True, compression=compression)
+        ar = db.iquery('scan(foo)',
+                       fetch=True,
+                       atts_only=True,
+                       as_dataframe=False,
+                       schema='<x:int64 not null>[i]')
+        assert ar['x'].tolist() == list(range(10000))
+        assert db.transfer_stats.download_bytes == 80000
+        assert db.transfer_stats.download_ratio > 2
+        assert db.iquery_readlines('list()') == ['foo', 'bar'] * 100
+
+        batches = list(db.iquery_iter('scan(foo)',
+                                      page_size=30000,
+                                      atts_only=True,
+                                      as_dataframe=False,
+                                      schema='<x:int64 not null>[i]'))
+        assert numpy.concatenate(batches)['x'].tolist() == list(range(10000))
+
+    @pytest.mark.parametrize('compression', encodings)
+    def test_download_arrow(self, standin, compression):
+        table = pyarrow.table({'x': numpy.arange(10000)})
+        ShimStandIn.output = TestFetchArrow.stream(table)
+        db = DB(standin, no_ops=True, compression=compression)
+        batches = list(db.iquery_iter(
+            'scan(foo)', use_arrow=True, atts_only=True, as_dataframe=False))
+        assert pyarrow.Table.from_batches(batches).equals(table)
+        assert db.transfer_stats.download_bytes == len(ShimStandIn.output)
+
+    @pytest.mark.parametrize('compression', encodings)
+    @pytest.mark.parametrize('upload_data', [
+        lambda: foo_np,
+        lambda: (foo_np[i:i + 3] for i in range(0, len(foo_np), 3)),
+    ])
+    def test_upload(self, standin, compression, upload_data):
+        db = DB(standin,
+                no_ops=True,
+                compression=compression,
+                compress_uploads=True)
+        db.iquery("input({sch}, '{fn}', 0, '{fmt}')",
+                  upload_data=upload_data())
+        assert ShimStandIn.uploads == [foo_np.tobytes()]
+        assert db.transfer_stats.upload_bytes == len(foo_np.tobytes())
+
+    def test_uncompressed(self, standin):
+        db = DB(standin, no_ops=True)
+        db.iquery("input({sch}, '{fn}', 0, '{fmt}')", upload_data=foo_np)
+        assert ShimStandIn.uploads == [foo_np.tobytes()]
+        assert db.transfer_stats.upload_wire == 0
+
+    def test_unsupported(self):
+        with pytest.raises(ValueError):
+            DB('http://127.0.0.1:1/', compression='lz4')
+
+
+class TestMemmap:
+
+    def test_fixsize(self, standin, tmpdir):
+        db = DB(standin, no_ops=True)
+        path = str(tmpdir.join('foo'))
+        ar = db.iquery('scan(foo)',
+                       fetch=True,
+                       atts_only=True,
+                       schema='<x:int64 not null>[i]',
+                       memmap=path)
+        assert isinstance(ar, numpy.memmap)
+        assert ar['x'].tolist() == list(range(10000))
+        assert os.path.getsize(path) == 80000
+
+    def test_temporary(self, standin):
+        db = DB(standin, no_ops=True, compression='gzip')
+        ar = db.iquery('scan(foo)',
+                       fetch=True,
+                       atts_only=True,
+                       schema='<x:int64 not null>[i]',
+                       memmap=True)
+        assert isinstance(ar, numpy.memmap)
+        assert not os.path.exists(ar.filename)
+        assert ar['x'].tolist() == list(range(10000))
+
+    def test_nullable(self, standin):
+        schema = Schema.fromstring('<x:int64>[i]')
+        ShimStandIn.output = schema.tobytes(
+            pandas.DataFrame({'x': [1.0, None, 3.0]}))
+        db = DB(standin, no_ops=True)
+        ar = db.iquery('scan(foo)',
+                       fetch=True,
+                       atts_only=True,
+                       schema=schema,
+                       memmap=True)
+        # Fixed-size results keep the (null, val) records
+        assert ar['x'].dtype.names == ('null', 'val')
+        assert ar['x']['null'].tolist() == [255, 0, 255]
+        assert ar['x']['val'][[0, 2]].tolist() == [1, 3]
+
+    def test_varsize(self, standin, tmpdir):
+        schema = Schema.fromstring('<s:string, x:int64 not null>[i]')
+        data = pandas.DataFrame({
+            's': ['a' * i if i % 3 else None for i in range(1000)],
+            'x': numpy.arange(1000)})
+        ShimStandIn.output = schema.tobytes(data)
+        db = DB(standin, no_ops=True)
+        table = db.iquery('scan(foo)',
+                          fetch=True,
+                          atts_only=True,
+                          schema=schema,
+                          memmap=str(tmpdir.join('foo')))
+        assert isinstance(table, pyarrow.Table)
+        assert table.column('s').to_pylist() == data['s'].tolist()
+        assert table.column('x').to_pylist() == data['x'].tolist()
+
+    def test_null_batch(self, tmpdir):
+        schema = Schema.fromstring('<s:string, c:char, x:int64>[i]')
+        data = pandas.DataFrame({'s': [None, None, 'a', 'bc'],
+                                 'c': [None, None, 'a', 'b'],
+                                 'x': [None, None, 1, 2]})
+        path = str(tmpdir.join('foo'))
+        with open(path, 'wb') as file:
+            DB._write_arrow(file, schema, [schema.tobytes(data)], 2)
+        table = pyarrow.RecordBatchFileReader(
+            pyarrow.memory_map(path)).read_all()
+        assert table.num_rows == 4
+        assert table.column('s').to_pylist() == [None, None, 'a', 'bc']
+        assert table.column('c').to_pylist() == [None, None, b'a', b'b']
+        assert table.column('x').to_pylist() == [None, None, 1, 2]
+
+    def test_arrow(self, standin):
+        table = pyarrow.table({'x': numpy.arange(10000)})
+        ShimStandIn.output = TestFetchArrow.stream(table)
+        db = DB(standin, no_ops=True)
+        assert db.iquery('scan(foo)',
+                         fetch=True,
+                         use_arrow=True,
+                         atts_only=True,
+                         memmap=True).equals(table)
+
+
+class TestLazyOps:
+
+    def test_operators(self, standin):
+        db = DB(standin)
+        assert db._operators is None
+        assert 'foo' in dir(db)
+        assert isinstance(db.bar, Operator)
+        db.iquery("load_library('foo')")
+        assert db._operators is None
+        assert 'foo' in db.operators
+
+    def test_no_ops(self, standin):
+        db = DB(standin, no_ops=True)
+        assert db.operators is None
+        with pytest.raises(AttributeError):
+            db.foo
+        db.load_ops()
+        assert isinstance(db.foo, Operator)
+
+    def test_ops_cache(self, standin, tmpdir, monkeypatch):
+        monkeypatch.setenv('SCIDBPY_CACHE_DIR', str(tmpdir))
+        db = DB(standin, ops_cache_ttl=60)
+        assert db.ops_cache.get(db._ops_key()) is None
+        assert 'foo' in db.operators
+        assert db.ops_cache.get(db._ops_key()) == db.operators
+
+        db.ops_cache.put(db._ops_key(), ['taz'])
+        assert DB(standin, ops_cache_ttl=60).operators == ['taz']
+        assert 'taz' not in DB(standin, ops_cache_ttl=60,
+                               namespace='bar').operators
+
+        db.iquery("unload_library('foo')")
+        assert db.ops_cache.get(db._ops_key()) is None
+
+        db.ops_cache.clear()
+        assert not tmpdir.listdir()
+
+
+class TestGetItem:
+
+    schema = Schema.fromstring('<x:int64 not null>[i]')
+
+    @pytest.mark.parametrize(('key', 'expected'), [
+        (slice(2, 5), [2, 3, 4]),
+        (7, 7),
+    ])
+    def test_no_ops(self, standin, key, expected):
+        db = DB(standin, no_ops=True)
+        res = db._getitem('scan(foo)',
+                          key,
+                          lambda: self.schema,
+                          atts_only=True,
+                          as_dataframe=False)
+        assert res['x'].tolist() == expected
+
+    @pytest.mark.parametrize(('key', 'query', 'cnt', 'index'), [
+        (slice(2, 4), 'limit(scan(foo), 2, 2)', 2, [0, 1]),
+        ((slice(2, 4),), 'between(scan(foo), 2, 3)', 2, [0, 1]),
+        (slice(-2, None), 'scan(foo)', 10, [8, 9]),
+    ])
+    def test_index(self, standin, key, query, cnt, index):
+        ShimStandIn.lines = b'between\nlimit\n'
+        db = DB(standin)
+        assert 'limit' in db.operators
+        ShimStandIn.output = numpy.arange(cnt).tobytes()
+        ShimStandIn.queries = []
+        res = db._getitem('scan(foo)',
+                          key,
+                          lambda: self.schema,
+                          atts_only=True)
+        assert ShimStandIn.queries == [query]
+        # Rows selected in SciDB are numbered from 0, the slices of
+        # the downloaded output keep its index
+        assert res.index.tolist() == index
+
+    def test_int(self, standin):
+        ShimStandIn.lines = b'limit\n'
+        db = DB(standin)
+        assert 'limit' in db.operators
+        ShimStandIn.output = numpy.arange(10).tobytes()
+        ShimStandIn.queries = []
+        # Column lookup on the downloaded DataFrame, not a position
+        with pytest.raises(KeyError):
+            db._getitem('scan(foo)', 7, lambda: self.schema, atts_only=True)
+        assert ShimStandIn.queries == ['scan(foo)']
+
+    def test_upload(self, standin):
+        ShimStandIn.lines = b'input\nlimit\n'
+        ShimStandIn.output = numpy.repeat(numpy.arange(3), 2).tobytes()
+        db = DB(standin)
+        assert 'input' in db.operators
+        ShimStandIn.lines = b'<x:int64 not null> [i=0:*]\n'
+        ShimStandIn.queries = []
+        res = db.input(upload_data=numpy.arange(3))[0:2]
+        assert res['x'].tolist() == [0, 1]
+        assert not any('{sch}' in query for query in ShimStandIn.queries)
+
+
+class TestInferSchema:
+
+    @pytest.fixture(params=[0, 10])
+    def db(self, standin, request):
+        ShimStandIn.lines = b'apply\nbuild\njoin\nremove\nscan\nstore\n'
+        db = DB(standin, schema_cache_size=request.param)
+        assert 'scan' in db.operators
+        ShimStandIn.lines = b'<x:int64 not null> [i=0:*]\n'
+        ShimStandIn.queries = []
+        return db
+
+    @pytest.mark.parametrize('op', [
+        lambda db: db.join('foo', 'bar'),
+        lambda db: db.scan('foo').apply('y', 'x + 1'),
+        lambda db: db.scan(db.arrays.foo),
+    ])
+    def test_unknown(self, db, op):
+        op(db).fetch(as_dataframe=False)
+        assert len(ShimStandIn.queries) == 2
+        assert ShimStandIn.queries[0].startswith("show('")
+
+    @pytest.mark.parametrize('op', [
+        lambda foo: foo,
+        lambda foo: foo.db.scan(foo),
+        lambda foo: foo.db.apply(foo, 'y', 'x'),
+    ])
+    def test_known(self, db, op):
+        foo = db.arrays.foo
+        foo.schema()
+        ShimStandIn.output = b''
+        ShimStandIn.queries = []
+        op(foo).fetch(as_dataframe=False)
+        if db.schema_cache.max_size:
+            assert len(ShimStandIn.queries) == 1
+            assert not ShimStandIn.queries[0].startswith('show(')
+        else:
+            # Array schemas are only kept by the schema cache
+            assert len(ShimStandIn.queries) == 2
+            assert ShimStandIn.queries[0].startswith('show(')
+
+    def test_stored_again(self, db):
+        foo = db.arrays.foo
+        foo.schema()
+        db.remove(foo)
+        db.store(db.build('<s:string not null>[j=0:2]', "'a'"), foo)
+        ShimStandIn.lines = b'<s:string not null> [j=0:2]\n'
+        ShimStandIn.output = b''
+        ShimStandIn.queries = []
+        foo.fetch(as_dataframe=False)
+        # The new schema is requested and used for the download
+        assert ShimStandIn.queries == [
+            "show('scan(foo)', 'afl')",
+            'project(apply(scan(foo), j, j), j, s)']
+
+
+class TestLazyImport:
+
+    def test_import(self):
+        out = subprocess.check_output([
+            sys.executable,
+            '-c',
+            'import scidbpy, sys; '
+            "print('pandas' in sys.modules, 'pyarrow' in sys.modules)"])
+        assert out.split() == [b'False', b'False']
+
+
+class TestResultCache:
+
+    def fetch(self, db, query='scan(foo)'):
+        return db.iquery(query,
+                         fetch=True,
+                         atts_only=True,
+                         as_dataframe=False,
+                         schema='<x:int64 not null>[i]')
+
+    def test_versions(self, standin):
+        ShimStandIn.lines = b'foo@1\t7\tfalse\nfoo@2\t9\tfalse\n'
+        db = DB(standin, no_ops=True, result_cache_size=10 ** 6)
+        self.fetch(db)
+        ShimStandIn.output = b''
+        ar = self.fetch(db)
+        assert ar['x'].tolist() == list(range(10000))
+        ar['x'] = 0
+        assert self.fetch(db)['x'].tolist() == list(range(10000))
+        assert db.result_cache.hits == 2
+        assert db.result_cache.nbytes == 80000
+
+        ShimStandIn.lines = b'foo@3\t11\tfalse\n'
+        assert len(self.fetch(db)) == 0
+        assert db.result_cache.misses == 2
+
+    @pytest.mark.parametrize(('query', 'lines'), [
+        ('scan(foo)', b'foo\t7\ttrue\n'),
+        ('build(<x:int64 not null>[i=0:9], random())', b''),
+        ("input(foo, '/tmp/foo')", b''),
+        ('build(<x:int64 not null>[i=0:9], i)', b''),
+        ('scan(ns.foo)', b'foo\t7\tfalse\n'),
+    ])
+    def test_not_cached(self, standin, query, lines):
+        ShimStandIn.lines = lines
+        db = DB(standin, no_ops=True, result_cache_size=10 ** 6)
+        self.fetch(db, query)
+        self.fetch(db, query)
+        assert db.result_cache.hits == 0
+        assert len(db.result_cache) == 0
+
+    def test_qualified(self, standin):
+        ShimStandIn.lines = b'foo\t7\tfalse\n'
+        db = DB(standin, no_ops=True, result_cache_size=10 ** 6)
+        for _ in range(2):
+            self.fetch(db, 'filter(foo, foo.x >= 0)')
+        assert db.result_cache.hits == 1
+
+    def test_array(self, standin, monkeypatch):
+        ShimStandIn.lines = b'foo@1\t7\tfalse\n'
+        db = DB(standin, no_ops=True, result_cache_size=10 ** 6)
+        schemas = []
+        monkeypatch.setattr(
+            db,
+            '_array_schema',
+            lambda array: schemas.append(array) or Schema.fromstring(
+                '<x:int64 not null>[i]'))
+        foo = db.arrays.foo
+        foo.fetch(atts_only=True, as_dataframe=False)
+        assert len(schemas) == 1
+
+        # The schema is not needed for a cache hit and is not part of
+        # the key
+        ShimStandIn.output = b''
+        ShimStandIn.queries = []
+        ar = foo.fetch(atts_only=True, as_dataframe=False)
+        assert ar['x'].tolist() == list(range(10000))
+        assert len(schemas) == 1
+        assert len(ShimStandIn.queries) == 1
+        assert len(db.iquery('scan(foo)',
+                             fetch=True,
+                             atts_only=True,
+                             as_dataframe=False)) == 10000
+        assert db.result_cache.hits == 2
+
+    def test_disabled(self, standin):
+        db = DB(standin, no_ops=True)
+        assert db._result_key('scan(foo)', None) is None
+
+    def test_disk(self, standin, tmpdir, monkeypatch):
+        monkeypatch.setenv('SCIDBPY_CACHE_DIR', str(tmpdir))
+        ShimStandIn.lines = b'foo@1\t7\tfalse\n'
+        self.fetch(DB(standin, no_ops=True, disk_cache_size=10 ** 6))
+
+        # New instance, e.g., after a restart
+        ShimStandIn.output = b''
+        db = DB(standin, no_ops=True, disk_cache_size=10 ** 6)
+        assert self.fetch(db)['x'].tolist() == list(range(10000))
+        assert [e['query'] for e in db.disk_cache.entries()] == ['scan(foo)']
+
+        # Another server or user
+        for other in (
+                DB(standin.replace('127.0.0.1', 'localhost'),
+                   no_ops=True,
+                   disk_cache_size=10 ** 6),
+                DB(standin,
+                   scidb_auth=('bar', 'taz'),
+                   no_ops=True,
+                   disk_cache_size=10 ** 6)):
+            assert len(self.fetch(other)) == 0
+
+    def test_disk_unsupported(self, standin, tmpdir, monkeypatch):
+        monkeypatch.setenv('SCIDBPY_CACHE_DIR', str(tmpdir))
+        ShimStandIn.lines = b'foo@1\t7\tfalse\n'
+        schema = Schema.fromstring('<x:int64>[i]')
+        ShimStandIn.output = schema.tobytes(
+            numpy.array([((255, 1),), ((0, 2),)], dtype=schema.atts_dtype))
+        db = DB(standin, no_ops=True, disk_cache_size=10 ** 6)
+        df = db.iquery('scan(foo)',
+                       fetch=True,
+                       atts_only=True,
+                       as_dataframe=True,
+                       dataframe_promo=False,
+                       schema=schema)
+        assert len(df) == 2
+        assert db.disk_cache.entries() == []
@@ -0,0 +1,73 @@
+import pytest
+
+from scidbpy.infer import infer_schema
+from scidbpy.schema import Schema
+
+
+class Op(object):
+    is_lazy = True
+
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+
+    def __str__(self):
+        return '{}({})'.format(self.name, ', '.join(str(a) for a in self.args))
+
+
+arrays = {
+    'foo': Schema.fromstring('foo<x:int64 not null, y:double>[i=0:9:0:5]'),
+    'bar': Schema.fromstring('bar<z:string>[i=0:9:0:5]'),
+}
+
+
+class TestInferSchema:
+
+    @pytest.mark.parametrize(('op', 'expected'), [
+        (Op('scan', 'foo'),
+         '<x:int64 NOT NULL,y:double> [i=0:9:0:5]'),
+        (Op('build', '<v:uint8>[j=0:3]', 'j'),
+         '<v:uint8> [j=0:3]'),
+        (Op('build', 'foo', 'i'),
+         '<x:int64 NOT NULL,y:double> [i=0:9:0:5]'),
+        (Op('apply', 'foo', 'a', 'i', 'b', 'y', 'c', '1.5', 'd', 'true'),
+         '<x:int64 NOT NULL,y:double,a:int64 NOT NULL,b:double,' +
+         'c:double NOT NULL,d:bool NOT NULL> [i=0:9:0:5]'),
+        (Op('project', Op('scan', 'foo'), 'y', 'x'),
+         '<y:double,x:int64 NOT NULL> [i=0:9:0:5]'),
+        (Op('filter', 'foo', 'x > 1'),
+         '<x:int64 NOT NULL,y:double> [i=0:9:0:5]'),
+        (Op('between', 'foo', 1, 2),
+         '<x:int64 NOT NULL,y:double> [i=0:9:0:5]'),
+        (Op('subarray', 'foo', 2, 'null'),
+         '<x:int64 NOT NULL,y:double> [i=0:7:0:5]'),
+        (Op('limit', 'foo', 3),
+         '<x:int64 NOT NULL,y:double> [i=0:9:0:5]'),
+        (Op('join', 'foo', Op('scan', 'bar')),
+         '<x:int64 NOT NULL,y:double,z:string> [i=0:9:0:5]'),
+        (Op('redimension', 'foo', '<i:int64>[x=0:*]'),
+         '<i:int64> [x=0:*]'),
+    ])
+    def test_infer(self, op, expected):
+        assert str(infer_schema(op, arrays.get)) == expected
+
+    @pytest.mark.parametrize('op', [
+        Op('scan', 'taz'),
+        Op('sort', 'foo'),
+        Op('apply', 'foo', 'z', 'x + 1'),
+        Op('apply', 'foo', 'x', '1'),
+        Op('project', 'foo', 'i'),
+        Op('between', 'foo', 1),
+        Op('limit', 'foo', 'x'),
+        Op('join', 'foo', 'foo as f'),
+        Op('build', '<x:int64[i]', 'i'),
+        Op('redimension', 'foo', 'bar'),
+    ])
+    def test_infer_none(self, op):
+        assert infer_schema(op, arrays.get) is None
+
+    def test_copy(self):
+        schema = infer_schema(Op('scan', 'foo'), arrays.get)
+        schema.make_dims_atts()
+        assert str(arrays['foo']) == (
+            'foo<x:int64 NOT NULL,y:double> [i=0:9:0:5]')
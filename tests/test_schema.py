@@ -1,4 +1,9 @@
+import numpy
+import pandas
+import pyarrow
 import pytest
+import struct
+import tracemalloc
 
 from scidbpy.schema import Attribute, Dimension, Schema
 
@@ -207,3 +212,201 @@ class TestSchema:
     def test_regex_dims(self, string, expected):
         assert (Schema._regex_dims.search(string).group(1).split(';') ==
                 expected)
+
+    @pytest.mark.parametrize(
+        ('as_dataframe', 'dataframe_promo', 'expected'),
+        [
+            (False, False,
+             [((255, 10), (255, 'foo'), b'\x01', (255, 1.5)),
+              ((3, 11), (0, ''), b'', (0, 2.5)),
+              ((255, 12), (255, 'bar'), b'\x02\x03', (255, 3.5))]),
+            (True, True,
+             [(10., 'foo', b'\x01', 1.5),
+              (numpy.nan, None, b'', numpy.nan),
+              (12., 'bar', b'\x02\x03', 3.5)]),
+        ])
+    def test_frombytes(self, as_dataframe, dataframe_promo, expected):
+        schema = Schema.fromstring(
+            '<x:int64, s:string, b:binary not null, d:double>[i]')
+        buf = b''.join(
+            struct.pack('<Bq', x_null, x) +
+            struct.pack('<BI', s_null, len(s) + 1) + s + b'\x00' +
+            struct.pack('<I', len(b)) + b +
+            struct.pack('<Bd', d_null, d)
+            for (x_null, x, s_null, s, b, d_null, d) in (
+                (255, 10, 255, b'foo', b'\x01', 255, 1.5),
+                (3, 11, 0, b'', b'', 0, 2.5),
+                (255, 12, 255, b'bar', b'\x02\x03', 255, 3.5)))
+        data = schema.frombytes(buf, as_dataframe, dataframe_promo)
+        assert len(data) == len(expected)
+        for (cell, exp) in zip(data.tolist(), expected):
+            assert all(val == e or val != val and e != e
+                       for (val, e) in zip(cell, exp))
+
+    @pytest.mark.parametrize(
+        ('schema_str', 'data'),
+        [
+            ('<s:string not null>[i]',
+             numpy.array(['foo', '', 'b\xe4r'], dtype=object)),
+            ('<x:int64, s:string, b:binary not null>[i]',
+             numpy.array(
+                 [((255, 10), (255, 'foo'), b'\x01'),
+                  ((3, 11), (0, ''), b''),
+                  ((255, 12), (255, 'bar'), b'\x02\x03')],
+                 dtype=[('x', [('null', 'u1'), ('val', '<i8')]),
+                        ('s', [('null', 'u1'), ('val', 'O')]),
+                        ('b', 'O')])),
+        ])
+    def test_tobytes(self, schema_str, data):
+        schema = Schema.fromstring(schema_str)
+        out = schema.frombytes(schema.tobytes(data))
+        if len(data.dtype) > 0:
+            assert out.tolist() == data.tolist()
+        else:
+            assert out[out.dtype.names[0]].tolist() == data.tolist()
+
+    @pytest.mark.parametrize('max_cells', [None, 1, 40, 1000])
+    def test_scan_runs(self, max_cells):
+        # Runs of cells of the same size, of various lengths
+        schema = Schema.fromstring(
+            '<x:int8 not null, s:string, b:binary not null>[i]')
+        data = numpy.empty((300,), dtype=schema.atts_dtype)
+        data['x'] = numpy.arange(300) % 7
+        data['s']['null'] = numpy.where(numpy.arange(300) % 50 < 20, 0, 255)
+        data['s']['val'] = ['' if i % 50 < 20 else 'a' * (i // 90)
+                            for i in range(300)]
+        data['b'] = [b'b' * (i % 3 == 0) for i in range(300)]
+        buf = schema.tobytes(data)
+        cnt, lengths, end = schema._scan_lengths(buf + b'\x00',
+                                                 max_cells=max_cells)
+        cnt_exp = min(300, max_cells or 300)
+        assert cnt == cnt_exp
+        assert end == len(schema.tobytes(data[:cnt_exp]))
+        assert lengths.tolist() == [
+            [1 if i % 50 < 20 else i // 90 + 1, int(i % 3 == 0)]
+            for i in range(cnt_exp)]
+        assert schema.frombytes(buf).tolist() == data.tolist()
+
+    def test_frombytes_utf8(self):
+        schema = Schema.fromstring('<s:string not null>[i]')
+        buf = schema.tobytes(pandas.DataFrame({'s': ['ab', 'cd', 'ef']}))
+        buf = buf.replace(b'cd', b'\xffd')
+        with pytest.raises(UnicodeDecodeError):
+            schema.frombytes(buf)
+
+    def test_tobytes_memory(self):
+        schema = Schema.fromstring('<s:string not null, b:binary>[i]')
+        data = numpy.empty((100000,), dtype=schema.atts_dtype)
+        data['s'] = ['x' * (i % 200) for i in range(len(data))]
+        data['s'][7] = 'y' * 2 ** 22
+        data['b']['null'] = 255
+        data['b']['val'] = b'z' * 50
+        tracemalloc.start()
+        try:
+            buf = schema.tobytes(data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        # The output buffer and its bytes copy, plus temporaries of
+        # about the size of the encoded values
+        assert peak < 5 * len(buf)
+        assert schema.frombytes(buf).tolist() == data.tolist()
+
+    def test_fromdataframe(self):
+        df = pandas.DataFrame({
+            'x': numpy.arange(2, dtype=numpy.int8),
+            'y': pandas.array([True, None], dtype='boolean'),
+            's': ['a', None],
+            'c': pandas.Categorical([1.5, None]),
+            'd': pandas.to_datetime(['2020-01-01', '2020-01-02'])})
+        assert str(Schema.fromdataframe(df)) == (
+            '<x:int8 NOT NULL,y:bool,s:string,c:double,' +
+            'd:datetime NOT NULL> [i]')
+
+    def test_fromarrow(self):
+        schema = pyarrow.schema([
+            pyarrow.field('x', pyarrow.uint16(), nullable=False),
+            pyarrow.field('s', pyarrow.dictionary(pyarrow.int8(),
+                                                  pyarrow.string())),
+            pyarrow.field('b', pyarrow.binary())])
+        assert str(Schema.fromarrow(schema)) == (
+            '<x:uint16 NOT NULL,s:string,b:binary> [i]')
+
+    @pytest.mark.parametrize('convert', [
+        lambda df: df,
+        lambda df: pyarrow.Table.from_pandas(df, preserve_index=False),
+    ])
+    def test_tobytes_columns(self, convert):
+        df = pandas.DataFrame({
+            'x': numpy.arange(3),
+            'y': pandas.array([1, None, 3], dtype='Int32'),
+            's': pandas.array(['a', None, ''], dtype='string'),
+            'c': pandas.Categorical(['p', 'q', None])})
+        schema = Schema.fromstring(
+            '<x:int64 not null, y:int32, s:string, c:string>[i]')
+        out = schema.frombytes(schema.tobytes(convert(df)),
+                               as_dataframe=True,
+                               dataframe_promo=False)
+        assert out['x'].tolist() == [0, 1, 2]
+        assert out['y'].tolist() == [(255, 1), (0, 0), (255, 3)]
+        assert out['s'].tolist() == [(255, 'a'), (0, ''), (255, '')]
+        assert out['c'].tolist() == [(255, 'p'), (255, 'q'), (0, '')]
+
+    def test_promote(self):
+        schema = Schema.fromstring(
+            '<x:int8, b:bool, d:datetime, y:double not null>[i]')
+        data = numpy.array(
+            [((255, 10), (255, True), (255, 5), 1.5),
+             ((0, 11), (0, False), (0, 6), 2.5)],
+            dtype=schema.atts_dtype)
+        df = pandas.DataFrame.from_records(data)
+        schema.promote(df)
+        assert df.dtypes.tolist() == [
+            numpy.float16, object, numpy.dtype('datetime64[ns]'), float]
+        assert df['x'].tolist()[0] == 10
+        assert df['b'].tolist()[0] is True
+        assert df['d'][0] == pandas.Timestamp(5, unit='s')
+        assert df.isnull().sum().tolist() == [1, 1, 1, 0]
+
+    @pytest.mark.parametrize('schema_str', [
+        '<x:int64, b:bool, s:string not null, y:double not null>[i]',
+        '<x:int64, b:bool, s:string, y:double not null>[i]',
+    ])
+    def test_promote_nullable(self, schema_str):
+        schema = Schema.fromstring(schema_str)
+        data = numpy.zeros((2,), dtype=schema.atts_dtype)
+        data['x'] = [(255, 2 ** 62 + 1), (0, 0)]
+        data['b'] = [(255, True), (0, False)]
+        if schema.atts[2].not_null:
+            data['s'] = ['foo', 'bar']
+        else:
+            data['s'] = [(255, 'foo'), (0, '')]
+        data['y'] = [1.5, 2.5]
+        df = pandas.DataFrame.from_records(
+            schema.frombytes(schema.tobytes(data), True, False))
+        schema.promote(df, nullable=True)
+        assert [str(dt) for dt in df.dtypes] == [
+            'Int64', 'boolean', 'string', 'float64']
+        assert df['x'][0] == 2 ** 62 + 1
+        assert bool(df['b'][0]) is True
+        assert df['s'][0] == 'foo'
+        if not schema.atts[2].not_null:
+            assert df['s'][1] is pandas.NA
+        assert df['x'][1] is pandas.NA
+        assert df['b'][1] is pandas.NA
+
+    @pytest.mark.parametrize('dataframe_promo', [True, False, 'nullable'])
+    def test_todataframe(self, dataframe_promo):
+        schema = Schema.fromstring(
+            '<x:int8, b:bool, y:double not null, d:datetime not null>[i]')
+        data = numpy.array(
+            [((255, 10), (255, True), 1.5, 5),
+             ((0, 11), (0, False), 2.5, 6)],
+            dtype=schema.atts_dtype)
+        expected = pandas.DataFrame.from_records(data)
+        if dataframe_promo:
+            schema.promote(expected, dataframe_promo == 'nullable')
+        df = schema.todataframe(data, dataframe_promo)
+        pandas.testing.assert_frame_equal(df, expected)
+        df['y'] += 1
+        assert data['y'].tolist() == [1.5, 2.5]